@@ -0,0 +1,591 @@
+"""
+Build-time size and opcode-cost analyzer for the degen2 approval program.
+
+Compiles approval() and walks every path through the router with the method selector (and, for execute,
+the type field of the proposal box) pinned, so each report row is the worst case a caller of that branch can hit.
+Exits non-zero when the program or any path goes over budget, so CI finds out before deploy time.
+
+usage:
+    python degen2_analyzer.py
+    python degen2_analyzer.py --max-size 2048 --max-cost 700 --budget execute:pay_algo=1400
+    python degen2_analyzer.py --compare
+"""
+
+import argparse
+import ast
+import base64
+import sys
+
+from degen2_contract import (
+    approval, clear, extra_pages, max_swap_entries, methods, proposal_fields, proposal_types, selector_key, teal_version,
+)
+
+max_program_size = 2048 * (1 + extra_pages)  # bytes for approval + clear
+max_app_budget = 700  # opcode budget of a single app call
+loop_bound = 16  # max iterations assumed for any backward jump
+
+# paths whose clients pool budget by adding pad calls to the group: (loop iterations, app calls in the group)
+# a pay_tokens list is at most ~127 entries, the 2KB of application args divided by 16 bytes per entry
+# buy/swap1 loop over the group (16 txns at most) and log every payer, a full batch needs two pad calls next to either
+# claim hashes once per tree level, 19 for the largest airdrop (airdrop_chunk * max_airdrop_chunks leaves), close_airdrop
+# loops over up to 64 bitmap boxes and its group needs 9 calls for the box references anyway
+pooled_paths = {
+    "execute": (127, 16),
+    "execute:pay_tokens": (127, 16),
+    "execute:swap_table": (max_swap_entries, 16),  # propose takes no more than execute can log
+    "buy": (16, 3),
+    "swap1": (16, 3),
+    "claim": (19, 3),
+    "close_airdrop": (64, 9),
+}
+
+# opcodes that don't cost 1, everything else is 1
+costs = {
+    "sha256": 35,
+    "keccak256": 130,
+    "sha512_256": 45,
+    "sha3_256": 130,
+    "ed25519verify": 1900,
+    "ed25519verify_bare": 1900,
+    "ecdsa_verify": 1700,
+    "ecdsa_pk_decompress": 650,
+    "ecdsa_pk_recover": 2000,
+    "vrf_verify": 5700,
+    "divmodw": 20,
+    "bsqrt": 40,
+    "b+": 10,
+    "b-": 10,
+    "b/": 20,
+    "b*": 20,
+    "b%": 20,
+    "b|": 6,
+    "b&": 6,
+    "b^": 6,
+    "b~": 4,
+}
+
+# encoded size of the immediates of each opcode, anything missing has none
+immediates = {
+    "txn": 1, "global": 1, "load": 1, "store": 1, "arg": 1, "intc": 1, "bytec": 1,
+    "gtxns": 1, "gload": 2, "gloads": 1, "gaid": 1, "txna": 2, "gtxn": 2, "gtxna": 3, "gtxnsa": 2,
+    "itxn_field": 1, "itxn": 1, "itxna": 2, "gitxn": 2, "gitxna": 3, "txnas": 1, "gtxnas": 2, "gtxnsas": 1,
+    "itxnas": 1, "gitxnas": 2, "asset_holding_get": 1, "asset_params_get": 1, "app_params_get": 1,
+    "acct_params_get": 1, "extract": 2, "substring": 2, "dig": 1, "cover": 1, "uncover": 1, "bury": 1,
+    "popn": 1, "dupn": 1, "frame_dig": 1, "frame_bury": 1, "proto": 2, "replace2": 1, "json_ref": 1,
+    "base64_decode": 1, "ecdsa_verify": 1, "ecdsa_pk_decompress": 1, "ecdsa_pk_recover": 1,
+    "block": 1, "vrf_verify": 1, "voter_params_get": 1,
+    "b": 2, "bz": 2, "bnz": 2, "callsub": 2,
+}
+
+# (pops, pushes) for the ops the symbolic walker doesn't evaluate itself
+effects = {
+    "err": (0, 0), "return": (1, 0), "assert": (1, 0), "pop": (1, 0), "log": (1, 0),
+    "sha256": (1, 1), "keccak256": (1, 1), "sha512_256": (1, 1), "sha3_256": (1, 1),
+    "txn": (0, 1), "txna": (0, 1), "gtxn": (0, 1), "gtxna": (0, 1), "gtxns": (1, 1), "gtxnsa": (1, 1),
+    "txnas": (1, 1), "gtxnas": (1, 1), "gtxnsas": (2, 1), "global": (0, 1), "arg": (0, 1),
+    "balance": (1, 1), "min_balance": (1, 1), "app_opted_in": (2, 1),
+    "app_local_get": (2, 1), "app_local_get_ex": (3, 2), "app_global_get_ex": (2, 2),
+    "app_local_put": (3, 0), "app_global_put": (2, 0), "app_local_del": (2, 0), "app_global_del": (1, 0),
+    "asset_holding_get": (2, 2), "asset_params_get": (1, 2), "app_params_get": (1, 2), "acct_params_get": (1, 2),
+    "itxn_begin": (0, 0), "itxn_next": (0, 0), "itxn_submit": (0, 0), "itxn_field": (1, 0),
+    "itxn": (0, 1), "itxna": (0, 1), "gitxn": (0, 1), "gitxna": (0, 1),
+    "box_create": (2, 1), "box_extract": (3, 1), "box_replace": (3, 0), "box_del": (1, 1),
+    "box_len": (1, 2), "box_get": (1, 2), "box_put": (2, 0), "box_resize": (2, 0), "box_splice": (4, 0),
+    "extract": (1, 1), "extract3": (3, 1), "extract_uint16": (2, 1), "extract_uint32": (2, 1),
+    "extract_uint64": (2, 1), "substring": (1, 1), "substring3": (3, 1), "replace2": (2, 1), "replace3": (3, 1),
+    "getbit": (2, 1), "setbit": (3, 1), "getbyte": (2, 1), "setbyte": (3, 1), "bzero": (1, 1),
+    "mulw": (2, 2), "addw": (2, 2), "divw": (3, 1), "divmodw": (4, 4), "expw": (2, 2), "exp": (2, 1),
+    "sqrt": (1, 1), "bitlen": (1, 1), "shl": (2, 1), "shr": (2, 1), "~": (1, 1),
+    "|": (2, 1), "&": (2, 1), "^": (2, 1), "b~": (1, 1), "bsqrt": (1, 1),
+    "b+": (2, 1), "b-": (2, 1), "b/": (2, 1), "b*": (2, 1), "b%": (2, 1), "b|": (2, 1), "b&": (2, 1), "b^": (2, 1),
+    "b<": (2, 1), "b>": (2, 1), "b<=": (2, 1), "b>=": (2, 1), "b==": (2, 1), "b!=": (2, 1),
+    "gload": (0, 1), "gloads": (1, 1), "gaid": (0, 1), "gaids": (1, 1), "loads": (1, 1), "stores": (2, 0),
+    "ed25519verify": (3, 1), "ed25519verify_bare": (3, 1), "ecdsa_verify": (5, 1),
+    "ecdsa_pk_decompress": (1, 2), "ecdsa_pk_recover": (4, 2), "json_ref": (2, 1), "base64_decode": (1, 1),
+}
+
+
+def varuint_size(n):
+    size = 1
+    while n >= 0x80:
+        n >>= 7
+        size += 1
+    return size
+
+
+def parse_bytes(text):
+    """Decode the operand of a byte/pushbytes/bytecblock entry."""
+    if text.startswith('"'):
+        return ast.literal_eval("b" + text)
+    if text.startswith("0x"):
+        return bytes.fromhex(text[2:])
+    if text.startswith("base64 "):
+        return base64.b64decode(text[7:])
+    if text.startswith("b64(") or text.startswith("base64("):
+        return base64.b64decode(text[text.index("(") + 1:-1])
+    raise ValueError("can't decode byte constant: " + text)
+
+
+def strip_comment(line):
+    """Drop a trailing // comment, ignoring any // inside a string literal."""
+    quoted = False
+    i = 0
+    while i < len(line):
+        if line[i] == '"':
+            quoted = not quoted
+        elif line[i] == "\\" and quoted:
+            i += 1
+        elif line.startswith("//", i) and not quoted:
+            return line[:i].strip()
+        i += 1
+    return line.strip()
+
+
+def split_operands(rest):
+    """Split an operand string on spaces, keeping quoted strings whole."""
+    out = []
+    while rest:
+        rest = rest.lstrip()
+        if not rest:
+            break
+        if rest[0] == '"':
+            i = 1
+            while rest[i] != '"':
+                i += 2 if rest[i] == "\\" else 1
+            out.append(rest[:i + 1])
+            rest = rest[i + 1:]
+        else:
+            token, _, rest = rest.partition(" ")
+            out.append(token)
+    return out
+
+
+named_ints = {
+    "NoOp": 0, "OptIn": 1, "CloseOut": 2, "ClearState": 3, "UpdateApplication": 4, "DeleteApplication": 5,
+    "pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6,
+}
+
+
+def parse_int(text):
+    if text in named_ints:
+        return named_ints[text]
+    return int(text, 0)
+
+
+class Program:
+    """A parsed TEAL program: a flat instruction list plus label -> index."""
+
+    def __init__(self, teal):
+        self.version = 1
+        self.ops = []  # (op, args, line number)
+        self.labels = {}
+        self.intc = []
+        self.bytec = []
+        for number, line in enumerate(teal.splitlines(), 1):
+            line = strip_comment(line)
+            if not line:
+                continue
+            if line.startswith("#pragma version"):
+                self.version = int(line.split()[2])
+                continue
+            if line.endswith(":") and " " not in line:
+                self.labels[line[:-1]] = len(self.ops)
+                continue
+            op, _, rest = line.partition(" ")
+            args = split_operands(rest)
+            self.ops.append((op, args, number))
+            if op == "intcblock":
+                self.intc = [parse_int(a) for a in args]
+            elif op == "bytecblock":
+                self.bytec = [parse_bytes(a) for a in args]
+
+    def op_size(self, op, args):
+        """Encoded bytes of one instruction, as goal would assemble it."""
+        if op in ("int", "pushint"):
+            return 1 + varuint_size(parse_int(args[0]))
+        if op in ("byte", "pushbytes", "addr", "method"):
+            if op == "addr":
+                return 1 + 1 + 32
+            if op == "method":
+                return 1 + 1 + 4
+            value = parse_bytes(" ".join(args) if args[0] == "base64" else args[0])
+            return 1 + varuint_size(len(value)) + len(value)
+        if op == "intcblock":
+            return 1 + varuint_size(len(args)) + sum(varuint_size(parse_int(a)) for a in args)
+        if op == "bytecblock":
+            values = [parse_bytes(a) for a in args]
+            return 1 + varuint_size(len(values)) + sum(varuint_size(len(v)) + len(v) for v in values)
+        if op == "pushints":
+            return 1 + varuint_size(len(args)) + sum(varuint_size(parse_int(a)) for a in args)
+        if op == "pushbytess":
+            values = [parse_bytes(a) for a in args]
+            return 1 + varuint_size(len(values)) + sum(varuint_size(len(v)) + len(v) for v in values)
+        if op in ("switch", "match"):
+            return 2 + 2 * len(args)
+        return 1 + immediates.get(op, 0)
+
+    def size(self):
+        return varuint_size(self.version) + sum(self.op_size(op, args) for op, args, _ in self.ops)
+
+
+class Record(tuple):
+    """A box read where only the pinned uint64 fields are known, as sorted (offset, value) pairs."""
+
+    def field(self, offset):
+        return dict(self).get(offset)
+
+
+def compile_program(expr, version=teal_version):
+    from pyteal import Mode, compileTeal
+    return compileTeal(expr, mode=Mode.Application, version=version, assembleConstants=True)
+
+
+class Walker:
+    """Worst-case opcode cost over every path that agrees with a set of pinned inputs.
+
+    Values on the stack and in scratch are tracked as constants where possible (None when unknown),
+    so branches on pinned inputs like ApplicationArgs 0 only follow the matching side.
+    pins keys: ("txn", field), ("txna", field, index), ("global", field), ("app_global_get", key bytes),
+    ("box_field", offset) for a uint64 field of whatever box is read
+    """
+
+    def __init__(self, program, pins, loops=loop_bound):
+        self.program = program
+        self.pins = pins
+        self.loops = loops
+        self.memo = {}
+        self.visited = set()
+        # labels targeted from below are loop heads
+        self.loop_heads = {
+            program.labels[args[0]] for pc, (op, args, _) in enumerate(program.ops)
+            if op in ("b", "bz", "bnz") and program.labels[args[0]] <= pc
+        }
+
+    def run(self):
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 20000))
+        try:
+            return self.walk(0, (), (), (), ())
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def reachable_size(self):
+        return sum(self.program.op_size(*self.program.ops[pc][:2]) for pc in self.visited)
+
+    def walk(self, pc, stack, scratch, frames, loops):
+        key = (pc, stack, scratch, frames, loops)
+        if key in self.memo:
+            return self.memo[key]
+        self.memo[key] = None  # guards against a cycle the loop bound didn't catch
+        result = self.step(pc, list(stack), dict(scratch), list(frames), dict(loops))
+        self.memo[key] = result
+        return result
+
+    def branch(self, target, stack, scratch, frames, loops, pc):
+        if target <= pc and target in self.loop_heads:
+            loops = dict(loops)
+            loops[target] = loops.get(target, 0) + 1
+            if loops[target] > self.loops:
+                return None
+        return self.walk(target, tuple(stack), tuple(sorted(scratch.items())), tuple(frames), tuple(sorted(loops.items())))
+
+    def step(self, pc, stack, scratch, frames, loops):
+        program = self.program
+        cost = 0
+        while pc < len(program.ops):
+            op, args, _ = program.ops[pc]
+            self.visited.add(pc)
+            cost += costs.get(op, 1)
+            if op in ("err", "return"):
+                return cost
+            if op == "assert":
+                if stack.pop() == 0:
+                    return cost
+            elif op == "b":
+                rest = self.branch(program.labels[args[0]], stack, scratch, frames, loops, pc)
+                return None if rest is None else cost + rest
+            elif op in ("bz", "bnz"):
+                cond = stack.pop()
+                target = program.labels[args[0]]
+                options = []
+                if cond is None or (cond != 0) == (op == "bnz"):
+                    options.append(self.branch(target, stack, scratch, frames, loops, pc))
+                if cond is None or (cond != 0) != (op == "bnz"):
+                    options.append(self.branch(pc + 1, stack, scratch, frames, loops, pc))
+                options = [o for o in options if o is not None]
+                return cost + max(options) if options else None
+            elif op == "callsub":
+                frames.append((pc + 1, len(stack), 0, 0))
+                return self.finish(program.labels[args[0]], cost, stack, scratch, frames, loops, pc)
+            elif op == "retsub":
+                ret, height, nargs, nrets = frames.pop()
+                if nargs or nrets:
+                    results = stack[len(stack) - nrets:] if nrets else []
+                    del stack[height - nargs:]
+                    stack.extend(results)
+                return self.finish(ret, cost, stack, scratch, frames, loops, pc)
+            elif op == "proto":
+                ret, height, _, _ = frames[-1]
+                frames[-1] = (ret, height, int(args[0]), int(args[1]))
+            elif op == "frame_dig":
+                stack.append(stack[frames[-1][1] + int(args[0])])
+            elif op == "frame_bury":
+                value = stack.pop()
+                stack[frames[-1][1] + int(args[0])] = value
+            else:
+                self.evaluate(op, args, stack, scratch)
+            pc += 1
+        return cost
+
+    def finish(self, target, cost, stack, scratch, frames, loops, pc):
+        rest = self.walk(target, tuple(stack), tuple(sorted(scratch.items())), tuple(frames), tuple(sorted(loops.items())))
+        return None if rest is None else cost + rest
+
+    def evaluate(self, op, args, stack, scratch):
+        program = self.program
+        if op in ("int", "pushint"):
+            stack.append(parse_int(args[0]))
+        elif op in ("byte", "pushbytes"):
+            stack.append(parse_bytes(" ".join(args) if args[0] == "base64" else args[0]))
+        elif op in ("addr", "method"):
+            stack.append(None)
+        elif op in ("intcblock", "bytecblock"):
+            pass
+        elif op.startswith("intc"):
+            stack.append(program.intc[int(args[0]) if op == "intc" else int(op[-1])])
+        elif op.startswith("bytec"):
+            stack.append(program.bytec[int(args[0]) if op == "bytec" else int(op[-1])])
+        elif op == "pushints":
+            stack.extend(parse_int(a) for a in args)
+        elif op == "pushbytess":
+            stack.extend(parse_bytes(a) for a in args)
+        elif op == "txn" and ("txn", args[0]) in self.pins:
+            stack.append(self.pins[("txn", args[0])])
+        elif op == "txna" and ("txna", args[0], args[1]) in self.pins:
+            stack.append(self.pins[("txna", args[0], args[1])])
+        elif op == "global" and ("global", args[0]) in self.pins:
+            stack.append(self.pins[("global", args[0])])
+        elif op == "app_global_get":
+            key = stack.pop()
+            stack.append(self.pins.get(("app_global_get", key)))
+        elif op == "box_get":
+            stack.pop()
+            fields = Record(sorted((key[1], value) for key, value in self.pins.items() if key[0] == "box_field"))
+            stack.extend([fields, 1] if fields else [None, None])
+        elif op == "extract_uint64":
+            offset, data = stack.pop(), stack.pop()
+            if offset is None or data is None:
+                stack.append(None)
+            elif isinstance(data, Record):
+                stack.append(data.field(offset))
+            else:
+                stack.append(int.from_bytes(data[offset:offset + 8], "big"))
+        elif op == "load":
+            stack.append(scratch.get(int(args[0])))
+        elif op == "store":
+            value = stack.pop()
+            if value is None:
+                scratch.pop(int(args[0]), None)
+            else:
+                scratch[int(args[0])] = value
+        elif op == "stores":
+            value, slot = stack.pop(), stack.pop()
+            if slot is None:
+                scratch.clear()
+            elif value is None:
+                scratch.pop(slot, None)
+            else:
+                scratch[slot] = value
+        elif op == "dup":
+            stack.append(stack[-1])
+        elif op == "dup2":
+            stack.extend(stack[-2:])
+        elif op == "dupn":
+            stack.extend([stack[-1]] * int(args[0]))
+        elif op == "dig":
+            stack.append(stack[-1 - int(args[0])])
+        elif op == "swap":
+            stack[-1], stack[-2] = stack[-2], stack[-1]
+        elif op == "cover":
+            n = int(args[0])
+            stack.insert(len(stack) - 1 - n, stack.pop())
+        elif op == "uncover":
+            n = int(args[0])
+            stack.append(stack.pop(len(stack) - 1 - n))
+        elif op == "bury":
+            value = stack.pop()
+            stack[len(stack) - int(args[0])] = value
+        elif op == "popn":
+            del stack[len(stack) - int(args[0]):]
+        elif op == "select":
+            cond, b, a = stack.pop(), stack.pop(), stack.pop()
+            stack.append(None if cond is None else (b if cond else a))
+        elif op in ("==", "!=", "<", ">", "<=", ">=", "&&", "||", "+", "-", "*", "/", "%"):
+            b, a = stack.pop(), stack.pop()
+            stack.append(binary(op, a, b))
+        elif op == "!":
+            a = stack.pop()
+            stack.append(None if a is None else int(a == 0))
+        elif op == "len":
+            a = stack.pop()
+            stack.append(None if a is None else len(a))
+        elif op == "btoi":
+            a = stack.pop()
+            stack.append(None if a is None else int.from_bytes(a, "big"))
+        elif op == "itob":
+            a = stack.pop()
+            stack.append(None if a is None else a.to_bytes(8, "big"))
+        elif op == "concat":
+            b, a = stack.pop(), stack.pop()
+            stack.append(None if a is None or b is None else a + b)
+        elif op in effects:
+            pops, pushes = effects[op]
+            del stack[len(stack) - pops:]
+            stack.extend([None] * pushes)
+        else:
+            raise ValueError("analyzer doesn't know the stack effect of " + op)
+
+
+def binary(op, a, b):
+    a, b = (None if isinstance(v, Record) else v for v in (a, b))
+    if op == "&&" and 0 in (a, b):
+        return 0
+    if op == "||" and ((a is not None and a != 0) or (b is not None and b != 0)):
+        return 1
+    if a is None or b is None:
+        return None
+    if op == "==":
+        return int(a == b)
+    if op == "!=":
+        return int(a != b)
+    if op == "<":
+        return int(a < b)
+    if op == ">":
+        return int(a > b)
+    if op == "<=":
+        return int(a <= b)
+    if op == ">=":
+        return int(a >= b)
+    if op == "&&":
+        return int(bool(a) and bool(b))
+    if op == "||":
+        return int(bool(a) or bool(b))
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b if a >= b else None
+    if op == "*":
+        return a * b
+    if op == "/":
+        return a // b if b else None
+    return a % b if b else None
+
+
+def paths():
+    """(name, pins) for every route through approval()."""
+    call = {("txn", "ApplicationID"): 1, ("txn", "OnCompletion"): 0}
+    yield "init", {("txn", "ApplicationID"): 0}
+    yield "opt_in", {("txn", "ApplicationID"): 1, ("txn", "OnCompletion"): 1}
+    for name, selector in methods.items():
+        pins = dict(call)
+        pins[("txna", "ApplicationArgs", "0")] = selector.encode()
+        yield name, pins
+    for name, kind in proposal_types.items():
+        pins = dict(call)
+        pins[("txna", "ApplicationArgs", "0")] = methods["execute"].encode()
+        pins[("box_field", proposal_fields["type"])] = selector_key(kind)
+        yield "execute:" + name, pins
+
+
+def analyze(teal, loops=loop_bound):
+    """[(path, worst-case cost, reachable bytes)] for the compiled approval program. The cost is None when the loop
+    bound cut off every way through the path, it has no bound."""
+    program = Program(teal)
+    rows = []
+    for name, pins in paths():
+        walker = Walker(program, pins, pooled_paths[name][0] if name in pooled_paths else loops)
+        rows.append((name, walker.run(), walker.reachable_size()))
+    return program, rows
+
+
+def report(approval_teal, clear_teal, max_size=max_program_size, max_cost=max_app_budget, budgets=None, loops=loop_bound, out=sys.stdout):
+    """Print the size and cost table, return the list of budget violations."""
+    budgets = dict({name: calls * max_app_budget for name, (_, calls) in pooled_paths.items()}, **(budgets or {}))
+    program, rows = analyze(approval_teal, loops)
+    size = program.size()
+    clear_size = Program(clear_teal).size()
+    failures = []
+
+    print("approval %d bytes, clear %d bytes, total %d / %d" % (size, clear_size, size + clear_size, max_size), file=out)
+    if size + clear_size > max_size:
+        failures.append("program size %d > %d" % (size + clear_size, max_size))
+
+    print("%-32s %8s %8s %8s" % ("path", "cost", "budget", "bytes"), file=out)
+    for name, cost, reachable in rows:
+        budget = budgets.get(name, max_cost)
+        if cost is None:
+            print("%-32s %8s %8d %8d  UNBOUNDED" % (name, "?", budget, reachable), file=out)
+            failures.append("%s is unbounded, the loop bound cut off every path" % name)
+            continue
+        flag = "" if cost <= budget else "  OVER"
+        print("%-32s %8d %8d %8d%s" % (name, cost, budget, reachable, flag), file=out)
+        if cost > budget:
+            failures.append("%s costs %d > %d" % (name, cost, budget))
+    return failures
+
+
+def compare(before_teal, after_teal, loops=loop_bound, out=sys.stdout):
+    """Print cost and size of two builds of the approval program side by side."""
+    before, before_rows = analyze(before_teal, loops)
+    after, after_rows = analyze(after_teal, loops)
+    print("approval %d -> %d bytes" % (before.size(), after.size()), file=out)
+    print("%-32s %8s %8s %8s" % ("path", "before", "after", "delta"), file=out)
+    for (name, old, _), (_, new, _) in zip(before_rows, after_rows):
+        if old is None or new is None:
+            print("%-32s %8s %8s %8s" % (name, "?" if old is None else old, "?" if new is None else new, "?"), file=out)
+            continue
+        print("%-32s %8d %8d %+8d" % (name, old, new, new - old), file=out)
+
+
+def parse_budget(text):
+    name, _, value = text.partition("=")
+    return name, int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="report program size and worst-case opcode cost per approval() path")
+    parser.add_argument("--version", type=int, default=teal_version, help="TEAL version to compile")
+    parser.add_argument("--max-size", type=int, default=max_program_size, help="byte budget for approval + clear")
+    parser.add_argument("--max-cost", type=int, default=max_app_budget, help="default opcode budget per path")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[], metavar="PATH=COST", help="budget for one path")
+    parser.add_argument("--loops", type=int, default=loop_bound, help="iterations assumed for each loop")
+    parser.add_argument("--dispatch", choices=("cond", "tree"), default=None, help="router to build, contract default if unset")
+    parser.add_argument("--compare", action="store_true", help="print cond vs tree dispatch cost per path and exit")
+    parser.add_argument("--packed", action="store_true", help="governance parameters in one packed global")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(
+            compile_program(approval(dispatch_mode="cond", packed=args.packed), args.version),
+            compile_program(approval(dispatch_mode="tree", packed=args.packed), args.version),
+            loops=args.loops,
+        )
+        return 0
+
+    options = {"dispatch_mode": args.dispatch} if args.dispatch else {}
+    options["packed"] = args.packed
+    failures = report(
+        compile_program(approval(**options), args.version),
+        compile_program(clear(), args.version),
+        max_size=args.max_size,
+        max_cost=args.max_cost,
+        budgets=dict(args.budget),
+        loops=args.loops,
+    )
+    for failure in failures:
+        print("FAIL: " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Build the approval and clear programs: every requested TEAL version and router variant compiled in parallel, cached by
+a hash of the PyTeal source so an unchanged contract is never compiled twice. --factory adds degen2_factory's program,
+per version and packed (what the DAOs it deploys are created with), its clear program is the DAO's.
+
+A variant is (program, TEAL version, dispatch, packed). Its cache key is the sha256 of the source hash (degen2_contract.py,
+degen2_factory.py, pyteal_helpers and the pyteal version) and the variant, the TEAL goes to --cache under that key and
+from there to --out under the variant's file name: degen2_approval.teal and degen2_clear_state.teal for the contract
+defaults, a suffix per option otherwise (degen2_approval-v10-tree-packed.teal). The clear program takes no options, one
+per version.
+
+degen2_manifest.json next to the artifacts lists, per file, the variant, the sha256 and size of the TEAL (size as
+degen2_analyzer counts it) and, with --algod, the sha256 and size of the assembled bytecode (written as .tok). CI can
+run --check to fail when the artifacts on disk are stale, deploy scripts --verify APP_ID to compare what an app runs
+with them.
+
+usage:
+    python degen2_build.py                                          # defaults into build/
+    python degen2_build.py --versions 9 10 --dispatch cond tree --packed both
+    python degen2_build.py --check                                  # exit 1 if build/ doesn't match the source
+    python degen2_build.py --factory --packed both                  # plus degen2_factory(-packed).teal
+    python degen2_build.py --algod http://localhost:4001            # also assemble to bytecode
+    python degen2_build.py --algod http://localhost:4001 --verify 1001 --packed both
+"""
+
+import argparse
+import base64
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import PackageNotFoundError, version as package_version
+
+from degen2_contract import teal_version
+
+here = os.path.dirname(os.path.abspath(__file__))
+default_out = os.path.join(here, "build")
+default_cache = os.path.join(default_out, ".cache")
+manifest_name = "degen2_manifest.json"
+names = {"approval": "degen2_approval", "clear": "degen2_clear_state", "factory": "degen2_factory"}
+default_dispatch = "cond"  # approval()'s default
+
+
+def source_hash():
+    """sha256 over everything the compiled TEAL depends on: the contract, the factory, their helpers and pyteal."""
+    digest = hashlib.sha256()
+    paths = [os.path.join(here, "degen2_contract.py"), os.path.join(here, "degen2_factory.py")]
+    helpers = importlib.util.find_spec("pyteal_helpers")
+    if helpers and helpers.submodule_search_locations:
+        location = list(helpers.submodule_search_locations)[0]
+        paths += sorted(os.path.join(location, name) for name in os.listdir(location) if name.endswith(".py"))
+    elif helpers and helpers.origin:
+        paths.append(helpers.origin)
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(os.path.basename(path).encode() + b"\0" + f.read() + b"\0")
+    try:
+        digest.update(b"pyteal " + package_version("pyteal").encode())
+    except PackageNotFoundError:
+        pass
+    return digest.hexdigest()
+
+
+def variants(programs=("approval", "clear"), versions=(teal_version,), dispatches=(default_dispatch,), packed=(False,)):
+    """Every (program, version, dispatch, packed) to build, clear once per version and the factory once per packed."""
+    out = []
+    for version in versions:
+        if "approval" in programs:
+            out += [("approval", version, dispatch, p) for dispatch in dispatches for p in packed]
+        if "clear" in programs:
+            out.append(("clear", version, None, False))
+        if "factory" in programs:
+            out += [("factory", version, None, p) for p in packed]
+    return out
+
+
+def file_name(variant):
+    program, version, dispatch, packed = variant
+    suffix = ""
+    if version != teal_version:
+        suffix += "-v%d" % version
+    if dispatch and dispatch != default_dispatch:
+        suffix += "-" + dispatch
+    if packed:
+        suffix += "-packed"
+    return names[program] + suffix
+
+
+def cache_key(source, variant):
+    return hashlib.sha256(("%s %r" % (source, variant)).encode()).hexdigest()
+
+
+def compile_variant(variant):
+    """TEAL of one variant, run in a worker process."""
+    from pyteal import Mode, compileTeal
+    from degen2_contract import approval, clear
+    program, version, dispatch, packed = variant
+    if program == "factory":
+        from degen2_factory import approval as factory
+        expr = factory(packed=packed)
+    else:
+        expr = approval(dispatch_mode=dispatch, packed=packed) if program == "approval" else clear()
+    return compileTeal(expr, mode=Mode.Application, version=version)
+
+
+def build(wanted, cache=default_cache, jobs=None, log=None):
+    """{variant: TEAL} for wanted, compiling (in parallel) only the variants not in cache yet."""
+    source = source_hash()
+    os.makedirs(cache, exist_ok=True)
+    teal, missing = {}, []
+    for variant in wanted:
+        path = os.path.join(cache, cache_key(source, variant) + ".teal")
+        if os.path.exists(path):
+            with open(path) as f:
+                teal[variant] = f.read()
+        else:
+            missing.append(variant)
+    if log:
+        log.write("%d cached, %d to compile\n" % (len(teal), len(missing)))
+    if len(missing) > 1 and jobs != 1:
+        with ProcessPoolExecutor(jobs or min(len(missing), os.cpu_count() or 1)) as executor:
+            compiled = list(executor.map(compile_variant, missing))
+    else:
+        compiled = [compile_variant(variant) for variant in missing]
+    for variant, program in zip(missing, compiled):
+        path = os.path.join(cache, cache_key(source, variant) + ".teal")
+        with open(path + ".tmp", "w") as f:
+            f.write(program)
+        os.replace(path + ".tmp", path)  # a concurrent build never reads half a file
+        teal[variant] = program
+    return teal
+
+
+def programs(packed=False, dispatch=default_dispatch, version=teal_version):
+    """(approval TEAL, clear TEAL) from the cache, compiled if the source changed."""
+    approval = ("approval", version, dispatch, packed)
+    clear = ("clear", version, None, False)
+    teal = build([approval, clear], jobs=1)
+    return teal[approval], teal[clear]
+
+
+def factory_program(packed=False, version=teal_version):
+    """TEAL of the factory deploying packed (or not) DAOs, from the cache like programs()."""
+    variant = ("factory", version, None, packed)
+    return build([variant], jobs=1)[variant]
+
+
+def assemble(algod, teal, cache=default_cache):
+    """Bytecode of teal from algod's /v2/teal/compile, cached by the TEAL's hash."""
+    path = os.path.join(cache, hashlib.sha256(teal.encode()).hexdigest() + ".tok")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    bytecode = base64.b64decode(algod.request("POST", "/v2/teal/compile", teal.encode(), "text/plain")["result"])
+    with open(path, "wb") as f:
+        f.write(bytecode)
+    return bytecode
+
+
+def manifest(teal, bytecode=None):
+    """The manifest of built variants, bytecode is {variant: bytes} if assembled."""
+    from degen2_analyzer import Program
+    files = {}
+    for variant in sorted(teal, key=file_name):
+        program, version, dispatch, packed = variant
+        entry = {
+            "program": program,
+            "version": version,
+            "dispatch": dispatch,
+            "packed": packed,
+            "sha256": hashlib.sha256(teal[variant].encode()).hexdigest(),
+            "size": Program(teal[variant]).size(),
+        }
+        if bytecode and variant in bytecode:
+            entry["bytecode_sha256"] = hashlib.sha256(bytecode[variant]).hexdigest()
+            entry["bytecode_size"] = len(bytecode[variant])
+        files[file_name(variant) + ".teal"] = entry
+    return {"source": source_hash(), "files": files}
+
+
+def write(out, teal, bytecode=None):
+    """Write changed artifacts and the manifest to out, returns the file names written."""
+    os.makedirs(out, exist_ok=True)
+    written = []
+    outputs = [(file_name(v) + ".teal", program.encode()) for v, program in teal.items()]
+    outputs += [(file_name(v) + ".tok", program) for v, program in (bytecode or {}).items()]
+    outputs.append((manifest_name, (json.dumps(manifest(teal, bytecode), indent=2, sort_keys=True) + "\n").encode()))
+    for name, data in outputs:
+        path = os.path.join(out, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    continue  # unchanged, keep the mtime for make style tools
+        with open(path, "wb") as f:
+            f.write(data)
+        written.append(name)
+    return written
+
+
+def check(out, teal):
+    """Stale or missing artifacts in out, compared with teal."""
+    stale = []
+    for variant, program in teal.items():
+        path = os.path.join(out, file_name(variant) + ".teal")
+        if not os.path.exists(path):
+            stale.append(file_name(variant) + ".teal missing")
+            continue
+        with open(path) as f:
+            if f.read() != program:
+                stale.append(file_name(variant) + ".teal out of date")
+    return stale
+
+
+def verify(algod, app_id, bytecode):
+    """[(program, artifact matching what app_id runs, or None)] for its approval and clear programs."""
+    params = algod.request("GET", "/v2/applications/%d" % app_id)["params"]
+    deployed = {
+        "approval": base64.b64decode(params["approval-program"]),
+        "clear": base64.b64decode(params["clear-state-program"]),
+    }
+    rows = []
+    for program in ("approval", "clear"):
+        matches = [file_name(v) for v, code in bytecode.items() if v[0] == program and code == deployed[program]]
+        rows.append((program, matches[0] if matches else None))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="compile degen2's approval and clear programs, cached and in parallel")
+    parser.add_argument("--out", default=default_out, help="artifact directory")
+    parser.add_argument("--cache", default=None, help="compiled TEAL cache, default build/.cache")
+    parser.add_argument("--versions", type=int, nargs="+", default=[teal_version], help="TEAL versions to build")
+    parser.add_argument("--dispatch", choices=("cond", "tree"), nargs="+", default=[default_dispatch], help="routers to build")
+    parser.add_argument("--packed", choices=("no", "yes", "both"), default="no", help="packed governance parameters")
+    parser.add_argument("--factory", action="store_true", help="also build degen2_factory's program")
+    parser.add_argument("--jobs", type=int, default=None, help="compile processes, default one per CPU")
+    parser.add_argument("--check", action="store_true", help="don't write, exit 1 if the artifacts in OUT are stale")
+    parser.add_argument("--algod", default=None, help="assemble to bytecode with this algod's /v2/teal/compile")
+    parser.add_argument("--algod-token", default="a" * 64)
+    parser.add_argument("--verify", type=int, default=None, metavar="APP_ID", help="compare APP_ID's programs with the artifacts")
+    args = parser.parse_args(argv)
+    if args.verify is not None and not args.algod:
+        parser.error("--verify needs --algod")
+
+    packed = {"no": (False,), "yes": (True,), "both": (False, True)}[args.packed]
+    cache = args.cache or default_cache
+    wanted = ("approval", "clear", "factory") if args.factory else ("approval", "clear")
+    teal = build(variants(wanted, args.versions, args.dispatch, packed), cache, args.jobs, sys.stderr)
+
+    if args.check:
+        stale = check(args.out, teal)
+        for line in stale:
+            print("STALE: " + line, file=sys.stderr)
+        return 1 if stale else 0
+
+    bytecode = None
+    if args.algod:
+        from degen2_client import Algod
+        algod = Algod(args.algod, args.algod_token)
+        bytecode = {variant: assemble(algod, program, cache) for variant, program in teal.items()}
+
+    written = write(args.out, teal, bytecode)
+    files = manifest(teal, bytecode)["files"]
+    for name in sorted(files):
+        entry = files[name]
+        print("%-40s %5d bytes  %s%s" % (
+            name, entry.get("bytecode_size", entry["size"]), entry.get("bytecode_sha256", entry["sha256"])[:16],
+            "" if name in written else "  (unchanged)"))
+
+    if args.verify is not None:
+        failed = False
+        for program, match in verify(algod, args.verify, bytecode):
+            print("app %d %s: %s" % (args.verify, program, match + ".tok" if match else "MISMATCH, no artifact matches"))
+            failed = failed or match is None
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
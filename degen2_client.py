@@ -0,0 +1,772 @@
+"""
+Client for the degen2 DAO: builds each method's group the way approval() checks it, signs in a pool and submits
+many groups at once over reused algod connections.
+
+Group layouts (what the contract asserts, fees pooled on the app call for its inner txns):
+    buy / swap1      payments (swap token transfers) into the app..., the call, pad calls for budget
+    local_stake      degen2 transfer into the app, the call
+    stake_vote       degen2 transfer into the app (0 votes with the stake already in), the call
+    restake          degen2 transfer into the app, the call, 1 algo payment into the app if any stake goes back
+    withdraw         1 algo payment into the app, the call
+    token_opt_in     1 algo payment into the app, the call
+    propose          the call, 2 algo payment into the app, the proposal fee in degen2
+    up_px / dn_px    the call
+    delegate         1 algo payment into the app, the call
+    execute          the call, pad calls for asset or box references (pay_tokens, swap_table) and as many more as
+                     simulate says the branch needs for opcode budget
+    fund_rewards     payment into the app, the call
+    claim            the call with the leaf's proof, pad calls for the opcode budget of deep trees
+    close_airdrop    the call, pad calls carrying the rest of the bitmap box references, 8 per call
+    queries          the call alone, simulated: proposal_status, quote, swap_quote, headroom, eligibility
+    factory deploy   payment into the factory, the call (degen2_factory), a pad call with box references for reading
+                     the programs
+
+usage:
+    python degen2_client.py --mock 2000         # bots against degen2_mock_algod in process, groups per second
+    python degen2_client.py --algod http://localhost:4001 --app-id 1001 --state
+    python degen2_client.py --algod http://localhost:4001 --factory 1000 --instances
+"""
+
+import argparse
+import asyncio
+import base64
+import http.client
+import json
+import queue
+import random
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from algosdk import encoding, logic, transaction
+from algosdk.atomic_transaction_composer import AccountTransactionSigner
+
+from degen2_contract import (
+    airdrop_chunk, decode_return, extra_pages, global_schema, local_schema, max_open_proposals, methods, packed_key,
+    packed_params, proposal_states, proposal_types,
+)
+from degen2_factory import (
+    decode_event as decode_factory_event, factory_schema, instance_deployer, instance_fields, instance_programs, kept,
+    load_chunk, methods as factory_methods, program_boxes,
+)
+from degen2_model import airdrop_boxes, airdrop_proof, airdrop_tree, global_keys, local_keys
+
+# opcode cost of buy / swap1 as (base, per payer, per pad call), measured with degen2_interpreter. the contract loops
+# over the whole group, so every payer costs the call budget and every pad call adds 700 but also an iteration
+sell_costs = {
+    "buy": (145, 84, 136),
+    "swap1": (170, 94, 146),
+}
+claim_costs = (310, 61)  # claim's (base, per proof level), the worst case degen2_analyzer reports
+app_budget = 700
+max_group = 16
+min_fee = 1000
+payouts_per_pad = 8  # pay_tokens assets a pad call carries references for
+max_references = 8  # accounts, assets, apps and boxes together, per app call
+
+
+class AlgodError(Exception):
+    """algod answered with an error status, message is its "message"."""
+
+    def __init__(self, status, message):
+        super().__init__("%d: %s" % (status, message))
+        self.status = status
+        self.message = message
+
+
+class Algod:
+    """The few algod REST calls the client needs over a pool of keep-alive connections, safe to share between threads."""
+
+    def __init__(self, address, token="a" * 64, connections=8):
+        url = urllib.parse.urlsplit(address)
+        self.host, self.port = url.hostname, url.port or (443 if url.scheme == "https" else 80)
+        self.https = url.scheme == "https"
+        self.headers = {"X-Algo-API-Token": token}
+        self.pool = queue.LifoQueue()
+        for _ in range(connections):
+            self.pool.put(None)  # connections open lazily
+
+    def request(self, method, path, body=None, content_type="application/json"):
+        connection = self.pool.get()
+        try:
+            for attempt in range(2):  # a pooled connection the server closed gets one retry on a new one
+                if connection is None:
+                    connection_type = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                    connection = connection_type(self.host, self.port, timeout=30)
+                try:
+                    headers = dict(self.headers, **({"Content-Type": content_type} if body is not None else {}))
+                    connection.request(method, path, body, headers)
+                    response = connection.getresponse()
+                    data = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    connection.close()
+                    connection = None
+                    if attempt:
+                        raise
+            result = json.loads(data) if data else {}
+            if response.status >= 400:
+                raise AlgodError(response.status, result.get("message", ""))
+            return result
+        except BaseException:  # whatever state it was left in, the next request gets a fresh connection
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            self.pool.put(connection)
+
+    def params(self):
+        p = self.request("GET", "/v2/transactions/params")
+        return transaction.SuggestedParams(
+            0, p["last-round"], p["last-round"] + 1000, p["genesis-hash"], p["genesis-id"], flat_fee=True,
+            consensus_version=p["consensus-version"], min_fee=p["min-fee"],
+        )
+
+    def send(self, signed):
+        """Submit one signed group, returns the first txid."""
+        raw = b"".join(base64.b64decode(encoding.msgpack_encode(stxn)) for stxn in signed)
+        return self.request("POST", "/v2/transactions", raw, "application/x-binary")["txId"]
+
+    def pending(self, txid):
+        return self.request("GET", "/v2/transactions/pending/" + txid)
+
+    def wait(self, txid, rounds=10):
+        """Pending info of txid once confirmed."""
+        last = self.request("GET", "/v2/status")["last-round"]
+        for _ in range(rounds):
+            info = self.pending(txid)
+            if info.get("confirmed-round"):
+                return info
+            if info.get("pool-error"):
+                raise AlgodError(400, info["pool-error"])
+            last = self.request("GET", "/v2/status/wait-for-block-after/%d" % last)["last-round"]
+        raise AlgodError(408, "%s not confirmed after %d rounds" % (txid, rounds))
+
+    def simulate(self, txns, extra_budget=0):
+        """/v2/transactions/simulate's result for an unsigned group, nothing is committed: "txn-results" with each
+        txn's logs, "app-budget-consumed". extra_budget is opcode budget on top of what the app calls pool."""
+        request = {
+            "allow-empty-signatures": True,
+            "txn-groups": [{"txns": [transaction.SignedTransaction(txn, None).dictify() for txn in txns]}],
+        }
+        if extra_budget:
+            request["extra-opcode-budget"] = extra_budget
+        body = base64.b64decode(encoding.msgpack_encode(request))
+        group = self.request("POST", "/v2/transactions/simulate", body, "application/msgpack")["txn-groups"][0]
+        if group.get("failure-message"):
+            raise AlgodError(400, group["failure-message"])
+        return group
+
+    def global_state(self, app_id):
+        return decode_state(self.request("GET", "/v2/applications/%d" % app_id)["params"].get("global-state", []))
+
+    def box(self, app_id, name):
+        name = urllib.parse.quote(base64.b64encode(name).decode())
+        return base64.b64decode(self.request("GET", "/v2/applications/%d/box?name=b64:%s" % (app_id, name))["value"])
+
+    def compile(self, teal):
+        """Bytecode of teal from /v2/teal/compile."""
+        return base64.b64decode(self.request("POST", "/v2/teal/compile", teal.encode(), "text/plain")["result"])
+
+    def local_state(self, address, app_id):
+        """address's local state in app_id, {} if it isn't opted in."""
+        for app in self.request("GET", "/v2/accounts/" + address).get("apps-local-state", []):
+            if app["id"] == app_id:
+                return decode_state(app.get("key-value", []))
+        return {}
+
+
+def decode_state(state):
+    """algod's TealKeyValue list as {key: int or bytes}."""
+    return {
+        base64.b64decode(kv["key"]): kv["value"]["uint"] if kv["value"]["type"] == 2 else base64.b64decode(kv["value"]["bytes"])
+        for kv in state
+    }
+
+
+def itob(value):
+    return value.to_bytes(8, "big")
+
+
+def proposal_box(proposal_id):
+    return (0, b"p" + itob(proposal_id))
+
+
+def swap_box(asset):
+    return (0, b"s" + itob(asset))
+
+
+def delegate_boxes(*addresses):
+    """Box references of the delegate boxes of addresses, None entries skipped."""
+    return [(0, b"d" + encoding.decode_address(address)) for address in addresses if address]
+
+
+def airdrop_box(airdrop_id, chunk=None):
+    return (0, b"a" + itob(airdrop_id) + (b"" if chunk is None else itob(chunk)))
+
+
+def merkle_airdrop(allocations):
+    """(merkle root, [proof per leaf]) of allocations, [(address, amount)] with leaf index i for allocations[i].
+
+    The root and len(allocations) go in the airdrop proposal, each holder claims with its index, amount and proof.
+    """
+    levels = airdrop_tree({i: (encoding.decode_address(address), amount) for i, (address, amount) in enumerate(allocations)},
+                          len(allocations))
+    return levels[-1][0], [airdrop_proof(levels, i) for i in range(len(allocations))]
+
+
+def swap_list(swaps):
+    """[(asset, ratio, end time)] as the swap_table list argument."""
+    return b"".join(itob(asset) + itob(ratio) + itob(end_time) for asset, ratio, end_time in swaps)
+
+
+def sell_pads(method, payers):
+    """Pad calls buy / swap1 needs next to payers payments to stay in budget."""
+    base, per_payer, per_pad = sell_costs[method]
+    pads = 0
+    while app_budget * (1 + pads) < base + per_payer * payers + per_pad * pads:
+        pads += 1
+    if payers + 1 + pads > max_group:
+        raise ValueError("%d payers don't fit one %s group" % (payers, method))
+    return pads
+
+
+class Client:
+    """Group builders for one deployed app. Builders return unsigned txns with the group id assigned.
+
+    params are fetched once and reused for refresh seconds, every group a bot sends in that window shares them.
+    """
+
+    def __init__(self, algod, app_id, refresh=2.0):
+        self.algod = algod
+        self.app_id = app_id
+        self.app_address = logic.get_application_address(app_id)
+        self.refresh = refresh
+        self._params = (0, None)
+        self._state = None
+
+    @classmethod
+    def create(cls, algod, creator, key, duration, proposal_fee, threshold, swap_token=None, packed=False):
+        """Deploy approval() and mint degen2, swap_token (if any) opens the swap table. Returns the Client of the new app."""
+        from degen2_build import programs as built
+        programs = [algod.compile(teal) for teal in built(packed=packed)]
+        uints, byte_slices = global_schema(packed)
+        txn = transaction.ApplicationCreateTxn(
+            creator, algod.params(), transaction.OnComplete.NoOpOC, programs[0], programs[1],
+            transaction.StateSchema(uints, byte_slices), transaction.StateSchema(*local_schema()),
+            app_args=[duration, proposal_fee, threshold], extra_pages=extra_pages,
+        )
+        txn.fee = min_fee
+        info = algod.wait(algod.send(sign([txn], key)))
+        client = cls(algod, info["application-index"])
+        client.submit_wait([client.pay(creator, client.app_address, 10000000)], key)
+        client.submit_wait(client.create_token(creator, swap_token), key)
+        return client
+
+    # chain reads
+    def params(self):
+        fetched, params = self._params
+        if time.monotonic() - fetched > self.refresh:
+            params = self.algod.params()
+            self._params = (time.monotonic(), params)
+        return params
+
+    def state(self):
+        """Global state by key, the packed parameters unpacked to their separate keys whichever layout the app uses."""
+        state = self.algod.global_state(self.app_id)
+        if packed_key.encode() in state:
+            raw = state.pop(packed_key.encode())
+            for name, offset in packed_params.items():
+                state[global_keys[name]] = int.from_bytes(raw[offset:offset + 8], "big")
+        self._state = state
+        return state
+
+    def delegate_of(self, address):
+        """address's delegate, None if it has none. Builders that move stake or vote take it as delegate=."""
+        named = self.algod.local_state(address, self.app_id).get(local_keys["delegate"])
+        if not named or named == bytes(32):
+            return None
+        return encoding.encode_address(named)
+
+    # read-only queries, simulated: the contract's own answer in one call instead of state reads and client side math.
+    # sender only pays the (simulated) fee, any funded account will do
+    def query(self, name, sender, *args, **refs):
+        """{field: value} queries[name] returns for args, refs are call()'s accounts / assets / boxes."""
+        logs = self.algod.simulate([self.call(sender, methods[name], *args, **refs)])["txn-results"][0]["txn-result"].get("logs", [])
+        for record in map(base64.b64decode, logs):
+            values = decode_return(name, record)
+            if values is not None:
+                return values
+        raise AlgodError(500, "%s returned nothing" % name)
+
+    def proposal_status(self, sender, proposal_id):
+        """The proposal's fields and status, one of proposal_states."""
+        values = self.query("proposal_status", sender, proposal_id, boxes=[proposal_box(proposal_id)])
+        values["status"] = proposal_states[values["status"]]
+        return values
+
+    def quote(self, sender, microalgo):
+        """degen2 a buy paying microalgo gets, available if there's enough unstaked degen2 for it."""
+        return self.query("quote", sender, microalgo, assets=[self.degen2()])
+
+    def swap_quote(self, sender, token, amount):
+        return self.query("swap_quote", sender, token, amount, assets=[self.degen2()], boxes=[swap_box(token)])
+
+    def headroom(self, sender):
+        """degen2 the app holds, and what of it buy and swap1 can still sell."""
+        return self.query("headroom", sender, assets=[self.degen2()])
+
+    def eligibility(self, sender, voter, proposal_id):
+        """Whether voter can vote on the proposal now, and the weight it would vote with."""
+        return self.query(
+            "eligibility", sender, proposal_id, accounts=[voter],
+            boxes=[proposal_box(proposal_id)] + delegate_boxes(voter),
+        )
+
+    def degen2(self):
+        if self._state is None or not self._state.get(b"d2"):
+            self.state()
+        return self._state[b"d2"]
+
+    # txns
+    def _txn(self, txn, fee=min_fee):
+        txn.fee = fee
+        return txn
+
+    def pay(self, sender, receiver, amount):
+        return self._txn(transaction.PaymentTxn(sender, self.params(), receiver, amount))
+
+    def axfer(self, sender, receiver, asset, amount):
+        return self._txn(transaction.AssetTransferTxn(sender, self.params(), receiver, amount, asset))
+
+    def call(self, sender, *args, inner=0, accounts=(), assets=(), apps=(), boxes=(),
+             on_complete=transaction.OnComplete.NoOpOC):
+        """App call paying for inner inner txns on top of its own fee."""
+        return self._txn(
+            transaction.ApplicationCallTxn(
+                sender, self.params(), self.app_id, on_complete, app_args=list(args) or None,
+                accounts=list(accounts) or None, foreign_assets=list(assets) or None, foreign_apps=list(apps) or None,
+                boxes=list(boxes) or None,
+            ),
+            min_fee * (1 + inner),
+        )
+
+    def pad(self, sender, assets=(), boxes=()):
+        return self.call(sender, methods["pad"], assets=assets, boxes=boxes)
+
+    @staticmethod
+    def group(txns):
+        if len(txns) > 1:
+            for txn in txns:
+                txn.group = None  # assign_group_id won't regroup txns that already have one
+            transaction.assign_group_id(txns)
+        return txns
+
+    def fit_budget(self, txns, sender):
+        """txns with pad calls from sender added until the app calls pool the opcode budget simulate says it costs.
+
+        The group is simulated with a full group's worth of extra budget, so a cost over what it pools shows up as a
+        number rather than a failure. Pad calls cost a little themselves, hence the loop. Other failures raise.
+        """
+        txns = list(txns)
+        while True:
+            result = self.algod.simulate(self.group(txns), extra_budget=max_group * app_budget)
+            calls = sum(1 for txn in txns if isinstance(txn, transaction.ApplicationCallTxn))
+            short = result["app-budget-consumed"] - calls * app_budget
+            if short <= 0:
+                return txns
+            pads = -(-short // app_budget)
+            if len(txns) + pads > max_group:
+                raise ValueError("needs %d more opcode budget than a full group pools" % short)
+            txns += [self.pad(sender) for _ in range(pads)]
+
+    # groups, one per method
+    def opt_in(self, sender):
+        return [self.call(sender, on_complete=transaction.OnComplete.OptInOC)]
+
+    def opt_in_degen2(self, sender):
+        return [self.axfer(sender, sender, self.degen2(), 0)]
+
+    def create_token(self, creator, swap_token=None):
+        if swap_token is None:
+            return [self.call(creator, methods["create_token"], inner=1)]
+        return [self.call(creator, methods["create_token"], swap_token, inner=1, boxes=[swap_box(swap_token)])]
+
+    def buy(self, payments, sender=None):
+        """payments: [(payer, microalgo)], sender makes the call (the first payer if None)."""
+        return self._sell("buy", [self.pay(payer, self.app_address, amount) for payer, amount in payments], payments, sender)
+
+    def swap1(self, token, payments, sender=None):
+        """payments: [(payer, amount of token)], token one in the swap table."""
+        txns = [self.axfer(payer, self.app_address, token, amount) for payer, amount in payments]
+        return self._sell("swap1", txns, payments, sender, token)
+
+    def _sell(self, method, txns, payments, sender, *args):
+        sender = sender or payments[0][0]
+        pads = sell_pads(method, len(payments))
+        boxes = [swap_box(token) for token in args]
+        call = self.call(sender, methods[method], *args, inner=len(payments), assets=[self.degen2()], boxes=boxes)
+        return self.group(txns + [call] + [self.pad(sender) for _ in range(pads)])
+
+    # delegate= below is the sender's current delegate (delegate_of), its box is referenced so the delegated total
+    # follows the stake
+    def local_stake(self, sender, amount, delegate=None):
+        d2 = self.degen2()
+        return self.group([
+            self.axfer(sender, self.app_address, d2, amount),
+            self.call(sender, methods["local_stake"], inner=1, boxes=delegate_boxes(delegate)),
+        ])
+
+    def stake_vote(self, sender, amount, proposal_id, up=True, delegate=None):
+        """Stake amount more and vote with the whole stake, one group instead of local_stake then up_px / dn_px."""
+        return self.group([
+            self.axfer(sender, self.app_address, self.degen2(), amount),
+            self.call(sender, methods["stake_vote"], proposal_id, methods["up_px" if up else "dn_px"], inner=1,
+                      boxes=[proposal_box(proposal_id)] + delegate_boxes(sender, delegate)),
+        ])
+
+    def restake(self, sender, deposit, withdrawn, delegate=None):
+        """Stake deposit and take withdrawn back in one group, rewards are paid once."""
+        d2 = self.degen2()
+        txns = [self.axfer(sender, self.app_address, d2, deposit),
+                self.call(sender, methods["restake"], withdrawn, inner=2 if withdrawn else 1, assets=[d2],
+                          boxes=delegate_boxes(delegate))]
+        if withdrawn:
+            txns.append(self.pay(sender, self.app_address, 1000000))
+        return self.group(txns)
+
+    def withdraw(self, sender, amount, delegate=None):
+        return self.group([
+            self.pay(sender, self.app_address, 1000000),
+            self.call(sender, methods["withdraw"], amount, inner=2, assets=[self.degen2()], boxes=delegate_boxes(delegate)),
+        ])
+
+    def delegate(self, sender, target=None, delegate=None):
+        """Count sender's stake in target's votes from now on, target None takes it back. delegate is the current one."""
+        return self.group([
+            self.pay(sender, self.app_address, 1000000),
+            self.call(sender, methods["delegate"], accounts=[target or sender],
+                      boxes=delegate_boxes(target if target != sender else None, delegate)),
+        ])
+
+    def token_opt_in(self, sender, asset):
+        return self.group([
+            self.pay(sender, self.app_address, 1000000),
+            self.call(sender, methods["token_opt_in"], inner=1, assets=[asset]),
+        ])
+
+    def token_opt_out(self, sender, asset):
+        return [self.call(sender, methods["token_opt_out"], inner=1, assets=[asset])]
+
+    def propose(self, sender, text, kind, value, index, receiver, payouts=None, swaps=None, root=None):
+        """kind is a proposal_types name (or any other short string for a text proposal). payouts: [(asset, amount)]
+        for pay_tokens, swaps: [(asset, ratio, end time)] for swap_table, ratio 0 retires the asset, root the
+        merkle_airdrop root for an airdrop of value degen2 over index leaves.
+        The proposal id is next_proposal at build time, another propose landing first makes it fail."""
+        state = self.state()
+        proposal_id = state[b"pn"]
+        args = [methods["propose"], text, proposal_types.get(kind, kind), value, index]
+        if payouts is not None:
+            args.append(b"".join(itob(asset) + itob(amount) for asset, amount in payouts))
+        if swaps is not None:
+            args.append(swap_list(swaps))
+        if root is not None:
+            args.append(root)
+        d2 = state[b"d2"]
+        return self.group([
+            self.call(
+                sender, *args, accounts=[receiver], assets=[index if kind == "pay_token" else d2],
+                boxes=[proposal_box(proposal_id), proposal_box(proposal_id - max_open_proposals)],
+            ),
+            self.pay(sender, self.app_address, 2000000),
+            self.axfer(sender, self.app_address, d2, state[global_keys["proposal_fee"]]),
+        ])
+
+    def vote(self, sender, proposal_id, up=True, delegate=None):
+        """Votes with sender's stake and whatever is delegated to it, or overrides delegate's vote with sender's own."""
+        boxes = [proposal_box(proposal_id)] + delegate_boxes(sender, delegate)
+        return [self.call(sender, methods["up_px" if up else "dn_px"], proposal_id, boxes=boxes)]
+
+    def execute(self, sender, proposal_id, receiver, asset=None, payouts=None, delegate=None, swaps=None, fit=True):
+        """asset is the pay_token asset (degen2 otherwise), payouts the pay_tokens list exactly as proposed. delegate
+        is the receiver's, a slash_stake takes the slashed stake off its delegated total. swaps the swap_table list
+        exactly as proposed, for start_swap1 pass the asset.
+
+        Pad calls carry the references past the call's own, then fit_budget adds any more the branch needs for
+        opcode budget. fit=False skips the simulate round trip and builds the group offline, pay_tokens padded from
+        an estimate, swap_table and the rest not at all."""
+        asset = asset or self.degen2()
+        if swaps is not None:
+            boxes = [proposal_box(proposal_id)] + [swap_box(entry[0]) for entry in swaps]
+            room = max_references - 2  # the call's receiver and asset
+            chunks = [boxes[:room]] + [boxes[i:i + max_references] for i in range(room, len(boxes), max_references)]
+            if len(chunks) > max_group:
+                raise ValueError("%d swaps don't fit one execute group" % len(swaps))
+            txns = [
+                self.call(sender, methods["execute"], proposal_id, swap_list(swaps), inner=1, accounts=[receiver],
+                          assets=[asset], boxes=chunks[0]),
+            ] + [self.pad(sender, boxes=chunk) for chunk in chunks[1:]]
+        elif payouts is None:
+            txns = [self.call(
+                sender, methods["execute"], proposal_id, inner=2, accounts=[receiver], assets=[asset],
+                boxes=[proposal_box(proposal_id), swap_box(asset), airdrop_box(proposal_id)] + delegate_boxes(delegate),
+            )]
+        else:
+            payout_list = b"".join(itob(a) + itob(amount) for a, amount in payouts)
+            assets = sorted({a for a, _ in payouts} | {self.degen2()})
+            room = max_references - 2  # the receiver and the proposal box
+            pads = [assets[i:i + payouts_per_pad] for i in range(room, len(assets), payouts_per_pad)]
+            if not fit:  # about 8 payouts per 700 budget
+                pads += [[] for _ in range(len(payouts) // payouts_per_pad - len(pads))]
+            if 1 + len(pads) > max_group:
+                raise ValueError("%d payouts don't fit one execute group" % len(payouts))
+            txns = [
+                self.call(
+                    sender, methods["execute"], proposal_id, payout_list, inner=1 + len(payouts), accounts=[receiver],
+                    assets=assets[:room], boxes=[proposal_box(proposal_id)],
+                ),
+            ] + [self.pad(sender, chunk) for chunk in pads]
+        return self.fit_budget(txns, sender) if fit else self.group(txns)
+
+    def fund_rewards(self, sender, amount):
+        return self.group([self.pay(sender, self.app_address, amount), self.call(sender, methods["fund_rewards"])])
+
+    def claim(self, sender, airdrop_id, index, amount, proof, fit=True):
+        """Claim leaf index of airdrop airdrop_id (the proposal's id), proof from merkle_airdrop. fit=False pads
+        from claim_costs instead of simulating."""
+        call = self.call(
+            sender, methods["claim"], airdrop_id, index, amount, proof, inner=1, assets=[self.degen2()],
+            boxes=[airdrop_box(airdrop_id), airdrop_box(airdrop_id, index // airdrop_chunk)],
+        )
+        if fit:
+            return self.fit_budget([call], sender)
+        base, per_level = claim_costs
+        pads = -(-(base + per_level * (len(proof) // 32)) // app_budget) - 1
+        return self.group([call] + [self.pad(sender) for _ in range(pads)])
+
+    def close_airdrop(self, sender, airdrop_id, count):
+        """Close airdrop airdrop_id of count leaves after its window, every bitmap box it can have is referenced."""
+        boxes = [(0, name) for name in airdrop_boxes(airdrop_id, count)]
+        return self.group([self.call(sender, methods["close_airdrop"], airdrop_id, boxes=boxes[:8])] + [
+            self.pad(sender, boxes=boxes[i:i + 8]) for i in range(8, len(boxes), 8)])
+
+    # submission
+    def submit_wait(self, group, key):
+        return self.algod.wait(self.algod.send(sign(group, key)))
+
+    async def submit_many(self, signed_groups, concurrency=32):
+        """Send signed groups concurrently, returns a txid or the AlgodError per group, in order."""
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(concurrency) as pool:
+            async def send(signed):
+                try:
+                    return await loop.run_in_executor(pool, self.algod.send, signed)
+                except AlgodError as e:
+                    return e
+            return await asyncio.gather(*(send(signed) for signed in signed_groups))
+
+
+class Factory(Client):
+    """Group builders for a degen2_factory app, Client's params, pad calls and submission aimed at it.
+
+    The DAO's programs are compiled and uploaded once, when the factory is created, and every deploy after that
+    creates a DAO from the factory's copy: one group, no compile.
+    """
+
+    def __init__(self, algod, app_id, packed=False, refresh=2.0):
+        super().__init__(algod, app_id, refresh)
+        self.packed = packed  # the factory was built with approval(packed=True), it deploys packed DAOs
+
+    @classmethod
+    def create(cls, algod, creator, key, packed=False, funding=10000000):
+        """Deploy degen2_factory and upload the DAO's programs, funding pays for their boxes. Returns the Factory."""
+        from degen2_build import factory_program, programs as built
+        clear = algod.compile(built()[1])
+        txn = transaction.ApplicationCreateTxn(
+            creator, algod.params(), transaction.OnComplete.NoOpOC, algod.compile(factory_program(packed)), clear,
+            transaction.StateSchema(*factory_schema()), transaction.StateSchema(0, 0),
+        )
+        txn.fee = min_fee
+        info = algod.wait(algod.send(sign([txn], key)))
+        factory = cls(algod, info["application-index"], packed)
+        factory.submit_wait([factory.pay(creator, factory.app_address, funding)], key)
+        for group in factory.upload(creator, algod.compile(built(packed=packed)[0]), clear):
+            factory.submit_wait(group, key)
+        return factory
+
+    def upload(self, creator, approval, clear):
+        """A group per program loading the DAO's assembled approval and clear into the factory's boxes."""
+        groups = []
+        for name, program in ((program_boxes["approval"], approval), (program_boxes["clear"], clear)):
+            boxes = [(0, name.encode())] + [(0, b"")] * 3  # 4096 bytes of box reads and writes per call
+            groups.append(self.group([
+                self.call(
+                    creator, factory_methods["load"], name, len(program), offset, program[offset:offset + load_chunk],
+                    boxes=boxes,
+                )
+                for offset in range(0, len(program), load_chunk)
+            ]))
+        return groups
+
+    def deploy(self, sender, duration, proposal_fee, threshold, swap_token=None, funding=10000000):
+        """The group deploying a DAO with these create args, funding is what its account starts with.
+
+        With a swap token the call references the new DAO's swap box, the app id is the one a simulate of the group
+        creates: a deploy by someone else in between makes the sent group fail, build it again.
+        """
+        args = [factory_methods["deploy"], duration, proposal_fee, threshold] + ([swap_token] if swap_token else [])
+        registry = b"i" + itob(self.algod.global_state(self.app_id).get(b"n", 0))
+        boxes = [(0, program_boxes["approval"].encode()), (0, program_boxes["clear"].encode()), (0, registry)]
+        # box reads and writes of 2048 * (1 + extra_pages) program bytes, the registry and swap boxes, 1024 per reference
+        pad = self.pad(sender, boxes=[(0, b"")] * 8)
+
+        def build(apps=(), swap=()):
+            assets = [swap_token] if swap_token else []
+            room = 8 - len(assets) - len(apps) - len(boxes) - len(swap)  # references a txn can carry
+            call = self.call(sender, *args, inner=6 if swap_token else 4, assets=assets, apps=apps,
+                             boxes=boxes + list(swap) + [(0, b"")] * room)
+            return self.group([self.pay(sender, self.app_address, kept(self.packed) + funding), call, pad])
+
+        group = build()
+        if not swap_token:
+            return group
+        inner = self.algod.simulate(group)["txn-results"][1]["txn-result"]["inner-txns"]
+        created = inner[0]["application-index"]
+        return build([created], [(created, b"s" + itob(swap_token))])
+
+    def deployed(self, group):
+        """Client of the DAO a confirmed deploy group created."""
+        for record in map(base64.b64decode, self.algod.pending(group[1].get_txid()).get("logs", [])):
+            event = decode_factory_event(record)
+            if event is not None:
+                return Client(self.algod, event[2]["app"])
+        raise AlgodError(500, "deploy logged nothing")
+
+    def creator_token_opt_in(self, sender, instance, asset):
+        """The deployer of registry instance opting its DAO in to asset, within the DAO's opt in window."""
+        registry = b"i" + itob(instance)
+        record = self.algod.box(self.app_id, registry)
+        app = int.from_bytes(record[instance_fields["app"]:instance_fields["app"] + 8], "big")
+        return [self.call(sender, factory_methods["opt_in"], instance, inner=2, assets=[asset], apps=[app],
+                          boxes=[(0, registry)])]
+
+    def instances(self):
+        """[(app id, deployer, created time, programs_hash)] of every DAO the factory deployed, in order."""
+        count = self.algod.global_state(self.app_id).get(b"n", 0)
+        rows = []
+        for instance in range(count):
+            record = self.algod.box(self.app_id, b"i" + itob(instance))
+            app, created = (
+                int.from_bytes(record[instance_fields[name]:instance_fields[name] + 8], "big") for name in ("app", "created")
+            )
+            deployer = encoding.encode_address(record[instance_deployer:instance_deployer + 32])
+            rows.append((app, deployer, created, record[instance_programs:instance_programs + 32]))
+        return rows
+
+
+def sign(group, keys):
+    """Signed txns of a group, keys is one private key or {address: key}."""
+    signed = []
+    for txn in group:
+        key = keys if isinstance(keys, str) else keys[txn.sender]
+        signed.extend(AccountTransactionSigner(key).sign_transactions([txn], [0]))
+    return signed
+
+
+def sign_many(groups, keys, executor=None):
+    """sign() every group on executor (a thread or process pool, or inline if None)."""
+    if executor is None:
+        return [sign(group, keys) for group in groups]
+    return list(executor.map(sign, groups, [keys] * len(groups)))
+
+
+def bots(client, keys, groups, rng):
+    """Random valid-looking groups from a few bots: buys, stakes, votes and withdrawals."""
+    addresses = list(keys)
+    for _ in range(groups):
+        roll = rng.random()
+        bot = rng.choice(addresses)
+        if roll < 0.4:
+            payers = rng.sample(addresses, rng.randint(1, 8))
+            yield client.buy([(payer, 10000 * rng.randint(1, 100)) for payer in payers])
+        elif roll < 0.7:
+            yield client.local_stake(bot, rng.randint(0, 10))
+        elif roll < 0.9:
+            yield client.fund_rewards(bot, rng.randint(1, 10) * 1000)
+        else:
+            yield client.withdraw(bot, 0)
+
+
+def mock_run(groups, users=8, seed=0, out=sys.stdout):
+    """Deploy to an in-process degen2_mock_algod, opt bots in, then push groups at it concurrently."""
+    import threading
+    from algosdk import account
+    from degen2_mock_algod import MockAlgod
+    server = MockAlgod()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    algod = Algod(server.url, connections=16)
+    keys = {}
+    for _ in range(users):
+        key, address = account.generate_account()
+        keys[address] = key
+        server.fund(address, 10**13)
+    creator = next(iter(keys))
+    swap_token = server.ledger.create_asset(encoding.decode_address(creator), 10**9)
+    client = Client.create(algod, creator, keys[creator], 3 * 24 * 3600, 10, 4200001, swap_token)
+    for address in keys:
+        client.submit_wait(client.opt_in(address), keys)
+        client.submit_wait(client.opt_in_degen2(address), keys)
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    unsigned = list(bots(client, keys, groups, rng))
+    built = time.perf_counter()
+    with ThreadPoolExecutor(8) as executor:
+        signed = sign_many(unsigned, keys, executor)
+    signed_at = time.perf_counter()
+    results = asyncio.run(client.submit_many(signed))
+    done = time.perf_counter()
+    failed = [r for r in results if isinstance(r, AlgodError)]
+    out.write("%d groups: built %.2fs, signed %.2fs, submitted %.2fs (%.0f groups/s), %d rejected\n" % (
+        groups, built - start, signed_at - built, done - signed_at, groups / (done - signed_at), len(failed)))
+    for error in failed[:3]:
+        out.write("  %s\n" % error.message)
+    server.shutdown()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="degen2 DAO client")
+    parser.add_argument("--mock", type=int, metavar="GROUPS", help="run bots against an in-process mock algod")
+    parser.add_argument("--algod", default="http://localhost:4001")
+    parser.add_argument("--algod-token", default="a" * 64)
+    parser.add_argument("--app-id", type=int)
+    parser.add_argument("--state", action="store_true", help="print the app's global state")
+    parser.add_argument("--factory", type=int, metavar="APP_ID", help="a degen2_factory app instead of --app-id")
+    parser.add_argument("--instances", action="store_true", help="print the DAOs the factory deployed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.mock:
+        mock_run(args.mock, seed=args.seed)
+        return 0
+    if args.factory:
+        factory = Factory(Algod(args.algod, args.algod_token), args.factory)
+        if args.instances:
+            for app_id, deployer, created, programs in factory.instances():
+                print("%-12d %s %s %s" % (
+                    app_id, deployer, time.strftime("%Y-%m-%d %H:%M", time.gmtime(created)), programs.hex()[:16]))
+        return 0
+    if not args.app_id:
+        parser.error("--app-id is required")
+    client = Client(Algod(args.algod, args.algod_token), args.app_id)
+    if args.state:
+        for key, value in sorted(client.state().items()):
+            print("%-14s %s" % (key.decode(errors="replace"), value.hex() if isinstance(value, bytes) else value))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
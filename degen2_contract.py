@@ -3,6 +3,8 @@ from pyteal.ast.bytes import Bytes
 from pyteal_helpers import program
 
 version = "2.1.0"  
+teal_version = 9  # 9+ for group resource sharing, batch payouts reference more assets than one call can
+extra_pages = 2  # approval + clear outgrew 4096 bytes with the swap table (tree dispatch), 2048 more per page
 
 # Release notes:
 # upgraded from 2.0 to 2.1 because the contract methods have changed to conserve space
@@ -26,118 +28,534 @@ I need to reserve all staked tokens, meaning that every time someone stakes I ne
 tokens cannot leave the contract if the balance is less than total stake no buy swap or propose
 """
 
-def approval():
+# application_args[0] of every no_op call, shared with the off-chain tools (analyzer, clients)
+methods = {
+    "create_token": "ct",
+    "creator_token_opt_in": "ci",
+    "token_opt_in": "oi",
+    "token_opt_out": "oo",
+    "swap1": "sw",
+    "buy": "b",
+    "propose": "pr",
+    "up_px": "u",
+    "dn_px": "d",
+    "local_stake": "ls",
+    "execute": "x",
+    "withdraw": "w",
+    "pad": "z",
+    "fund_rewards": "fr",
+    "stake_vote": "sv",
+    "restake": "rs",
+    "delegate": "dl",
+    "proposal_status": "qp",
+    "quote": "qb",
+    "swap_quote": "qs",
+    "headroom": "qh",
+    "eligibility": "qe",
+    "claim": "cl",
+    "close_airdrop": "ca",
+}
+
+# application_args[2] of propose, stored in the proposal box and branched on by execute
+proposal_types = {
+    "start_swap1": "sp",
+    "clawback": "cb",
+    "slash_stake": "ss",
+    "change_proposal_fee": "cp",
+    "change_duration": "cd",
+    "change_threshold": "ch",
+    "change_price": "cr",
+    "pay_algo": "pa",
+    "pay_token": "n",
+    "pay_tokens": "pb",
+    "share_treasury": "sh",
+    "swap_table": "sx",
+    "airdrop": "ad",
+}
+
+# proposals live in boxes "p" + itob(id), uint64 fields at these offsets, then the receiver, the pay_tokens
+# payout hash and the proposal text. shared with the off-chain tools
+proposal_fields = {
+    "type": 0,  # Btoi of the proposal_types selector
+    "value": 8,
+    "index": 16,
+    "end_time": 24,
+    "upvotes": 32,
+    "dnvotes": 40,
+}
+proposal_receiver = 48  # 32 bytes
+proposal_payout_hash = 80  # 32 bytes, zeros unless pay_tokens / swap_table, an airdrop's merkle root
+proposal_text = 112
+max_open_proposals = 8  # each account's lv holds the last id voted on per slot id % 8, so 8 can be open at once
+# pn (next_proposal) is the proposal epoch: tallies and the receiver live in the id's own box, and a slot holding an
+# older id (lv, delegate boxes) counts as empty, so execute deletes one box and nothing is reset. the double vote check
+# compares ids, never timestamps, a duration change during a vote can't open or close anyone's slot
+
+# stake delegation: an account's dg local names its delegate, whose votes count the account's stake with its own.
+# each delegate has a box "d" + its address, uint64s at these offsets, then one 24 byte slot per vote slot
+# (id % max_open_proposals): the proposal id, the side the delegate voted (0 not yet, 1 up, 2 down) and a weight,
+# before it votes the delegated stake that voted itself and is left out, after it the delegated stake it counted
+delegate_fields = {
+    "delegated": 0,  # current stake of every account naming this delegate
+    "locked_until": 8,  # end time of the last proposal it voted on, its delegators' stake can't move before then
+}
+delegate_slots = 16
+delegate_box_size = delegate_slots + 24 * max_open_proposals
+
+# swap table: a box "s" + itob(asset id) for each token swap1 takes, uint64s at these offsets. start_swap1 sets one
+# entry for a week, swap_table a whole list of (asset id, ratio, end time) entries, a ratio of 0 retires the token
+swap_fields = {
+    "ratio": 0,  # swap token units per degen2
+    "end_time": 8,  # swaps close at this time
+}
+swap_box_size = 16
+swap_entry = 24  # bytes per swap_table list entry
+
+# merkle airdrops: an airdrop proposal commits to the root of a sha256 tree of (address, amount) allocations, value
+# degen2 in total over index leaves. each leaf is sha256(address || itob(leaf index) || itob(amount)), a parent
+# sha256(left || right). execute reserves the total in a box "a" + itob(proposal id), the root then uint64s at these
+# offsets, and holders claim their own leaf with the sibling hashes up to the root, one per level. claimed leaves are
+# bits in boxes "a" + itob(id) + itob(leaf index // airdrop_chunk), airdrop_chunk / 8 bytes each, made on first use.
+# once the window is over close_airdrop gives back what's unclaimed and deletes the boxes
+airdrop_fields = {
+    "remaining": 32,  # degen2 reserved and not claimed yet
+    "end_time": 40,  # claims close at this time
+    "count": 48,  # leaves, claims have a lower index
+}
+airdrop_box_size = 56
+airdrop_chunk = 8192  # leaves per claimed bitmap box, 1024 bytes, one box reference
+max_airdrop_chunks = 64  # close_airdrop references every bitmap box in one group, 8 per call
+airdrop_window = 3600 * 24 * 7 * 26
+
+# approval(packed=True) keeps the governance parameters in one bytes global instead of a uint64 key each,
+# uint64s at these offsets. 4 fewer schema slots, (5 * 28500 - 50000) microalgo less min balance for the creator
+packed_key = "g"
+packed_params = {
+    "duration": 0,
+    "cooldown": 8,
+    "threshold": 16,
+    "price": 24,
+    "proposal_fee": 32,
+}
+
+# log() record of every state changing call, so an indexer can follow the DAO from the txn stream alone:
+# the method or proposal type selector zero padded to 2 bytes, an account (32 bytes), then these uint64s in order
+events = {
+    "buy": ("bought",),  # one per payer, the account is the payer
+    "swap1": ("bought",),
+    "local_stake": ("amount", "stake", "total_stake"),
+    "withdraw": ("amount", "stake", "total_stake"),
+    "propose": ("proposal", "type", "value", "index", "end_time"),
+    "up_px": ("proposal", "stake", "upvotes"),
+    "dn_px": ("proposal", "stake", "dnvotes"),
+    "execute": ("proposal", "executed"),  # executed is 0 when it only cleaned up
+    "slash_stake": ("proposal", "amount", "stake", "total_stake"),  # the account is the slashed receiver
+    "fund_rewards": ("amount", "reward_per_share"),
+    "delegate": ("stake", "delegated"),  # the account is the new delegate, the sender itself when it took its stake back
+    "override": ("proposal", "side", "stake", "tally"),  # a delegator voted itself, the account is its delegate
+    "swap_table": ("asset", "ratio", "end_time"),  # one per entry set, by start_swap1 and swap_table too
+    "airdrop": ("proposal", "amount", "count", "end_time"),  # the account is the executor
+    "claim": ("airdrop", "index", "amount", "remaining"),
+    "close_airdrop": ("airdrop", "remaining"),  # remaining went back to the treasury
+}
+event_selectors = {"override": "vo"}  # events that aren't a method or proposal type
+# swap_table's execute logs an event per entry next to its own, within the 1024 bytes of logs a call has: propose
+# takes at most this many entries
+max_swap_entries = (1024 - (34 + 8 * len(events["execute"]))) // (34 + 8 * len(events["swap_table"]))
+
+# read-only methods for clients, meant for simulate: they change nothing and log one ABI style return, return_prefix
+# then these uint64s in order (an ABI (uint64,...) tuple), computed with the same predicates the state changing calls use
+return_prefix = bytes.fromhex("151f7c75")
+queries = {
+    "proposal_status": ("status", "type", "value", "index", "end_time", "upvotes", "dnvotes"),  # args: id
+    "quote": ("degen2", "price", "available"),  # args: microalgo, assets: degen2
+    "swap_quote": ("degen2", "ratio", "end_time", "available"),  # args: token, amount, assets: degen2, boxes: "s" + token
+    "headroom": ("balance", "total_stake", "reserved", "headroom"),  # assets: degen2
+    "eligibility": ("eligible", "weight", "voted", "locked_until"),  # args: id, accounts: the voter, boxes: "d" + voter
+}
+# proposal_status's status: no such box, votes still open (before end_time), execute would run the proposal now,
+# execute would only clean up (didn't pass, or the cooldown is over)
+proposal_states = ("none", "voting", "passed", "failed")
+
+reward_scale = 10**9  # fixed point of the reward per share accumulator, microalgo * reward_scale per staked degen2
+
+# rough share of no_op traffic per method, hot ones get shallower leaves in the dispatch tree (default 1)
+method_weights = {
+    "up_px": 40,
+    "dn_px": 40,
+    "buy": 20,
+    "local_stake": 8,
+    "stake_vote": 8,
+    "withdraw": 4,
+    "swap1": 4,
+}
+
+
+def global_schema(packed=False):
+    """(uints, byte slices) of the global state schema to create the app with."""
+    if packed:
+        return 12 - len(packed_params), 1
+    return 12, 0
+
+
+def local_schema():
+    """(uints, byte slices) of the local state schema: s, lk, rc and lv, dg."""
+    return 3, 2
+
+
+def event_prefix(name):
+    """First 2 bytes of the log record of events[name]."""
+    selector = methods.get(name) or proposal_types.get(name) or event_selectors[name]
+    return selector.encode().ljust(2, b"\0")
+
+
+def decode_event(record):
+    """(event name, account, {field: value}) of a log record, None if it isn't one of events."""
+    for name, fields in events.items():
+        if record[:2] == event_prefix(name) and len(record) == 34 + 8 * len(fields):
+            values = [int.from_bytes(record[34 + 8 * i:42 + 8 * i], "big") for i in range(len(fields))]
+            return name, record[2:34], dict(zip(fields, values))
+    return None
+
+
+def decode_return(name, record):
+    """{field: value} of the return log of queries[name], None if record isn't one."""
+    fields = queries[name]
+    if record[:4] != return_prefix or len(record) != 4 + 8 * len(fields):
+        return None
+    return {field: int.from_bytes(record[4 + 8 * i:12 + 8 * i], "big") for i, field in enumerate(fields)}
+
+
+def selector_key(selector):
+    """Integer the dispatch tree compares against, Btoi of the selector bytes."""
+    return int.from_bytes(selector.encode(), "big")
+
+
+def dispatch(selector, branches, strict=True):
+    """Route on a uint64 selector with a weight-balanced binary search over the branch keys.
+
+    branches is a list of (selector string, weight, expr). A call pays one < per tree level plus one == at the leaf
+    instead of one == per method listed before it in a Cond, and heavy branches end up closer to the root.
+    strict fails on an unknown selector, otherwise it falls through and does nothing.
+    """
+    branches = sorted(branches, key=lambda branch: selector_key(branch[0]))
+
+    def build(branches):
+        if len(branches) == 1:
+            key, _, expr = branches[0]
+            if strict:
+                return Seq([Assert(selector == Int(selector_key(key))), expr])
+            return If(selector == Int(selector_key(key)), expr)
+        total = sum(weight for _, weight, _ in branches)
+        split, left = 1, branches[0][1]
+        while split < len(branches) - 1 and abs(total - 2 * (left + branches[split][1])) < abs(total - 2 * left):
+            left += branches[split][1]
+            split += 1
+        return If(selector < Int(selector_key(branches[split][0])), build(branches[:split]), build(branches[split:]))
+
+    return build(branches)
+
+# inner transactions, emitted once as subroutines instead of a Begin/SetFields/Submit block per handler
+@Subroutine(TealType.none)
+def inner_asset_transfer(receiver, amount, asset):
+    return Seq([
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.AssetTransfer,
+            TxnField.xfer_asset: asset,
+            TxnField.asset_amount: amount,
+            TxnField.asset_receiver: receiver,
+        }),
+        InnerTxnBuilder.Submit(),
+    ])
+
+
+def send_asset(receiver, amount, asset, sender=None, close_to=None):
+    """Asset transfer from the contract, or a clawback from sender / close out to close_to.
+
+    Plain transfers share inner_asset_transfer; clawback and close out have one call site each,
+    a subroutine with two more args would be bigger than building them inline.
+    """
+    if sender is None and close_to is None:
+        return inner_asset_transfer(receiver, amount, asset)
+    fields = {
+        TxnField.type_enum: TxnType.AssetTransfer,
+        TxnField.xfer_asset: asset,
+        TxnField.asset_amount: amount,
+        TxnField.asset_receiver: receiver,
+    }
+    if sender is not None:
+        fields[TxnField.asset_sender] = sender
+    if close_to is not None:
+        fields[TxnField.asset_close_to] = close_to
+    return Seq([
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields(fields),
+        InnerTxnBuilder.Submit(),
+    ])
+
+
+@Subroutine(TealType.none)
+def send_algo(receiver, amount):
+    return Seq([
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.Payment,
+            TxnField.receiver: receiver,
+            TxnField.amount: amount,
+        }),
+        InnerTxnBuilder.Submit(),
+    ])
+
+
+def emit(name, account, *values):
+    """log() the events[name] record, values in the order of its fields."""
+    assert len(values) == len(events[name]), name
+    return Log(Concat(Bytes(event_prefix(name)), account, *[Itob(value) for value in values]))
+
+
+def returns(name, *values):
+    """log() the return of queries[name], values in the order of its fields, and approve."""
+    assert len(values) == len(queries[name]), name
+    return Seq([Log(Concat(Bytes("base16", return_prefix.hex()), *[Itob(value) for value in values])), Approve()])
+
+
+def approval(dispatch_mode="cond", packed=False):
+    """dispatch_mode "tree" routes no_op calls and execute with dispatch(), "cond" keeps the linear Cond chains.
+
+    tree is cheaper for every method after the first couple in the Cond, but costs ~250 more bytes of program
+    (degen2_analyzer --dispatch tree against the default).
+    packed stores the governance parameters in one bytes global (packed_params), create the app with global_schema(packed).
+    """
     # globals 
     degen2 = Bytes("d2")
-    swap_token1 = Bytes("st")
-    swap_ratio1 = Bytes("sr")
     total_stake = Bytes("tl")  # uint64, must keep track of total stake otherwise people can buy/swap more than is staked
+    reserved = Bytes("rv")  # uint64, degen2 promised by open pay_token / airdrop proposals and airdrops, can't be bought or swapped either
 
-    upvotes = Bytes("uv")  # uint64, people want to see how many were in favor and against, store these explicitly
-    dnvotes = Bytes("dv")  # uint64
-    end_time = Bytes("et")  # uint64, when vote expires in unix
-    duration = Bytes("r")  # uint64, increment for end time
-    cooldown = Bytes("o")  # uint64, grace period
-    threshold = Bytes("t")  # uint64, increment for end time
-    price = Bytes("pc")  # uint64, increment for end time
-    proposal_fee = Bytes("pf")  # uint64, increment for end time
+    # governance parameters, only read and written through param() / set_param() below
+    param_keys = {
+        "duration": Bytes("r"),  # uint64, increment for end time
+        "cooldown": Bytes("o"),  # uint64, grace period
+        "threshold": Bytes("t"),  # uint64, increment for end time
+        "price": Bytes("pc"),  # uint64, increment for end time
+        "proposal_fee": Bytes("pf"),  # uint64, increment for end time
+    }
     end_creator_opt_in = Bytes("e")  # uint64, immutable
-    end_swap1 = Bytes("es")  # uint64, mutable by vote
+    next_proposal = Bytes("pn")  # uint64, id of the next proposal
+    reward_per_share = Bytes("ap")  # uint64, algo rewards per staked degen2 since creation, times reward_scale
+    rewards_owed = Bytes("ao")  # uint64, algo funded to stakers and not claimed yet, proposals can't spend it
     
-    proposal = Bytes("p")  # bytes
-    proposal_type = Bytes("pt")  # bytes
-    proposal_index = Bytes("pk")  # uint64, an ASA ID or App ID referenced by the proposal (flexible)
-    proposal_value = Bytes("pv")  # uint64, how much the receiver will get if the proposal passes
-    receiver_address = Bytes("ra")  # bytes, this one is partially mutable, only after the end time
-
     # locals
     stake = Bytes("s")  # uint64
-    last_vote = Bytes("lv")  # uint64
+    last_vote = Bytes("lv")  # bytes, per slot (id % max_open_proposals) the last proposal id voted on
+    locked_until = Bytes("lk")  # uint64, can't withdraw before this, set by voting and by being a receiver
+    reward_checkpoint = Bytes("rc")  # uint64, reward_per_share when rewards were last paid out to this account
+    delegate = Bytes("dg")  # bytes, the account whose votes count this stake, the zero address for none
  
     # ops
-    op_swap1 = Bytes("sw") 
-    op_buy = Bytes("b") 
-    op_upvote = Bytes("u") 
-    op_dnvote = Bytes("d")
-    op_create_token = Bytes("ct")
-    op_token_opt_in = Bytes("oi")
-    op_token_opt_out = Bytes("oo")
-    op_propose = Bytes("pr")
-    op_local_stake = Bytes("ls")
-    op_execute = Bytes("x")
-    op_withdraw = Bytes("w")
-    op_creator_token_opt_in = Bytes("ci")
-    op_slash_stake = Bytes("ss")
-    op_clawback = Bytes("cb")
-    op_change_pf = Bytes("cp")
-    op_change_duration = Bytes("cd")
-    op_change_threshold = Bytes("ch")
-    op_change_price = Bytes("cr")
-    op_pay_algo = Bytes("pa")
-    op_pay_token = Bytes("n")
-    op_start_swap1 = Bytes("sp")
+    op_swap1 = Bytes(methods["swap1"]) 
+    op_buy = Bytes(methods["buy"]) 
+    op_upvote = Bytes(methods["up_px"]) 
+    op_dnvote = Bytes(methods["dn_px"])
+    op_create_token = Bytes(methods["create_token"])
+    op_token_opt_in = Bytes(methods["token_opt_in"])
+    op_token_opt_out = Bytes(methods["token_opt_out"])
+    op_propose = Bytes(methods["propose"])
+    op_local_stake = Bytes(methods["local_stake"])
+    op_execute = Bytes(methods["execute"])
+    op_withdraw = Bytes(methods["withdraw"])
+    op_creator_token_opt_in = Bytes(methods["creator_token_opt_in"])
+    op_pay_algo = Bytes(proposal_types["pay_algo"])
+    op_pay_token = Bytes(proposal_types["pay_token"])
+    op_pay_tokens = Bytes(proposal_types["pay_tokens"])
+    op_swap_table = Bytes(proposal_types["swap_table"])
+    op_airdrop = Bytes(proposal_types["airdrop"])
     op_upgrade = Bytes("a")
 
     # utils
-    empty = Bytes("A")
     min_duration = Int(600)  # CHANGE to 600, only used for change_duration (need a fast minimum in case mass NFT withdraw)
-    week = Int(3600*24*7)  # only used for end_swap CHANGE 3600*24*7
+    week = Int(3600*24*7)  # creator opt in and start_swap1 windows CHANGE 3600*24*7
     has_stake = App.localGet(Txn.sender(), stake) > Int(0)
-    is_proposal_over = And(
-        App.globalGet(proposal) != empty,  # might not be necessary... must be active proposal, prevents users from repeatedly calling it
-        App.globalGet(end_time) < Global.latest_timestamp(), # after vote
-        App.globalGet(end_time) + App.globalGet(cooldown) > Global.latest_timestamp(),  # within grace period
-    )
-    did_proposal_pass = And(
-        App.globalGet(upvotes)>App.globalGet(dnvotes), # more up than down
-        (App.globalGet(upvotes)+App.globalGet(dnvotes))>(App.globalGet(threshold)),  # above threshold
-        # for percent threshold: (App.globalGet(upvotes)+App.globalGet(dnvotes))>(App.globalGet(threshold)*Int(420000069)/Int(1000)),  # above threshold
-        
-    )
-    will_proposal_give_degen2 = And(  # proposal must be active/possibly executable!
-        App.globalGet(proposal) != empty, 
-        App.globalGet(proposal_type) == op_pay_token, 
-        App.globalGet(proposal_index) == App.globalGet(degen2),
-        App.globalGet(proposal_value) > Int(0),
-        App.globalGet(end_time) + App.globalGet(cooldown) > Global.latest_timestamp()  # within grace period (need to check if it is active or can be executed)
-    )
-    reset = Seq(
-        [
-            App.globalPut(upvotes, Int(0)),  # votes to 0
-            App.globalPut(dnvotes, Int(0)),  # votes to 0
-            App.globalPut(proposal, empty),  # proposal to empty
-            App.globalPut(proposal_type, empty),  # proposal to empty
-            App.globalPut(proposal_index, Int(0)),  # default is algo
 
-            # need to enforce a cooldown period, can't do this. Failed proposals must 
-            #App.globalPut(end_time, Global.latest_timestamp() - App.globalGet(cooldown)),  # makes sure we are past the grace period 
-            App.globalPut(receiver_address, Global.zero_address())  # remove reciever address so people can withdraw
-        ]
+    # packed: every handler that reads a parameter starts with load_params, one app_global_get for all of them
+    params = ScratchVar(TealType.bytes)
+    load_params = params.store(App.globalGet(Bytes(packed_key))) if packed else Seq([])
+    new_params = params.store(BytesZero(Int(8 * len(packed_params)))) if packed else Seq([])  # on creation, all 0
+
+    def param(name):
+        if packed:
+            return ExtractUint64(params.load(), Int(packed_params[name]))
+        return App.globalGet(param_keys[name])
+
+    def set_param(name, value):
+        """Needs load_params first when packed, the other parameters are written back from scratch."""
+        if packed:
+            return Seq([
+                params.store(Replace(params.load(), Int(packed_params[name]), Itob(value))),
+                App.globalPut(Bytes(packed_key), params.load()),
+            ])
+        return App.globalPut(param_keys[name], value)
+
+    # the proposal a call works on, application_args[1] for votes and execute
+    proposal_id = ScratchVar(TealType.uint64)
+    record = ScratchVar(TealType.bytes)  # the whole box, fields are extracted from scratch
+    proposal_box = Concat(Bytes("p"), Itob(proposal_id.load()))
+
+    def field(name):
+        return ExtractUint64(record.load(), Int(proposal_fields[name]))
+
+    proposal_type = field("type")
+    proposal_index = field("index")
+    end_time = field("end_time")
+    upvotes = field("upvotes")
+    dnvotes = field("dnvotes")
+    receiver_address = Extract(record.load(), Int(proposal_receiver), Int(32))
+    payout_hash = Extract(record.load(), Int(proposal_payout_hash), Int(32))
+
+    load_proposal = Seq([
+        proposal_id.store(Btoi(Txn.application_args[1])),
+        stored := BoxGet(proposal_box),
+        Assert(stored.hasValue()),  # unknown or already cleaned up
+        record.store(stored.value()),
+    ])
+
+    def close_proposal():
+        """Delete the loaded proposal's box and give back any degen2 it reserved."""
+        return Seq([
+            If(
+                Or(
+                    And(
+                        proposal_type == Int(selector_key(proposal_types["pay_token"])),
+                        proposal_index == App.globalGet(degen2),
+                    ),
+                    proposal_type == Int(selector_key(proposal_types["airdrop"])),
+                ),
+                App.globalPut(reserved, App.globalGet(reserved) - field("value")),
+            ),
+            Pop(BoxDelete(proposal_box)),
+        ])
+
+    def lock(account, until):
+        """Keep account's stake in the contract until `until`, never shortens a lock it already has."""
+        return If(App.localGet(account, locked_until) < until, App.localPut(account, locked_until, until))
+
+    did_proposal_pass = And(
+        upvotes>dnvotes, # more up than down
+        (upvotes+dnvotes)>(param("threshold")),  # above threshold
+        # for percent threshold: (upvotes+dnvotes)>(param("threshold")*Int(420000069)/Int(1000)),  # above threshold
     )
-    
+
+    # staking rewards, constant cost however many stakers there are. funding only bumps reward_per_share,
+    # an account is owed stake * (reward_per_share - its checkpoint) and gets it whenever its stake changes
+    owed = ScratchVar(TealType.uint64)
+
+    def distribute(amount):
+        """Share amount microalgo between everyone staked right now."""
+        return Seq([
+            Assert(App.globalGet(total_stake) > Int(0)),  # nobody to share with
+            App.globalPut(reward_per_share, App.globalGet(reward_per_share) + WideRatio([amount, Int(reward_scale)], [App.globalGet(total_stake)])),
+            App.globalPut(rewards_owed, App.globalGet(rewards_owed) + amount),
+        ])
+
+    @Subroutine(TealType.none)
+    def settle(account):
+        """Pay account what its stake earned since its checkpoint, call before anything changes its stake."""
+        return Seq([
+            owed.store(WideRatio(
+                [App.localGet(account, stake), App.globalGet(reward_per_share) - App.localGet(account, reward_checkpoint)],
+                [Int(reward_scale)],
+            )),
+            If(
+                owed.load() > Int(0),
+                Seq([
+                    App.globalPut(rewards_owed, App.globalGet(rewards_owed) - owed.load()),
+                    send_algo(account, owed.load()),  # fee comes out of the caller's group
+                ])
+            ),
+            App.localPut(account, reward_checkpoint, App.globalGet(reward_per_share)),
+        ])
+
+    # delegation, layout in delegate_fields. every box a call touches has to be in the group's box references
+    delegate_name = ScratchVar(TealType.bytes)  # the delegate box being worked on
+    delegate_slot = ScratchVar(TealType.uint64)  # byte offset of the loaded proposal's slot in it
+    delegated_weight = ScratchVar(TealType.uint64)
+
+    def delegate_field(offset):
+        return Btoi(BoxExtract(delegate_name.load(), offset, Int(8)))
+
+    @Subroutine(TealType.none)
+    def move_delegated(account, added, removed, check_frozen):
+        """Keep the delegated total of account's delegate in step with a change to account's stake.
+
+        With check_frozen the stake can't move while the delegate's votes are open (they counted it) or while
+        account's own are (it was left out of the delegate's), so a stake is never counted twice on a proposal.
+        """
+        return If(
+            App.localGet(account, delegate) != Global.zero_address(),
+            Seq([
+                delegate_name.store(Concat(Bytes("d"), App.localGet(account, delegate))),
+                If(
+                    check_frozen,
+                    Seq([
+                        Assert(App.localGet(account, locked_until) < Global.latest_timestamp()),
+                        Assert(delegate_field(Int(delegate_fields["locked_until"])) < Global.latest_timestamp()),
+                    ]),
+                ),
+                BoxReplace(delegate_name.load(), Int(delegate_fields["delegated"]), Itob(delegate_field(Int(delegate_fields["delegated"])) + added - removed)),
+            ]),
+        )
+
+    @Subroutine(TealType.none)
+    def open_delegate_slot(name):
+        """Point delegate_name / delegate_slot at the loaded proposal's slot in box name, cleared if it held an older one."""
+        return Seq([
+            delegate_name.store(name),
+            delegate_slot.store(Int(delegate_slots) + proposal_id.load() % Int(max_open_proposals) * Int(24)),
+            If(
+                delegate_field(delegate_slot.load()) != proposal_id.load(),
+                BoxReplace(delegate_name.load(), delegate_slot.load(), Concat(Itob(proposal_id.load()), BytesZero(Int(16)))),
+            ),
+        ])
+
+    # swap table, layout in swap_fields. the app account pays the min balance of each box
+    swap_name = ScratchVar(TealType.bytes)
+
+    @Subroutine(TealType.none)
+    def put_swap(asset, ratio, until):
+        """Set asset's swap table entry, a ratio of 0 deletes it."""
+        return Seq([
+            swap_name.store(Concat(Bytes("s"), Itob(asset))),
+            If(
+                ratio,
+                BoxPut(swap_name.load(), Concat(Itob(ratio), Itob(until))),
+                Pop(BoxDelete(swap_name.load())),
+            ),
+            emit("swap_table", Txn.sender(), asset, ratio, until),
+        ])
+
+    # dispatch scratch vars
+    selected_method = ScratchVar(TealType.uint64)
+    selected_type = ScratchVar(TealType.uint64)
+
     # app calls
     # phase 1, initialization
     on_creation = Seq(  # no risk
         [   
-            Assert(Btoi(Txn.application_args[0]) >= App.globalGet(cooldown)),  # make sure duration isn't too short
+            new_params,
+            Assert(Btoi(Txn.application_args[0]) >= param("cooldown")),  # make sure duration isn't too short
             Assert(Btoi(Txn.application_args[1]) >= Int(1)),  # proposal fee has to be > 1 degen2
-            App.globalPut(upvotes, Int(0)),  # initialize the vote at 0
-            App.globalPut(dnvotes, Int(0)),  # initialize the vote at 0
-            App.globalPut(duration, Btoi(Txn.application_args[0])),  # initialize the duration
-            App.globalPut(cooldown, Int(3600*24)),  # initialize the cooldown at 1 day, with 3 day duration
-            App.globalPut(proposal_fee, Btoi(Txn.application_args[1])),  # initialize the fee to make a new proposal
-            App.globalPut(proposal, empty),  # init proposal as empty
-            App.globalPut(proposal_type, empty),  # init proposal as empty
-            App.globalPut(proposal_index, Int(0)),  # init proposal token as 0 by default
-            App.globalPut(threshold, Btoi(Txn.application_args[2])),  # minimum amount of votes before a proposal can be passed
-            App.globalPut(swap_token1, Btoi(Txn.application_args[3])),  # Specify token! Left it like this so I can specify mainnet or testnet tokens rather than hardcoding
+            set_param("duration", Btoi(Txn.application_args[0])),  # initialize the duration
+            set_param("cooldown", Int(3600*24)),  # initialize the cooldown at 1 day, with 3 day duration
+            set_param("proposal_fee", Btoi(Txn.application_args[1])),  # initialize the fee to make a new proposal
+            set_param("threshold", Btoi(Txn.application_args[2])),  # minimum amount of votes before a proposal can be passed
             App.globalPut(degen2, Int(0)),  # init as 0 so we only change once
-            App.globalPut(price, Int(10000)),  # init price as 1 degen/10000 microalgo
+            set_param("price", Int(10000)),  # init price as 1 degen/10000 microalgo
             App.globalPut(total_stake, Int(0)),  # init price as 1 degen/10000 microalgo
-            App.globalPut(receiver_address, Global.zero_address()),
+            App.globalPut(reserved, Int(0)),
+            App.globalPut(reward_per_share, Int(0)),
+            App.globalPut(rewards_owed, Int(0)),
+            App.globalPut(next_proposal, Int(max_open_proposals)),  # the box for id - max_open_proposals is looked up on propose, the first ones find p0, which never exists
             App.globalPut(end_creator_opt_in, Global.latest_timestamp()+week),  # immutable, 1 day to opt in
-            App.globalPut(end_swap1, Global.latest_timestamp()+week),  # only allow free swaps for the first week, excess degen2 can be purchased from the contract or 
-            App.globalPut(swap_ratio1, Int(1)),  # Specify swap "price"
 
             Approve(),
         ]
@@ -163,6 +581,10 @@ def approval():
             # Submit the transaction we just built
             InnerTxnBuilder.Submit(),   
             App.globalPut(degen2, InnerTxn.created_asset_id()),
+            If(  # application_args[1] opens the first swap, 1 for 1 for the first week. Specify token! so it can be a mainnet or testnet token rather than hardcoded
+                Txn.application_args.length() > Int(1),
+                put_swap(Btoi(Txn.application_args[1]), Int(1), Global.latest_timestamp() + week),
+            ),
             Approve()
         ]
     )
@@ -173,14 +595,7 @@ def approval():
             Assert(Global.latest_timestamp() < App.globalGet(end_creator_opt_in)),  # only for the first day
             Assert(Global.group_size() >= Int(1)),
 
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.asset_receiver: Global.current_application_address(),
-                TxnField.asset_amount: Int(0),
-                TxnField.xfer_asset: Txn.assets[0], # Must be in the assets array sent as part of the application call
-            }),
-            InnerTxnBuilder.Submit(),
+            send_asset(Global.current_application_address(), Int(0), Txn.assets[0]),  # Must be in the assets array sent as part of the application call
             Approve(),
         ]
     )
@@ -188,132 +603,190 @@ def approval():
     contract_opt_in = Seq(  # allow anyone to opt in, create some local state variables
         [   
             App.localPut(Txn.sender(), stake, Int(0)),  # initialize local stake
-            App.localPut(Txn.sender(), last_vote, Int(0)),  # initialize local time of last vote
+            App.localPut(Txn.sender(), last_vote, BytesZero(Int(8*max_open_proposals))),  # no votes in any slot
+            App.localPut(Txn.sender(), locked_until, Int(0)),
+            App.localPut(Txn.sender(), reward_checkpoint, App.globalGet(reward_per_share)),  # nothing from before joining
+            App.localPut(Txn.sender(), delegate, Global.zero_address()),
             Approve(),
         ]
     )
 
-    buy = Seq(  # public
-        [   
+    # buy and swap1 sell degen2 for every payment into the contract in the group, one app call for the whole batch
+    payment_index = ScratchVar(TealType.uint64)
+    payment = Gtxn[payment_index.load()]
+    purchase = ScratchVar(TealType.uint64)  # degen2 sold in total, then the running count of transfers sent
+    sell_rate = ScratchVar(TealType.uint64)  # price or swap ratio, read once for the whole batch
+    bought = ScratchVar(TealType.uint64)  # degen2 sent to the payer being looked at
+
+    def sell(name, is_payment, paid, rate):
+        """Send paid / rate degen2 to the sender of each txn in the group where is_payment, in one inner group.
+
+        paid and is_payment read `payment`, the group txn being looked at. Other calls to this app can only be
+        pad calls, otherwise they'd be looking at the same payments (a buy next to a buy, a withdraw's fee...).
+        """
+        each_payment = lambda body: For(
+            payment_index.store(Int(0)),
+            payment_index.load() < Global.group_size(),
+            payment_index.store(payment_index.load() + Int(1)),
+        ).Do(body)
+        return Seq([
             # scratch vars
             asset_balance := AssetHolding.balance(Global.current_application_address(), Txn.assets[0]),
-
-            # Safety Checks
             Assert(Txn.assets[0] == App.globalGet(degen2)),
-            #Assert(Global.latest_timestamp()<App.globalGet(end_swap)),  # check that we're in the first week
-            Assert(Gtxn[Global.group_size()-Int(1)].type_enum() == TxnType.ApplicationCall),
-            Assert(Gtxn[Global.group_size()-Int(1)].application_args.length() == Int(1)),  # need one for the noop "buy"
-            # make sure they're sending assets only to the receiver addr
-            # accept either algo TODO: or galgo (ran out of space!) :(
-            Cond(  # TODO need to add conditional logic if there is a proposal and proposal_index == degen2, people can't buy if the proposal amount takes the contract balance under the total stake
-                [  # TODO: I used the cond because I wanted galgo, now it's unnecessary, remove it!
-                    # it needs at least 1 argument so we're fine to leave it in technically 
-                    And(
-                        (Gtxn[Global.group_size()-Int(2)].type_enum() == TxnType.Payment),
-                        (Gtxn[Global.group_size()-Int(2)].receiver() ==  Global.current_application_address()),  # give algo to contract
-                        (Gtxn[Global.group_size()-Int(2)].amount() >= App.globalGet(price)), # microalgos, make sure they are purchasing greater than the minimum qt.
-                        # check if we have enough to cover the stake, depends on whether there is an active proposal or not
-                        If(
-                            will_proposal_give_degen2,
-                            (App.globalGet(total_stake) <= asset_balance.value() - App.globalGet(proposal_value) - Gtxn[Global.group_size()-Int(2)].amount()/App.globalGet(price)),  # total stake >= asset balance - request - buy
-                            (App.globalGet(total_stake) <= asset_balance.value() - Gtxn[Global.group_size()-Int(2)].amount()/App.globalGet(price)),  # total stake >= asset balance - buy
-                        )
+            sell_rate.store(rate),
+
+            purchase.store(Int(0)),
+            each_payment(
+                If(
+                    is_payment,
+                    Seq([
+                        Assert(paid >= sell_rate.load()),  # make sure they are purchasing greater than the minimum qt.
+                        purchase.store(purchase.load() + paid / sell_rate.load()),  # automatically applies floor function
+                    ]),
+                    If(
+                        And(
+                            payment.type_enum() == TxnType.ApplicationCall,
+                            payment.application_id() == Global.current_application_id(),
+                            payment_index.load() != Txn.group_index(),
+                        ),
+                        Assert(payment.application_args[0] == Bytes(methods["pad"])),
                     ),
+                )
+            ),
+            Assert(purchase.load() > Int(0)),
+            # check once if we have enough to cover the stake and every open pay_token proposal
+            Assert(App.globalGet(total_stake) + App.globalGet(reserved) <= asset_balance.value() - purchase.load()),  # total stake + reserved <= asset balance - buy
+
+            # up to 15 payers fit one inner group (16 txns), fees are pooled from the outer group
+            purchase.store(Int(0)),
+            InnerTxnBuilder.Begin(),
+            each_payment(
+                If(
+                    is_payment,
                     Seq([
-                        InnerTxnBuilder.Begin(),
+                        If(purchase.load() > Int(0), InnerTxnBuilder.Next()),
+                        bought.store(paid / sell_rate.load()),
                         InnerTxnBuilder.SetFields({
                             TxnField.type_enum: TxnType.AssetTransfer,
-                            TxnField.asset_receiver: Gtxn[Global.group_size()-Int(2)].sender(),  # send to the addr that paid the algo
-                            TxnField.asset_amount: Gtxn[Global.group_size()-Int(2)].amount()/App.globalGet(price),  # automatically applies floor function
-                            TxnField.xfer_asset: Txn.assets[0], # Must be in the assets array sent as part of the application call
+                            TxnField.xfer_asset: Txn.assets[0],
+                            TxnField.asset_amount: bought.load(),
+                            TxnField.asset_receiver: payment.sender(),  # send to the addr that paid
                         }),
-                        InnerTxnBuilder.Submit(),
+                        emit(name, payment.sender(), bought.load()),
+                        purchase.store(purchase.load() + Int(1)),
                     ])
-                ]
+                )
+            ),
+            InnerTxnBuilder.Submit(),
+        ])
+
+    buy = Seq(  # public
+        [   
+            load_params,
+            #Assert(Global.latest_timestamp()<App.globalGet(end_swap)),  # check that we're in the first week
+            sell(
+                "buy",
+                And(
+                    payment.type_enum() == TxnType.Payment,
+                    payment.receiver() == Global.current_application_address(),  # give algo to contract
+                ),
+                payment.amount(),  # microalgos
+                param("price"),
             ),
             Approve(),
         ]
     )
 
+    # swap1 takes the token in application_args[1], one box lookup however many tokens the swap table lists
+    swap_asset = ScratchVar(TealType.uint64)
     swap1 = Seq(  # public
         [   
-            # scratch vars
-            asset_balance := AssetHolding.balance(Global.current_application_address(), Txn.assets[0]),
-
-            # Safety Checks
-            Assert(Txn.assets[0] == App.globalGet(degen2)),
-            Assert(Global.latest_timestamp()<App.globalGet(end_swap1)),  # check that we're in the swap period
-            Assert(Gtxn[Global.group_size()-Int(1)].type_enum() == TxnType.ApplicationCall),
-            Assert(Gtxn[Global.group_size()-Int(1)].application_args.length() == Int(1)),  # need one for the noop "buy"
-            # make sure they're sending assets only to the receiver addr
-            Assert(Gtxn[Global.group_size()-Int(2)].type_enum() == TxnType.AssetTransfer),
-            Assert(Gtxn[Global.group_size()-Int(2)].xfer_asset() == App.globalGet(swap_token1)),
-            Assert(Gtxn[Global.group_size()-Int(2)].asset_receiver() ==  Global.current_application_address()),  # give algo to contract
-            Assert(Gtxn[Global.group_size()-Int(2)].asset_amount() >= App.globalGet(swap_ratio1)), # atomic units, make sure they are purchasing greater than the minimum qt.
-            
-            # check if we have enough to cover the stake, depends on whether there is an active proposal or not
-            If(
-                will_proposal_give_degen2,
-                Assert(App.globalGet(total_stake) <= asset_balance.value() - Gtxn[Global.group_size()-Int(2)].asset_amount()/App.globalGet(swap_ratio1) - App.globalGet(proposal_value)),  # total stake <= asset balance - request - buy
-                Assert(App.globalGet(total_stake) <= asset_balance.value() - Gtxn[Global.group_size()-Int(2)].asset_amount()/App.globalGet(swap_ratio1)),  # total stake <= asset balance - request
+            swap_asset.store(Btoi(Txn.application_args[1])),
+            swap := BoxGet(Concat(Bytes("s"), Itob(swap_asset.load()))),
+            Assert(swap.hasValue()),  # not in the swap table
+            Assert(Global.latest_timestamp() < ExtractUint64(swap.value(), Int(swap_fields["end_time"]))),  # check that we're in the swap period
+            sell(
+                "swap1",
+                And(
+                    payment.type_enum() == TxnType.AssetTransfer,
+                    payment.xfer_asset() == swap_asset.load(),
+                    payment.asset_receiver() == Global.current_application_address(),  # give swap token to contract
+                ),
+                payment.asset_amount(),  # atomic units
+                ExtractUint64(swap.value(), Int(swap_fields["ratio"])),
             ),
-
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.asset_receiver: Gtxn[Global.group_size()-Int(2)].sender(),  # send to the addr that paid the algo
-                TxnField.asset_amount: Gtxn[Global.group_size()-Int(2)].asset_amount()/App.globalGet(swap_ratio1),  # automatically applies floor function
-                TxnField.xfer_asset: Txn.assets[0], # Must be in the assets array sent as part of the application call
-            }),
-            InnerTxnBuilder.Submit(),
-
             Approve(),
         ]
     )
 
-    local_stake = Seq(
-        [   
+    # local_stake, stake_vote and restake credit the degen2 transfer at Gtxn[0] to the sender's stake
+    @Subroutine(TealType.none)
+    def deposit_stake():
+        return Seq([
+            Assert(Txn.group_index() == Int(1)),  # the call right after the deposit, so a second call can't credit it again
             Assert(Gtxn[0].type_enum() == TxnType.AssetTransfer),
             Assert(Gtxn[0].xfer_asset() ==  App.globalGet(degen2)),  # make sure they're using the right token
             Assert(Gtxn[0].asset_receiver() ==  Global.current_application_address()),  # deposit into contract
 
+            settle(Txn.sender()),  # claims rewards, staking 0 is a plain claim
+
             # update stake by replacing stake with stake + asset_amount
             App.localPut(Txn.sender(), stake, App.localGet(Txn.sender(), stake) + Gtxn[0].asset_amount()),
 
             # add to total stake
             App.globalPut(total_stake, App.globalGet(total_stake) + Gtxn[0].asset_amount()),
+            move_delegated(Txn.sender(), Gtxn[0].asset_amount(), Int(0), Int(1)),
+            emit("local_stake", Txn.sender(), Gtxn[0].asset_amount(), App.localGet(Txn.sender(), stake), App.globalGet(total_stake)),
+        ])
+
+    local_stake = Seq(
+        [   
+            deposit_stake(),
             Approve()
         ]
     )
 
     # phase 2: proposal cycling
     # create proposal
+    requested = ScratchVar(TealType.uint64)  # Btoi of the amount argument, in execute the proposal's value
+    has_list = Or(Txn.application_args[2]==op_pay_tokens, Txn.application_args[2]==op_swap_table)  # application_args[5] is a list
     propose = Seq(
         # ?TODO: you could add a minimum proposal threshold, right now anyone can propose as long as they pay the fee 
         [  # 
             # scratch vars
             asset_balance := AssetHolding.balance(Global.current_application_address(), Txn.assets[0]),
+            requested.store(Btoi(Txn.application_args[3])),
+            load_params,
 
             # Safety Checks
             Assert(Global.group_size() == Int(3)),
             Assert(Gtxn[1].type_enum() == TxnType.Payment),  
-            Assert(Gtxn[1].amount() >= Int(2000000)),  # pay 2 algo in, 1 for contract, 1 for executor
+            Assert(Gtxn[1].amount() >= Int(2000000)),  # pay 2 algo in, 1 for contract and the box, 1 for executor
             Assert(Gtxn[1].receiver() == Global.current_application_address()), 
 
             Assert(Gtxn[2].type_enum() == TxnType.AssetTransfer),  
-            Assert(Gtxn[2].asset_amount() >= App.globalGet(proposal_fee)),  # pay proposal fee in degen2
-            Assert(Gtxn[2].xfer_asset() >= App.globalGet(degen2)),  # pay proposal fee in degen2
+            Assert(Gtxn[2].asset_amount() >= param("proposal_fee")),  # pay proposal fee in degen2
+            Assert(Gtxn[2].xfer_asset() == App.globalGet(degen2)),  # pay proposal fee in degen2
             Assert(Gtxn[2].asset_receiver() == Global.current_application_address()), 
 
-            # only really needto check that we're past the grace_period
-            # Assert(App.globalGet(proposal) == empty),  # must be empty
-            Assert(App.globalGet(end_time) + App.globalGet(cooldown) < Global.latest_timestamp()),  # grace period has passed
+            # the new id shares its vote slot with id - max_open_proposals, which has to be past its grace period
+            # (the queue is full otherwise). clean it up here if nobody called execute on it
+            proposal_id.store(App.globalGet(next_proposal) - Int(max_open_proposals)),
+            previous := BoxGet(proposal_box),
+            If(
+                previous.hasValue(),
+                Seq([
+                    record.store(previous.value()),
+                    Assert(end_time + param("cooldown") < Global.latest_timestamp()),  # grace period has passed
+                    close_proposal(),
+                ])
+            ),
             If(
                 Txn.application_args[2]==op_pay_algo,  # can only propose < 10% algo treasury, can fully withdraw all other tokens though (except degen2)
                 If(  # if proposal is "upgrade", make sure you request <= balance-minbalance, if not then make sure only 10% balance
                     Txn.application_args[1]==op_upgrade,
-                    Assert(Btoi(Txn.application_args[3]) <= Balance(Global.current_application_address())-MinBalance(Global.current_application_address())),
-                    Assert(Btoi(Txn.application_args[3]) < Int(1)*Balance(Global.current_application_address())/Int(10)),  
+                    Assert(requested.load() <= Balance(Global.current_application_address())-MinBalance(Global.current_application_address())),
+                    Assert(requested.load() < Int(1)*Balance(Global.current_application_address())/Int(10)),  
                 )
             ),
             If(
@@ -322,69 +795,177 @@ def approval():
                     Btoi(Txn.application_args[4]) == App.globalGet(degen2),
                 ),
                 Seq([
-                    Assert(Btoi(Txn.application_args[3]) < Int(20000000)), 
+                    Assert(requested.load() < Int(20000000)), 
                     Assert(Txn.assets[0] == App.globalGet(degen2)), # need to check because Txn.assets is the asset balance we check for
-                    # check if we have enough to cover the stake
-                    Assert(App.globalGet(total_stake) <= asset_balance.value() - Btoi(Txn.application_args[3])),  # total stake >= asset balance - request
+                    # check if we have enough to cover the stake and every other open pay_token proposal, then hold it back
+                    Assert(App.globalGet(total_stake) + App.globalGet(reserved) <= asset_balance.value() - requested.load()),  # total stake + reserved <= asset balance - request
+                    App.globalPut(reserved, App.globalGet(reserved) + requested.load()),
+                ])
+            ),
+            If(
+                Txn.application_args[2]==op_airdrop,  # application_args[5] is the merkle root, index the leaf count
+                Seq([
+                    Assert(Len(Txn.application_args[5]) == Int(32)),
+                    Assert(Btoi(Txn.application_args[4]) > Int(0)),
+                    Assert(Btoi(Txn.application_args[4]) <= Int(airdrop_chunk * max_airdrop_chunks)),
+                    Assert(Txn.assets[0] == App.globalGet(degen2)),
+                    # same check as pay_token, the whole airdrop is held back from the vote on
+                    Assert(App.globalGet(total_stake) + App.globalGet(reserved) <= asset_balance.value() - requested.load()),
+                    App.globalPut(reserved, App.globalGet(reserved) + requested.load()),
+                ])
+            ),
+            If(
+                has_list,  # commit to the list now, execute has to apply exactly this list
+                Seq([
+                    Assert(Len(Txn.application_args[5]) > Int(0)),
+                    Assert(Len(Txn.application_args[5]) % If(Txn.application_args[2]==op_pay_tokens, Int(16), Int(swap_entry)) == Int(0)),  # uint64 asset id + uint64 amount per payout
+                    Assert(Or(Txn.application_args[2] == op_pay_tokens, Len(Txn.application_args[5]) <= Int(swap_entry * max_swap_entries))),
                 ])
             ),
             Assert(has_stake),  # ?TODO: add a mutable proposal_threshold (need > x stake to create proposal?)
 
-            App.globalPut(proposal, Txn.application_args[1]),  # update proposal
-            App.globalPut(proposal_type, Txn.application_args[2]),  # update proposal type to make execution easier
-            App.globalPut(proposal_value, Btoi(Txn.application_args[3])),  # set amount receiver will get if vote passes
-            App.globalPut(proposal_index, Btoi(Txn.application_args[4])),  # update proposal token to determine payout if needed
-            App.globalPut(upvotes, Int(0)),  # reset upvotes in case proposal fails
-            App.globalPut(dnvotes, Int(0)),  # reset dnvotes in case proposal fails
-            App.globalPut(end_time, Global.latest_timestamp() + App.globalGet(duration)),  # start new vote from now to now + duration
-            App.globalPut(receiver_address, Txn.accounts[1]),  # specify the receiver address (temporary)
+            proposal_id.store(App.globalGet(next_proposal)),
+            App.globalPut(next_proposal, proposal_id.load() + Int(1)),
+            BoxPut(  # layout in proposal_fields
+                proposal_box,
+                Concat(
+                    Itob(Btoi(Txn.application_args[2])),  # proposal type, one longer than 8 bytes can't be proposed
+                    Itob(requested.load()),  # amount receiver will get if vote passes
+                    Itob(Btoi(Txn.application_args[4])),  # proposal token to determine payout if needed
+                    Itob(Global.latest_timestamp() + param("duration")),  # vote from now to now + duration
+                    BytesZero(Int(16)),  # upvotes, dnvotes
+                    Txn.accounts[1],  # the receiver
+                    If(has_list, Sha256(Txn.application_args[5]), If(Txn.application_args[2]==op_airdrop, Txn.application_args[5], BytesZero(Int(32)))),
+                    Txn.application_args[1],  # the proposal
+                ),
+            ),
+            If(  # receiver's stake is locked until execution is complete, otherwise slash_stake is impotent
+                App.optedIn(Txn.accounts[1], Global.current_application_id()),
+                lock(Txn.accounts[1], Global.latest_timestamp() + param("duration") + param("cooldown")),
+            ),
+            emit(
+                "propose", Txn.sender(), proposal_id.load(), Btoi(Txn.application_args[2]), requested.load(),
+                Btoi(Txn.application_args[4]), Global.latest_timestamp() + param("duration"),
+            ),
             Approve()
         ]
     )
 
     # vote on proposal
-    up_px = Seq([  # public
-        # Safety Checks
-        #Assert(Txn.sender() != App.globalGet(receiver_address)),
-        Assert(has_stake),
-        Assert(App.localGet(Txn.sender(), last_vote) < App.globalGet(end_time)-App.globalGet(duration)),  # last < start means you haven't voted yet
-        Assert(Global.latest_timestamp() < App.globalGet(end_time)),  # must be before vote ends
-
-        App.globalPut(upvotes, App.globalGet(upvotes) + App.localGet(Txn.sender(), stake)), # then increment vote by payment amount
-        App.localPut(Txn.sender(), last_vote, Global.latest_timestamp()),  # update last with current time
-        Approve(),
-    ])
+    sender_stake = ScratchVar(TealType.uint64)
+    vote_slot = ScratchVar(TealType.uint64)  # byte offset of the proposal's slot in lv
+    tally = ScratchVar(TealType.uint64)  # the votes so far on the side voted for
 
-    dn_px = Seq([  # public
-        # Safety Checks
-        #Assert(Txn.sender() != App.globalGet(receiver_address)),
-        Assert(has_stake),
-        Assert(App.localGet(Txn.sender(), last_vote) < App.globalGet(end_time)-App.globalGet(duration)),  # last < start means you haven't voted yet
-        Assert(Global.latest_timestamp() < App.globalGet(end_time)),  # must be before vote ends
+    # up_px, dn_px and stake_vote: the sender's whole stake on the proposal in application_args[1], plus the stake
+    # delegated to it, tally_offset is proposal_fields["upvotes"] or ["dnvotes"]. boxes: the proposal, "d" + sender,
+    # and "d" + the sender's delegate if it has one
+    @Subroutine(TealType.none)
+    def cast_vote(tally_offset):
+        return Seq([
+            sender_stake.store(App.localGet(Txn.sender(), stake)),
+            load_proposal,
+            vote_slot.store(proposal_id.load() % Int(max_open_proposals) * Int(8)),
 
+            # Safety Checks
+            Assert(ExtractUint64(App.localGet(Txn.sender(), last_vote), vote_slot.load()) != proposal_id.load()),  # haven't voted on this one yet
+            Assert(Global.latest_timestamp() < end_time),  # must be before vote ends
 
-        App.globalPut(dnvotes, App.globalGet(dnvotes) + App.localGet(Txn.sender(), stake)), # then increment vote by payment amount
-        App.localPut(Txn.sender(), last_vote, Global.latest_timestamp()),  # update last with current time
-        Approve(),
-    ])
+            # voting yourself overrides your delegation: before the delegate votes the stake is left out of its vote,
+            # after it the stake comes back off the side it counted it on
+            If(
+                App.localGet(Txn.sender(), delegate) != Global.zero_address(),
+                Seq([
+                    open_delegate_slot(Concat(Bytes("d"), App.localGet(Txn.sender(), delegate))),
+                    delegated_weight.store(delegate_field(delegate_slot.load() + Int(8))),  # the side it voted
+                    If(
+                        delegated_weight.load(),
+                        Seq([
+                            delegated_weight.store(Int(proposal_fields["upvotes"] - 8) + delegated_weight.load() * Int(8)),  # that side's tally
+                            record.store(Replace(record.load(), delegated_weight.load(), Itob(ExtractUint64(record.load(), delegated_weight.load()) - sender_stake.load()))),
+                            BoxReplace(delegate_name.load(), delegate_slot.load() + Int(16), Itob(delegate_field(delegate_slot.load() + Int(16)) - sender_stake.load())),
+                            emit(
+                                "override", App.localGet(Txn.sender(), delegate), proposal_id.load(),
+                                delegate_field(delegate_slot.load() + Int(8)), sender_stake.load(),
+                                ExtractUint64(record.load(), delegated_weight.load()),
+                            ),
+                        ]),
+                        BoxReplace(delegate_name.load(), delegate_slot.load() + Int(16), Itob(delegate_field(delegate_slot.load() + Int(16)) + sender_stake.load())),
+                    ),
+                ]),
+            ),
+            # a delegate votes with what's delegated to it, less what already voted itself
+            has_delegates := BoxLen(Concat(Bytes("d"), Txn.sender())),
+            If(
+                has_delegates.hasValue(),
+                Seq([
+                    open_delegate_slot(Concat(Bytes("d"), Txn.sender())),
+                    delegated_weight.store(delegate_field(Int(delegate_fields["delegated"]))),
+                    If(
+                        delegated_weight.load() > delegate_field(delegate_slot.load() + Int(16)),
+                        delegated_weight.store(delegated_weight.load() - delegate_field(delegate_slot.load() + Int(16))),
+                        delegated_weight.store(Int(0)),  # a slash took delegated stake that had voted itself
+                    ),
+                    BoxReplace(
+                        delegate_name.load(), delegate_slot.load() + Int(8),
+                        Concat(Itob((tally_offset - Int(proposal_fields["upvotes"] - 8)) / Int(8)), Itob(delegated_weight.load())),
+                    ),
+                    If(
+                        delegate_field(Int(delegate_fields["locked_until"])) < end_time,
+                        BoxReplace(delegate_name.load(), Int(delegate_fields["locked_until"]), Itob(end_time)),
+                    ),
+                    sender_stake.store(sender_stake.load() + delegated_weight.load()),
+                ]),
+            ),
+            Assert(sender_stake.load() > Int(0)),
+
+            tally.store(ExtractUint64(record.load(), tally_offset) + sender_stake.load()),
+            record.store(Replace(record.load(), tally_offset, Itob(tally.load()))),
+            BoxReplace(proposal_box, Int(proposal_fields["upvotes"]), Extract(record.load(), Int(proposal_fields["upvotes"]), Int(16))),  # both tallies, an override may have changed the other
+            App.localPut(Txn.sender(), last_vote, Replace(App.localGet(Txn.sender(), last_vote), vote_slot.load(), Itob(proposal_id.load()))),
+            lock(Txn.sender(), end_time),  # no withdrawing and voting again from another account
+            If(
+                tally_offset == Int(proposal_fields["upvotes"]),
+                emit("up_px", Txn.sender(), proposal_id.load(), sender_stake.load(), tally.load()),
+                emit("dn_px", Txn.sender(), proposal_id.load(), sender_stake.load(), tally.load()),
+            ),
+        ])
+
+    up_px = Seq([cast_vote(Int(proposal_fields["upvotes"])), Approve()])  # public
+    dn_px = Seq([cast_vote(Int(proposal_fields["dnvotes"])), Approve()])
+
+    # stake (or top up, a 0 transfer votes with the stake already in) and vote in one group:
+    # Gtxn[0] the degen2 deposit, then the call with the proposal id and the side, up_px's or dn_px's selector
+    stake_vote = Seq(
+        [
+            deposit_stake(),
+            cast_vote(
+                If(
+                    Txn.application_args[2] == op_upvote,
+                    Int(proposal_fields["upvotes"]),
+                    Seq([Assert(Txn.application_args[2] == op_dnvote), Int(proposal_fields["dnvotes"])]),
+                )
+            ),
+            Approve(),
+        ]
+    )
 
     # execute proposal
     change_proposal_fee = Seq(
         [
-            Assert(App.globalGet(proposal_value)>(Int(2)*App.globalGet(proposal_fee)/Int(3))),  # can only change proposal_fee by less than 33% up or down
-            Assert(App.globalGet(proposal_value)<(Int(4)*App.globalGet(proposal_fee)/Int(3))),
-            Assert(App.globalGet(proposal_value)>Int(9)),  # proposal fee has to be > 9, otherwise it gets permanently stuck
-            Assert(App.globalGet(proposal_value)<Int(20000000)),  # no more than 5% of the total supply
-            App.globalPut(proposal_fee, App.globalGet(proposal_value)),
+            Assert(requested.load()>(Int(2)*param("proposal_fee")/Int(3))),  # can only change proposal_fee by less than 33% up or down
+            Assert(requested.load()<(Int(4)*param("proposal_fee")/Int(3))),
+            Assert(requested.load()>Int(9)),  # proposal fee has to be > 9, otherwise it gets permanently stuck
+            Assert(requested.load()<Int(20000000)),  # no more than 5% of the total supply
+            set_param("proposal_fee", requested.load()),
         ]
     )
 
     change_duration = Seq(
         [
-            Assert(App.globalGet(proposal_value)>=min_duration), # will be necessary if we need to mass withdraw NFTs, 10k/10min = 69 days
-            Assert(App.globalGet(proposal_index)>=Int(1800)), # will be necessary if we need to mass withdraw NFTs, 10k/10min = 69 days
-            App.globalPut(duration, App.globalGet(proposal_value)),
-            App.globalPut(cooldown, App.globalGet(proposal_index)),  # shouldn't really use the proposal_index this way, but allows you to change the cooldown cheaply
+            Assert(requested.load()>=min_duration), # will be necessary if we need to mass withdraw NFTs, 10k/10min = 69 days
+            Assert(proposal_index>=Int(1800)), # will be necessary if we need to mass withdraw NFTs, 10k/10min = 69 days
+            set_param("duration", requested.load()),
+            set_param("cooldown", proposal_index),  # shouldn't really use the proposal_index this way, but allows you to change the cooldown cheaply
         ]
     )
 
@@ -392,13 +973,13 @@ def approval():
         [
             Assert(
                 And(  # this has to be 
-                    App.globalGet(proposal_value)>(Int(2)*App.globalGet(threshold)/Int(3)),  # can only change threshold by less than 33% up or down
-                    App.globalGet(proposal_value)<(Int(4)*App.globalGet(threshold)/Int(3)),
-                    App.globalGet(proposal_value)>Int(4200000),  # must be greater than ~1% of total supply
-                    App.globalGet(proposal_value)<Int(315000069)  # must be less than 75% of total supply
+                    requested.load()>(Int(2)*param("threshold")/Int(3)),  # can only change threshold by less than 33% up or down
+                    requested.load()<(Int(4)*param("threshold")/Int(3)),
+                    requested.load()>Int(4200000),  # must be greater than ~1% of total supply
+                    requested.load()<Int(315000069)  # must be less than 75% of total supply
                 )
             ),
-            App.globalPut(threshold, App.globalGet(proposal_value)),
+            set_param("threshold", requested.load()),
         ]
     )
 
@@ -406,29 +987,26 @@ def approval():
         [
             Assert(
                 And(
-                    App.globalGet(proposal_value)>(Int(2)*App.globalGet(price)/Int(3)),  # can only change price by less than 33% up or down
-                    App.globalGet(proposal_value)<(Int(4)*App.globalGet(price)/Int(3)),
-                    App.globalGet(proposal_value)>Int(9),  # otherwise can't change the price
+                    requested.load()>(Int(2)*param("price")/Int(3)),  # can only change price by less than 33% up or down
+                    requested.load()<(Int(4)*param("price")/Int(3)),
+                    requested.load()>Int(9),  # otherwise can't change the price
                     # price has no maximum, can always be lowered by vote, less important than bounding the min
                 )
             ),
-            App.globalPut(price, App.globalGet(proposal_value)),
+            set_param("price", requested.load()),
         ]
     )
 
     clawback = Seq(  # by vote
         [
             Assert(Txn.assets[0] == App.globalGet(degen2)),
-            Assert(Txn.accounts[1] == App.globalGet(receiver_address)),  # must pass in via accounts, invalid account err otherwise
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.xfer_asset: Txn.assets[0],
-                TxnField.asset_amount: App.globalGet(proposal_value),
-                TxnField.asset_receiver: Global.current_application_address(),  # only clawback to treasury
-                TxnField.asset_sender: Txn.accounts[1],  # the receiver actually loses their tokens
-            }),
-            InnerTxnBuilder.Submit(),
+            Assert(Txn.accounts[1] == receiver_address),  # must pass in via accounts, invalid account err otherwise
+            send_asset(
+                Global.current_application_address(),  # only clawback to treasury
+                requested.load(),
+                Txn.assets[0],
+                sender=Txn.accounts[1],  # the receiver actually loses their tokens
+            ),
 
             # to increment the number, they need to deposit into the contract
             # clawback will only remove tokens if they are unstaked
@@ -439,12 +1017,16 @@ def approval():
 
     slash_stake = Seq(  # by vote
         [
-            Assert(Txn.accounts[1] == App.globalGet(receiver_address)),
+            Assert(Txn.accounts[1] == receiver_address),
             # can't slash more than 50% of someone's stake (can't be executed otherwise)
-            Assert(App.globalGet(proposal_value) <= App.localGet(Txn.accounts[1], stake)/Int(2)),
+            settle(Txn.accounts[1]),  # what they earned before the slash is still theirs
+            sender_stake.store(App.localGet(Txn.accounts[1], stake)),  # the receiver's stake here, not the sender's
+            Assert(requested.load() <= sender_stake.load()/Int(2)),
 
-            App.localPut(Txn.accounts[1], stake, App.localGet(Txn.accounts[1], stake) - App.globalGet(proposal_value)),  # reduce local stake
-            App.globalPut(total_stake, App.globalGet(total_stake) - App.globalGet(proposal_value))  # reduce total, critical!   
+            App.localPut(Txn.accounts[1], stake, sender_stake.load() - requested.load()),  # reduce local stake
+            App.globalPut(total_stake, App.globalGet(total_stake) - requested.load()),  # reduce total, critical!   
+            move_delegated(Txn.accounts[1], Int(0), requested.load(), Int(0)),  # governance can slash a frozen stake
+            emit("slash_stake", Txn.accounts[1], proposal_id.load(), requested.load(), sender_stake.load() - requested.load(), App.globalGet(total_stake)),
         ]
     )
 
@@ -455,20 +1037,23 @@ def approval():
 
         [   
             # give proposal value
-            Assert(Txn.accounts[1] == App.globalGet(receiver_address)),  # must pass in via accounts, invalid account err otherwise
+            Assert(Txn.accounts[1] == receiver_address),  # must pass in via accounts, invalid account err otherwise
             # if proposal value > 10% of balance, must check that upvotes >= 280000046 (2*total_supply/3) for extra security
             If(
-                App.globalGet(proposal_value)>Int(1)*Balance(Global.current_application_address())/Int(10),
-                Assert(App.globalGet(upvotes) >= Int(280000046))  # additional threshold to prevent algo withdraws
+                requested.load()>Int(1)*Balance(Global.current_application_address())/Int(10),
+                Assert(upvotes >= Int(280000046))  # additional threshold to prevent algo withdraws
             ),
 
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.Payment,
-                TxnField.receiver: Txn.accounts[1],
-                TxnField.amount: App.globalGet(proposal_value)
-            }),
-            InnerTxnBuilder.Submit(),
+            # stakers' unclaimed rewards stay in the contract
+            Assert(requested.load() + App.globalGet(rewards_owed) <= Balance(Global.current_application_address()) - MinBalance(Global.current_application_address())),
+            send_algo(Txn.accounts[1], requested.load()),
+        ]
+    )
+
+    share_treasury = Seq(  # one vote pays every staker instead of a pay_algo per recipient
+        [
+            Assert(requested.load() + App.globalGet(rewards_owed) <= Balance(Global.current_application_address()) - MinBalance(Global.current_application_address())),
+            distribute(requested.load()),
         ]
     )
 
@@ -477,58 +1062,152 @@ def approval():
 
         [   
             # give proposal value
-            Assert(Txn.assets[0] == App.globalGet(proposal_index)),  # must be the token they proposed
-            Assert(Txn.accounts[1] == App.globalGet(receiver_address)),  # must pass in via accounts, invalid account err otherwise
+            Assert(Txn.assets[0] == proposal_index),  # must be the token they proposed
+            Assert(Txn.accounts[1] == receiver_address),  # must pass in via accounts, invalid account err otherwise
 
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.xfer_asset: Txn.assets[0],
-                TxnField.asset_receiver: Txn.accounts[1],
-                TxnField.asset_amount: App.globalGet(proposal_value)
-            }),
-            InnerTxnBuilder.Submit(),
+            send_asset(Txn.accounts[1], requested.load(), Txn.assets[0]),
+        ]
+    )
+
+    # pay many assets to the receiver in one execute, e.g. draining or migrating the NFT treasury
+    # the list comes in again as application_args[2] (after the proposal id) and must hash to what was proposed
+    # the assets (and degen2) can be referenced by any txn in the group, add pad calls for references, budget and inner txns
+    payout_list = Txn.application_args[2]
+    payout_offset = ScratchVar(TealType.uint64)
+    degen2_held = AssetHolding.balance(Global.current_application_address(), App.globalGet(degen2))
+    pay_tokens = Seq(
+        [
+            Assert(Txn.accounts[1] == receiver_address),  # must pass in via accounts, invalid account err otherwise
+            Assert(Sha256(payout_list) == payout_hash),  # only the list that was voted on
+
+            For(
+                payout_offset.store(Int(0)),
+                payout_offset.load() < Len(payout_list),
+                payout_offset.store(payout_offset.load() + Int(16)),
+            ).Do(
+                Seq([
+                    If(  # inner groups hold up to 16 txns, fees are pooled from the outer group
+                        payout_offset.load() % Int(256) == Int(0),
+                        InnerTxnBuilder.Begin(),
+                        InnerTxnBuilder.Next(),
+                    ),
+                    InnerTxnBuilder.SetFields({
+                        TxnField.type_enum: TxnType.AssetTransfer,
+                        TxnField.xfer_asset: ExtractUint64(payout_list, payout_offset.load()),
+                        TxnField.asset_amount: ExtractUint64(payout_list, payout_offset.load() + Int(8)),
+                        TxnField.asset_receiver: Txn.accounts[1],
+                    }),
+                    If(
+                        Or(
+                            payout_offset.load() % Int(256) == Int(240),
+                            payout_offset.load() + Int(16) == Len(payout_list),
+                        ),
+                        InnerTxnBuilder.Submit(),
+                    ),
+                ])
+            ),
+
+            # degen2 in the list can't dip into staked or reserved tokens, check what's left once everything is sent
+            degen2_held,
+            Assert(App.globalGet(total_stake) + App.globalGet(reserved) <= degen2_held.value()),
+        ]
+    )
+
+    start_swap1 = put_swap(proposal_index, requested.load(), Global.latest_timestamp() + week)
+
+    # add or retire many swap table entries at once, the list comes in again as application_args[2] like pay_tokens.
+    # boxes "s" + each asset id, pad calls carry the references past the call's own
+    swap_table = Seq(
+        [
+            Assert(Sha256(payout_list) == payout_hash),  # only the list that was voted on
+            For(
+                payout_offset.store(Int(0)),
+                payout_offset.load() < Len(payout_list),
+                payout_offset.store(payout_offset.load() + Int(swap_entry)),
+            ).Do(
+                put_swap(
+                    ExtractUint64(payout_list, payout_offset.load()),
+                    ExtractUint64(payout_list, payout_offset.load() + Int(8)),
+                    ExtractUint64(payout_list, payout_offset.load() + Int(16)),
+                )
+            ),
         ]
     )
 
-    start_swap1 = Seq(
+    # open the airdrop the proposal committed to, its reservation moves from the proposal (close_proposal gives it
+    # back right after) to the airdrop box. boxes: "a" + itob(proposal id) next to the proposal's
+    airdrop_name = ScratchVar(TealType.bytes)
+    airdrop = Seq(
         [
-            App.globalPut(swap_token1, App.globalGet(proposal_index)),
-            App.globalPut(swap_ratio1, App.globalGet(proposal_value)),
-            App.globalPut(end_swap1, Global.latest_timestamp()+week),
+            airdrop_name.store(Concat(Bytes("a"), Itob(proposal_id.load()))),
+            BoxPut(airdrop_name.load(), Concat(payout_hash, Itob(requested.load()), Itob(Global.latest_timestamp() + Int(airdrop_window)), Itob(proposal_index))),
+            App.globalPut(reserved, App.globalGet(reserved) + requested.load()),
+            emit("airdrop", Txn.sender(), proposal_id.load(), requested.load(), proposal_index, Global.latest_timestamp() + Int(airdrop_window)),
         ]
     )
 
+    if dispatch_mode == "cond":
+        execute_branches = Cond(
+            [selected_type.load() == Int(selector_key(proposal_types["start_swap1"])), start_swap1],
+            [selected_type.load() == Int(selector_key(proposal_types["clawback"])), clawback],
+            [selected_type.load() == Int(selector_key(proposal_types["slash_stake"])), slash_stake],
+            [selected_type.load() == Int(selector_key(proposal_types["change_proposal_fee"])), change_proposal_fee],
+            [selected_type.load() == Int(selector_key(proposal_types["change_duration"])), change_duration],
+            [selected_type.load() == Int(selector_key(proposal_types["change_threshold"])), change_threshold],
+            [selected_type.load() == Int(selector_key(proposal_types["change_price"])), change_price],
+            [selected_type.load() == Int(selector_key(proposal_types["pay_algo"])), pay_algo],
+            [selected_type.load() == Int(selector_key(proposal_types["pay_token"])), pay_token],
+            [selected_type.load() == Int(selector_key(proposal_types["pay_tokens"])), pay_tokens],
+            [selected_type.load() == Int(selector_key(proposal_types["share_treasury"])), share_treasury],
+            [selected_type.load() == Int(selector_key(proposal_types["swap_table"])), swap_table],
+            [selected_type.load() == Int(selector_key(proposal_types["airdrop"])), airdrop],
+            [Int(1), Seq([])],  # any other type only carries text, nothing to do
+        )
+    else:
+        execute_branches = dispatch(
+            selected_type.load(),
+            [
+                (proposal_types["start_swap1"], 1, start_swap1),
+                (proposal_types["clawback"], 1, clawback),
+                (proposal_types["slash_stake"], 1, slash_stake),
+                (proposal_types["change_proposal_fee"], 1, change_proposal_fee),
+                (proposal_types["change_duration"], 1, change_duration),
+                (proposal_types["change_threshold"], 1, change_threshold),
+                (proposal_types["change_price"], 1, change_price),
+                (proposal_types["pay_algo"], 1, pay_algo),
+                (proposal_types["pay_token"], 1, pay_token),
+                (proposal_types["pay_tokens"], 1, pay_tokens),
+                (proposal_types["share_treasury"], 1, share_treasury),
+                (proposal_types["swap_table"], 1, swap_table),
+                (proposal_types["airdrop"], 1, airdrop),
+            ],
+            strict=False,  # unknown type, nothing to do
+        )
+
+    executed = ScratchVar(TealType.uint64)
     execute = Seq(
         [   
-            Assert(is_proposal_over),
+            load_proposal,
+            load_params,
+            requested.store(field("value")),
+            selected_type.store(proposal_type),
+            Assert(end_time < Global.latest_timestamp()),  # after vote
+            executed.store(
+                And(
+                    end_time + param("cooldown") > Global.latest_timestamp(),  # within grace period, after it execute only cleans up
+                    did_proposal_pass,
+                ),
+            ),
             If(
-                did_proposal_pass,  # if this,
+                executed.load(),
                 Seq([  # then this
-                        Cond(
-                            [App.globalGet(proposal_type) == op_start_swap1, start_swap1],
-                            [App.globalGet(proposal_type) == op_clawback, clawback],
-                            [App.globalGet(proposal_type) == op_slash_stake, slash_stake],
-                            [App.globalGet(proposal_type) == op_change_pf, change_proposal_fee],
-                            [App.globalGet(proposal_type) == op_change_duration, change_duration],
-                            [App.globalGet(proposal_type) == op_change_threshold, change_threshold],
-                            [App.globalGet(proposal_type) == op_change_price, change_price],
-                            [App.globalGet(proposal_type) == op_pay_algo, pay_algo],
-                            [App.globalGet(proposal_type) == op_pay_token, pay_token],
-                            [App.globalGet(proposal_type) != empty, Seq([reset])],  # evaluate as true
-                        ), 
+                        execute_branches,
                         # pay the executor a small fee
-                        InnerTxnBuilder.Begin(),
-                        InnerTxnBuilder.SetFields({
-                            TxnField.type_enum: TxnType.Payment,
-                            TxnField.receiver: Txn.sender(),
-                            TxnField.amount: Int(1000000)  # pay one algo back
-                        }),
-                        InnerTxnBuilder.Submit(),
-                        
+                        send_algo(Txn.sender(), Int(1000000)),  # pay one algo back
                 ]),
             ),
-            reset,  # always reset after execution
+            close_proposal(),  # always clean up after execution, frees the slot and any reserved degen2
+            emit("execute", Txn.sender(), proposal_id.load(), executed.load()),
             Approve()
         ]
     )
@@ -544,16 +1223,10 @@ def approval():
             Assert(Gtxn[0].receiver() == Global.current_application_address()), 
 
             # must be a stake holder to opt into assets, must hold at least the proposal fee
-            Assert(App.localGet(Txn.sender(), stake) >= App.globalGet(proposal_fee)),
+            load_params,
+            Assert(App.localGet(Txn.sender(), stake) >= param("proposal_fee")),
 
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.asset_receiver: Global.current_application_address(),
-                TxnField.asset_amount: Int(0),
-                TxnField.xfer_asset: Txn.assets[0], # Must be in the assets array sent as part of the application call
-            }),
-            InnerTxnBuilder.Submit(),
+            send_asset(Global.current_application_address(), Int(0), Txn.assets[0]),  # Must be in the assets array sent as part of the application call
             Approve(),
         ]
     )
@@ -567,50 +1240,342 @@ def approval():
             Assert(asset_balance.value() == Int(0)),  # need to check that this is 0 otherwise they can rug the treasury    
             # anyone can opt out the contract out of assets with 0 balance
 
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.asset_receiver: Global.current_application_address(),
-                TxnField.asset_close_to: Txn.sender(),
-                TxnField.asset_amount: Int(0),
-                TxnField.xfer_asset: Txn.assets[0], # Must be in the assets array sent as part of the application call
-            }),
-            InnerTxnBuilder.Submit(),
+            send_asset(Global.current_application_address(), Int(0), Txn.assets[0], close_to=Txn.sender()),
             Approve(),
         ]
     )
 
     # local methods
-    withdraw =  Seq(  # let people withdraw from theirlocal stake and then they can clear 
-        [   
-            Assert(App.globalGet(end_time) < Global.latest_timestamp()),  # only withdraw after voting phase, can leave during grace period
-            If(  # if we're still in the grace period, assert sender isn't receiver. don't want someone to avoid getting stake slashed, but also don't want block receiver until next proposal clears out receiver address
-                App.globalGet(end_time) + App.globalGet(cooldown) > Global.latest_timestamp(),  # still in grace period/vote
-                Assert(Txn.sender() != App.globalGet(receiver_address)),  # receiver's stake is locked until execution is complete, otherwise slash_stake is impotent
-            ),
-            Assert(Gtxn[0].type_enum() == TxnType.Payment),  # essential, DAO benefits from deposits
-            Assert(Gtxn[0].amount() >= Int(1000000)),  # cover txn fees plus prevents abuse
-            Assert(Gtxn[0].receiver() == Global.current_application_address()), 
+    withdrawn = ScratchVar(TealType.uint64)  # Btoi of the amount argument
+
+    def unstake(fee):
+        """Send withdrawn degen2 back out of the sender's stake, fee is the 1 algo payment that comes with it.
+        Rewards have to be settled already."""
+        return Seq([
+            sender_stake.store(App.localGet(Txn.sender(), stake)),
 
-            Assert(Btoi(Txn.application_args[1]) <= App.localGet(Txn.sender(), stake)),
+            Assert(App.localGet(Txn.sender(), locked_until) < Global.latest_timestamp()),  # not while a vote you're in is running, or a proposal paying/slashing you can still execute
+            Assert(fee.type_enum() == TxnType.Payment),  # essential, DAO benefits from deposits
+            Assert(fee.amount() >= Int(1000000)),  # cover txn fees plus prevents abuse
+            Assert(fee.receiver() == Global.current_application_address()), 
+
+            Assert(withdrawn.load() <= sender_stake.load()),
             Assert(Txn.assets[0] == App.globalGet(degen2)),
             
-            InnerTxnBuilder.Begin(),
-            InnerTxnBuilder.SetFields({
-                TxnField.type_enum: TxnType.AssetTransfer,
-                TxnField.xfer_asset: Txn.assets[0],
-                TxnField.asset_receiver: Txn.sender(),
-                TxnField.asset_amount: Btoi(Txn.application_args[1]),
-            }),
-            InnerTxnBuilder.Submit(),
-            App.localPut(Txn.sender(), stake, App.localGet(Txn.sender(), stake) - Btoi(Txn.application_args[1])),  # clear local stake
+            send_asset(Txn.sender(), withdrawn.load(), Txn.assets[0]),
+            App.localPut(Txn.sender(), stake, sender_stake.load() - withdrawn.load()),  # clear local stake
+            move_delegated(Txn.sender(), Int(0), withdrawn.load(), Int(1)),
             
             # take from total stake
-            App.globalPut(total_stake, App.globalGet(total_stake) - Btoi(Txn.application_args[1])),
+            App.globalPut(total_stake, App.globalGet(total_stake) - withdrawn.load()),
+            emit("withdraw", Txn.sender(), withdrawn.load(), sender_stake.load() - withdrawn.load(), App.globalGet(total_stake)),
+        ])
+
+    withdraw =  Seq(  # let people withdraw from theirlocal stake and then they can clear 
+        [   
+            withdrawn.store(Btoi(Txn.application_args[1])),
+            settle(Txn.sender()),  # claims rewards, withdrawing 0 is a plain claim
+            unstake(Gtxn[0]),
+            Approve(),
+        ]
+    )
+
+    # move stake both ways in one group, rewards settled once: Gtxn[0] a degen2 deposit (0 is fine), the call with the
+    # amount to take back, and when that's > 0 the withdraw fee payment at Gtxn[2]. nets out to a partial withdraw
+    # or a top up without a separate withdraw group
+    restake = Seq(
+        [
+            withdrawn.store(Btoi(Txn.application_args[1])),
+            deposit_stake(),
+            If(withdrawn.load() > Int(0), unstake(Gtxn[2])),
+            Approve(),
+        ]
+    )
+
+    # name Txn.accounts[1] as the delegate (the sender itself for none): Gtxn[0] a 1 algo payment into the app, which
+    # covers the delegate box if it's new, then the call. boxes "d" + the old and the new delegate. moving the stake
+    # waits until the old delegate's votes and the sender's own are over, and the new delegate's, so the new one
+    # can't have counted on a proposal without this stake and lose it again on an override
+    delegate_to = Seq(
+        [
+            Assert(Txn.group_index() == Int(1)),
+            Assert(Gtxn[0].type_enum() == TxnType.Payment),
+            Assert(Gtxn[0].amount() >= Int(1000000)),
+            Assert(Gtxn[0].receiver() == Global.current_application_address()),
+
+            sender_stake.store(App.localGet(Txn.sender(), stake)),
+            move_delegated(Txn.sender(), Int(0), sender_stake.load(), Int(1)),  # leave the old one
+            delegated_weight.store(Int(0)),
+            If(
+                Txn.accounts[1] == Txn.sender(),
+                App.localPut(Txn.sender(), delegate, Global.zero_address()),
+                Seq([
+                    App.localPut(Txn.sender(), delegate, Txn.accounts[1]),
+                    Pop(BoxCreate(Concat(Bytes("d"), Txn.accounts[1]), Int(delegate_box_size))),  # 0 if it's there already
+                    move_delegated(Txn.sender(), sender_stake.load(), Int(0), Int(1)),
+                    delegated_weight.store(delegate_field(Int(delegate_fields["delegated"]))),
+                ]),
+            ),
+            emit("delegate", Txn.accounts[1], sender_stake.load(), delegated_weight.load()),
+            Approve(),
+        ]
+    )
+
+    fund_rewards = Seq(  # public, anyone can share algo with the stakers
+        [
+            Assert(Txn.group_index() == Int(1)),  # right after the payment, so a second call can't distribute it again
+            Assert(Gtxn[0].type_enum() == TxnType.Payment),
+            Assert(Gtxn[0].amount() > Int(0)),
+            Assert(Gtxn[0].receiver() == Global.current_application_address()),
+            distribute(Gtxn[0].amount()),
+            emit("fund_rewards", Txn.sender(), Gtxn[0].amount(), App.globalGet(reward_per_share)),
+            Approve(),
+        ]
+    )
+
+    # claim the sender's airdrop leaf: application_args airdrop id, leaf index, amount, then the proof, 32 bytes per
+    # level from the leaf up. assets: degen2, boxes: "a" + itob(id) and the leaf's bitmap box. each level is a sha256,
+    # deep trees need pad calls for budget
+    leaf_index = ScratchVar(TealType.uint64)
+    position = ScratchVar(TealType.uint64)  # the node's index in its level, its low bit says which side it's on
+    node = ScratchVar(TealType.bytes)
+    proof = Txn.application_args[4]
+    bitmap_name = ScratchVar(TealType.bytes)
+    claimed = ScratchVar(TealType.bytes)  # the byte of the bitmap holding the leaf's bit
+    claim = Seq(
+        [
+            airdrop_name.store(Concat(Bytes("a"), Itob(Btoi(Txn.application_args[1])))),
+            header := BoxGet(airdrop_name.load()),
+            Assert(header.hasValue()),  # unknown or closed
+            record.store(header.value()),
+            leaf_index.store(Btoi(Txn.application_args[2])),
+            requested.store(Btoi(Txn.application_args[3])),
+            Assert(leaf_index.load() < ExtractUint64(record.load(), Int(airdrop_fields["count"]))),
+            Assert(Global.latest_timestamp() < ExtractUint64(record.load(), Int(airdrop_fields["end_time"]))),
+            Assert(Txn.assets[0] == App.globalGet(degen2)),
+
+            node.store(Sha256(Concat(Txn.sender(), Itob(leaf_index.load()), Itob(requested.load())))),
+            position.store(leaf_index.load()),
+            For(
+                payout_offset.store(Int(0)),
+                payout_offset.load() < Len(proof),
+                payout_offset.store(payout_offset.load() + Int(32)),
+            ).Do(
+                Seq([
+                    node.store(Sha256(If(
+                        position.load() % Int(2),
+                        Concat(Extract(proof, payout_offset.load(), Int(32)), node.load()),
+                        Concat(node.load(), Extract(proof, payout_offset.load(), Int(32))),
+                    ))),
+                    position.store(position.load() / Int(2)),
+                ])
+            ),
+            Assert(node.load() == Extract(record.load(), Int(0), Int(32))),  # the root voted on
+
+            # one bit per leaf, the app account pays for each bitmap box until close_airdrop
+            bitmap_name.store(Concat(airdrop_name.load(), Itob(leaf_index.load() / Int(airdrop_chunk)))),
+            Pop(BoxCreate(bitmap_name.load(), Int(airdrop_chunk // 8))),
+            position.store(leaf_index.load() % Int(airdrop_chunk)),
+            claimed.store(BoxExtract(bitmap_name.load(), position.load() / Int(8), Int(1))),
+            Assert(Not(GetBit(claimed.load(), position.load() % Int(8)))),  # claimed already
+            BoxReplace(bitmap_name.load(), position.load() / Int(8), SetBit(claimed.load(), position.load() % Int(8), Int(1))),
+
+            BoxReplace(airdrop_name.load(), Int(airdrop_fields["remaining"]), Itob(ExtractUint64(record.load(), Int(airdrop_fields["remaining"])) - requested.load())),
+            App.globalPut(reserved, App.globalGet(reserved) - requested.load()),
+            send_asset(Txn.sender(), requested.load(), Txn.assets[0]),
+            emit("claim", Txn.sender(), Btoi(Txn.application_args[1]), leaf_index.load(), requested.load(), ExtractUint64(record.load(), Int(airdrop_fields["remaining"])) - requested.load()),
+            Approve(),
+        ]
+    )
+
+    # anyone can close an airdrop after its window: what's unclaimed is no longer reserved, the boxes go.
+    # application_args: the airdrop id, boxes: "a" + itob(id) and every bitmap box it can have, made or not
+    close_airdrop = Seq(
+        [
+            airdrop_name.store(Concat(Bytes("a"), Itob(Btoi(Txn.application_args[1])))),
+            closed := BoxGet(airdrop_name.load()),
+            Assert(closed.hasValue()),
+            record.store(closed.value()),
+            Assert(ExtractUint64(record.load(), Int(airdrop_fields["end_time"])) < Global.latest_timestamp()),
+            App.globalPut(reserved, App.globalGet(reserved) - ExtractUint64(record.load(), Int(airdrop_fields["remaining"]))),
+            For(
+                position.store(Int(0)),
+                position.load() * Int(airdrop_chunk) < ExtractUint64(record.load(), Int(airdrop_fields["count"])),
+                position.store(position.load() + Int(1)),
+            ).Do(
+                Pop(BoxDelete(Concat(airdrop_name.load(), Itob(position.load())))),
+            ),
+            Pop(BoxDelete(airdrop_name.load())),
+            emit("close_airdrop", Txn.sender(), Btoi(Txn.application_args[1]), ExtractUint64(record.load(), Int(airdrop_fields["remaining"]))),
             Approve(),
         ]
     )
 
+    # no-op call clients add to a group for more opcode budget, inner txn quota and shared asset/account references
+    pad = Approve()
+
+    # read-only queries, layouts in queries. they only read, so a client can simulate them instead of fetching
+    # global, local and box state and working out the contract's predicates itself
+    held = ScratchVar(TealType.uint64)  # the app's degen2
+    spare = ScratchVar(TealType.uint64)  # of that, what's neither staked nor reserved, what buy and swap1 can sell
+
+    def load_spare():
+        holding = AssetHolding.balance(Global.current_application_address(), Txn.assets[0])
+        return Seq([
+            Assert(Txn.assets[0] == App.globalGet(degen2)),
+            holding,
+            held.store(holding.value()),
+            spare.store(If(
+                held.load() > App.globalGet(total_stake) + App.globalGet(reserved),
+                held.load() - App.globalGet(total_stake) - App.globalGet(reserved),
+                Int(0),
+            )),
+        ])
+
+    proposal_status = Seq(
+        [
+            load_params,
+            proposal_id.store(Btoi(Txn.application_args[1])),
+            status_box := BoxGet(proposal_box),
+            record.store(If(status_box.hasValue(), status_box.value(), BytesZero(Int(proposal_receiver)))),
+            selected_type.store(
+                If(Not(status_box.hasValue())).Then(Int(proposal_states.index("none")))
+                .ElseIf(Global.latest_timestamp() < end_time).Then(Int(proposal_states.index("voting")))  # as cast_vote
+                .ElseIf(And(end_time + param("cooldown") > Global.latest_timestamp(), did_proposal_pass)).Then(Int(proposal_states.index("passed")))
+                .Else(Int(proposal_states.index("failed")))
+            ),
+            returns("proposal_status", selected_type.load(), proposal_type, field("value"), proposal_index, end_time, upvotes, dnvotes),
+        ]
+    )
+
+    # what a buy paying application_args[1] microalgo gets, available if a buy of it alone would go through
+    quote = Seq(
+        [
+            load_params,
+            load_spare(),
+            purchase.store(Btoi(Txn.application_args[1]) / param("price")),
+            returns("quote", purchase.load(), param("price"), And(purchase.load() > Int(0), purchase.load() <= spare.load())),
+        ]
+    )
+
+    # what swap1 gives for application_args[2] units of token application_args[1], ratio 0 if it isn't in the table
+    swap_quote = Seq(
+        [
+            load_spare(),
+            swap_asset.store(Btoi(Txn.application_args[1])),
+            quoted := BoxGet(Concat(Bytes("s"), Itob(swap_asset.load()))),
+            record.store(If(quoted.hasValue(), quoted.value(), BytesZero(Int(swap_box_size)))),
+            sell_rate.store(ExtractUint64(record.load(), Int(swap_fields["ratio"]))),
+            purchase.store(If(sell_rate.load(), Btoi(Txn.application_args[2]) / sell_rate.load(), Int(0))),
+            returns(
+                "swap_quote", purchase.load(), sell_rate.load(), ExtractUint64(record.load(), Int(swap_fields["end_time"])),
+                And(
+                    purchase.load() > Int(0),
+                    purchase.load() <= spare.load(),
+                    Global.latest_timestamp() < ExtractUint64(record.load(), Int(swap_fields["end_time"])),
+                ),
+            ),
+        ]
+    )
+
+    headroom = Seq(
+        [
+            load_spare(),
+            returns("headroom", held.load(), App.globalGet(total_stake), App.globalGet(reserved), spare.load()),
+        ]
+    )
+
+    # whether Txn.accounts[1] can vote on proposal application_args[1] now, and with how much: its stake plus what's
+    # delegated to it and hasn't voted itself, as cast_vote counts it
+    voter = Txn.accounts[1]
+    voted = ScratchVar(TealType.uint64)
+    eligibility = Seq(
+        [
+            proposal_id.store(Btoi(Txn.application_args[1])),
+            eligible_box := BoxGet(proposal_box),
+            record.store(If(eligible_box.hasValue(), eligible_box.value(), BytesZero(Int(proposal_receiver)))),  # end_time 0, closed
+            sender_stake.store(Int(0)),
+            voted.store(Int(0)),
+            held.store(Int(0)),  # locked_until
+            If(
+                App.optedIn(voter, Global.current_application_id()),
+                Seq([
+                    sender_stake.store(App.localGet(voter, stake)),
+                    voted.store(ExtractUint64(App.localGet(voter, last_vote), proposal_id.load() % Int(max_open_proposals) * Int(8)) == proposal_id.load()),
+                    held.store(App.localGet(voter, locked_until)),
+                    voter_delegates := BoxLen(Concat(Bytes("d"), voter)),
+                    If(
+                        voter_delegates.hasValue(),
+                        Seq([
+                            delegate_name.store(Concat(Bytes("d"), voter)),
+                            delegate_slot.store(Int(delegate_slots) + proposal_id.load() % Int(max_open_proposals) * Int(24)),
+                            delegated_weight.store(delegate_field(Int(delegate_fields["delegated"]))),
+                            If(  # the left out stake only counts in the proposal's own slot, an older id reads as empty
+                                delegate_field(delegate_slot.load()) == proposal_id.load(),
+                                delegated_weight.store(
+                                    If(
+                                        delegated_weight.load() > delegate_field(delegate_slot.load() + Int(16)),
+                                        delegated_weight.load() - delegate_field(delegate_slot.load() + Int(16)),
+                                        Int(0),
+                                    )
+                                ),
+                            ),
+                            sender_stake.store(sender_stake.load() + delegated_weight.load()),
+                        ]),
+                    ),
+                ]),
+            ),
+            returns(
+                "eligibility",
+                And(Global.latest_timestamp() < end_time, Not(voted.load()), sender_stake.load() > Int(0)),
+                sender_stake.load(), voted.load(), held.load(),
+            ),
+        ]
+    )
+
+    handlers = {
+        "create_token": create_token,
+        "creator_token_opt_in": creator_token_opt_in,
+        "token_opt_in": token_opt_in,
+        "token_opt_out": token_opt_out,
+        "swap1": swap1,
+        "buy": buy,
+        "propose": propose,
+        "up_px": up_px,
+        "dn_px": dn_px,
+        "local_stake": local_stake,
+        "execute": execute,
+        "withdraw": withdraw,
+        "pad": pad,
+        "fund_rewards": fund_rewards,
+        "stake_vote": stake_vote,
+        "restake": restake,
+        "delegate": delegate_to,
+        "proposal_status": proposal_status,
+        "quote": quote,
+        "swap_quote": swap_quote,
+        "headroom": headroom,
+        "eligibility": eligibility,
+        "claim": claim,
+        "close_airdrop": close_airdrop,
+    }
+
+    if dispatch_mode == "tree":
+        return If(
+            And(Txn.application_id() != Int(0), Txn.on_completion() == OnComplete.NoOp),  # hot path first, skips the on-completion chain
+            Seq([
+                selected_method.store(Btoi(Txn.application_args[0])),
+                dispatch(
+                    selected_method.load(),
+                    [(selector, method_weights.get(name, 1), handlers[name]) for name, selector in methods.items()],
+                ),
+            ]),
+            program.event(
+                init=on_creation,
+                opt_in=contract_opt_in,
+            ),
+        )
+
     return program.event(
         init=on_creation,
         opt_in= contract_opt_in, 
@@ -626,7 +1591,19 @@ def approval():
             [Txn.application_args[0] == op_dnvote, dn_px],
             [Txn.application_args[0] == op_local_stake, local_stake],
             [Txn.application_args[0] == op_execute, execute],
-            [Txn.application_args[0] == op_withdraw, withdraw]
+            [Txn.application_args[0] == op_withdraw, withdraw],
+            [Txn.application_args[0] == Bytes(methods["pad"]), pad],
+            [Txn.application_args[0] == Bytes(methods["fund_rewards"]), fund_rewards],
+            [Txn.application_args[0] == Bytes(methods["stake_vote"]), stake_vote],
+            [Txn.application_args[0] == Bytes(methods["restake"]), restake],
+            [Txn.application_args[0] == Bytes(methods["delegate"]), delegate_to],
+            [Txn.application_args[0] == Bytes(methods["proposal_status"]), proposal_status],
+            [Txn.application_args[0] == Bytes(methods["quote"]), quote],
+            [Txn.application_args[0] == Bytes(methods["swap_quote"]), swap_quote],
+            [Txn.application_args[0] == Bytes(methods["headroom"]), headroom],
+            [Txn.application_args[0] == Bytes(methods["eligibility"]), eligibility],
+            [Txn.application_args[0] == Bytes(methods["claim"]), claim],
+            [Txn.application_args[0] == Bytes(methods["close_airdrop"]), close_airdrop],
         )
     )
 
@@ -634,10 +1611,6 @@ def clear():
     return Approve()
 
 if __name__ == "__main__":
-    with open("degen2_approval.teal", "w") as f:
-        compiled = compileTeal(approval(), mode=Mode.Application, version=6)
-        f.write(compiled)
-
-    with open("degen2_clear_state.teal", "w") as f:
-        compiled = compileTeal(clear(), mode=Mode.Application, version=6)
-        f.write(compiled)
\ No newline at end of file
+    import sys
+    import degen2_build
+    raise SystemExit(degen2_build.main(["--out", "."] + sys.argv[1:]))  # degen2_approval.teal, degen2_clear_state.teal here, as before
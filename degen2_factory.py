@@ -0,0 +1,230 @@
+"""
+Factory for degen2 councils: one app keeps the compiled approval and clear programs in boxes and deploys new DAOs
+from them with inner txns, so a council is one group instead of compiling, creating and initializing it by hand.
+
+The factory's creator uploads the assembled programs once (load, a few calls per program, again after a contract
+change). deploy takes the duration, proposal fee, threshold and optional swap token the DAO is created with, right
+after a payment into the factory, and runs two inner groups:
+    create          the DAO from the program boxes with global_schema(packed), local_schema() and extra_pages
+    fund, init      the payment less what the factory keeps for the create and the registry box, create_token (ct)
+                    opening the swap, creator_token_opt_in (ci) of the swap token. the factory is every DAO's creator
+then records the DAO in the registry, a box "i" + itob(instance) laid out as instance_fields with programs_hash() of
+the programs it was created from, and logs a "deploy" event in the DAO's event format.
+
+The factory being the creator, creator_token_opt_in is only reachable through it: opt_in forwards one from the
+deployer of a registry instance, within the DAO's own opt in window.
+
+ct with a swap token writes the new DAO's "s" + itob(token) box, which the group has to reference by app id before
+the app exists: degen2_client's Factory.deploy takes the id from a simulate of the same group, a deploy by someone
+else landing in between makes the group fail and it's sent again.
+
+usage:
+    python degen2_factory.py            # degen2_factory.teal here, with the DAO's programs it uploads
+    python degen2_build.py --factory    # with the DAO programs into build/
+"""
+
+import hashlib
+
+from pyteal import *
+from pyteal_helpers import program
+
+from degen2_contract import extra_pages, global_schema, local_schema, methods as dao_methods
+
+# application_args[0] of every no_op call
+methods = {
+    "load": "ld",  # args: program box, program size, offset, chunk. the creator only, offset 0 starts the box over
+    "deploy": "dp",  # args: duration, proposal fee, threshold, optional swap token. the call after a payment in
+    "opt_in": "oi",  # args: instance. the deployer only, creator_token_opt_in of assets[0] for the instance's DAO
+    "pad": "z",
+}
+program_boxes = {"approval": "A", "clear": "C"}  # assembled bytecode of the DAO's programs
+load_chunk = 2000  # program bytes per load call, the rest of its 2048 bytes of args are the other three
+max_page = 4096  # an ApprovalProgramPages entry is one stack value
+
+# registry boxes "i" + itob(instance), the DAO's app id and when it was deployed at these offsets, the deployer
+# address in between, programs_hash() of its programs at the end
+instance_fields = {
+    "app": 0,
+    "created": 40,
+}
+instance_deployer = 8
+instance_programs = 48
+instance_box_size = 80
+
+# log() of every deploy: the selector, the deployer, then these uint64s
+events = {
+    "deploy": ("instance", "app"),
+}
+
+
+def factory_schema():
+    """(uints, byte slices) of the global state schema to create the factory with."""
+    return 1, 0
+
+
+def create_min_balance(packed=False):
+    """Min balance a DAO's creator takes on: the app, its extra pages and its global schema."""
+    uints, byte_slices = global_schema(packed)
+    return 100000 * (1 + extra_pages) + 28500 * uints + 50000 * byte_slices
+
+
+def kept(packed=False):
+    """microalgo of a deploy's payment the factory keeps, its min balance grows that much. The rest funds the DAO."""
+    return create_min_balance(packed) + 2500 + 400 * (9 + instance_box_size)
+
+
+def programs_hash(approval, clear):
+    """sha256 of the sha256s of an approval's max_page pages and of the clear program, as deploy records it."""
+    pages = [approval[offset:offset + max_page] for offset in range(0, len(approval), max_page)]
+    return hashlib.sha256(b"".join(hashlib.sha256(page).digest() for page in pages + [clear])).digest()
+
+
+def decode_event(record):
+    """(event name, deployer, {field: value}) of a factory log record, None if it isn't one of events."""
+    for name, fields in events.items():
+        if record[:2] == methods[name].encode() and len(record) == 34 + 8 * len(fields):
+            values = [int.from_bytes(record[34 + 8 * i:42 + 8 * i], "big") for i in range(len(fields))]
+            return name, record[2:34], dict(zip(fields, values))
+    return None
+
+
+def approval(packed=False):
+    """packed deploys approval(packed=True) DAOs: load that program and the factory creates them with its schema."""
+    # globals
+    instances = Bytes("n")  # uint64, DAOs deployed, the next one's registry index
+
+    approval_box = Bytes(program_boxes["approval"])
+    clear_box = Bytes(program_boxes["clear"])
+    uints, byte_slices = global_schema(packed)
+    local_uints, local_byte_slices = local_schema()
+
+    on_creation = Seq([
+        App.globalPut(instances, Int(0)),
+        Approve(),
+    ])
+
+    program_name = Txn.application_args[1]
+    offset = Btoi(Txn.application_args[3])
+    load = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(Or(program_name == approval_box, program_name == clear_box)),
+        If(offset == Int(0), Seq([  # a new upload, the size may have changed
+            Pop(BoxDelete(program_name)),
+            Assert(BoxCreate(program_name, Btoi(Txn.application_args[2]))),
+        ])),
+        BoxReplace(program_name, offset, Txn.application_args[4]),
+        Approve(),
+    ])
+
+    payment = Gtxn[Txn.group_index() - Int(1)]
+    swap_token = Txn.application_args[4]
+    approval_size = BoxLen(approval_box)
+    clear_program = BoxGet(clear_box)
+    page = ScratchVar(TealType.bytes)
+    hashes = ScratchVar(TealType.bytes)  # programs_hash()'s sha256s so far
+    created = ScratchVar(TealType.uint64)
+    created_address = AppParam.address(created.load())
+    deploy = Seq([
+        Assert(Txn.group_index() > Int(0)),
+        Assert(payment.type_enum() == TxnType.Payment),
+        Assert(payment.receiver() == Global.current_application_address()),
+        Assert(payment.amount() > Int(kept(packed))),
+        approval_size,
+        clear_program,
+        Assert(And(approval_size.hasValue(), clear_program.hasValue())),
+        page.store(BoxExtract(
+            approval_box, Int(0), If(approval_size.value() > Int(max_page), Int(max_page), approval_size.value()),
+        )),
+        hashes.store(Sha256(page.load())),
+
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.ApplicationCall,
+            TxnField.approval_program_pages: [page.load()],
+            TxnField.clear_state_program: clear_program.value(),
+            TxnField.global_num_uints: Int(uints),
+            TxnField.global_num_byte_slices: Int(byte_slices),
+            TxnField.local_num_uints: Int(local_uints),
+            TxnField.local_num_byte_slices: Int(local_byte_slices),
+            TxnField.extra_program_pages: Int(extra_pages),
+            TxnField.application_args: [Txn.application_args[1], Txn.application_args[2], Txn.application_args[3]],
+        }),
+        If(  # the rest as a second page, approval and clear together are at most 2048 * (1 + extra_pages) bytes
+            approval_size.value() > Int(max_page),
+            Seq([
+                page.store(BoxExtract(approval_box, Int(max_page), approval_size.value() - Int(max_page))),
+                hashes.store(Concat(hashes.load(), Sha256(page.load()))),
+                InnerTxnBuilder.SetField(TxnField.approval_program_pages, [page.load()]),
+            ]),
+        ),
+        InnerTxnBuilder.Submit(),
+        created.store(InnerTxn.created_application_id()),
+        created_address,
+
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.Payment,
+            TxnField.receiver: created_address.value(),
+            TxnField.amount: payment.amount() - Int(kept(packed)),
+        }),
+        InnerTxnBuilder.Next(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.ApplicationCall,
+            TxnField.application_id: created.load(),
+            TxnField.application_args: [Bytes(dao_methods["create_token"])],
+        }),
+        If(Txn.application_args.length() > Int(4), Seq([
+            InnerTxnBuilder.SetField(TxnField.application_args, [swap_token]),
+            InnerTxnBuilder.Next(),
+            InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.ApplicationCall,
+                TxnField.application_id: created.load(),
+                TxnField.application_args: [Bytes(dao_methods["creator_token_opt_in"])],
+                TxnField.assets: [Btoi(swap_token)],
+            }),
+        ])),
+        InnerTxnBuilder.Submit(),
+
+        BoxPut(
+            Concat(Bytes("i"), Itob(App.globalGet(instances))),
+            Concat(
+                Itob(created.load()), Txn.sender(), Itob(Global.latest_timestamp()),
+                Sha256(Concat(hashes.load(), Sha256(clear_program.value()))),
+            ),
+        ),
+        Log(Concat(Bytes(methods["deploy"]), Txn.sender(), Itob(App.globalGet(instances)), Itob(created.load()))),
+        App.globalPut(instances, App.globalGet(instances) + Int(1)),
+        Approve(),
+    ])
+
+    instance = BoxGet(Concat(Bytes("i"), Txn.application_args[1]))
+    opt_in = Seq([
+        instance,
+        Assert(instance.hasValue()),
+        Assert(Txn.sender() == Extract(instance.value(), Int(instance_deployer), Int(32))),
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({  # the DAO checks its opt in window and sends the opt in itself
+            TxnField.type_enum: TxnType.ApplicationCall,
+            TxnField.application_id: ExtractUint64(instance.value(), Int(instance_fields["app"])),
+            TxnField.application_args: [Bytes(dao_methods["creator_token_opt_in"])],
+            TxnField.assets: [Txn.assets[0]],
+        }),
+        InnerTxnBuilder.Submit(),
+        Approve(),
+    ])
+
+    return program.event(
+        init=on_creation,
+        no_op=Cond(
+            [Txn.application_args[0] == Bytes(methods["deploy"]), deploy],
+            [Txn.application_args[0] == Bytes(methods["load"]), load],
+            [Txn.application_args[0] == Bytes(methods["opt_in"]), opt_in],
+            [Txn.application_args[0] == Bytes(methods["pad"]), Approve()],
+        ),
+    )
+
+
+if __name__ == "__main__":
+    import sys
+    import degen2_build
+    raise SystemExit(degen2_build.main(["--out", ".", "--factory"] + sys.argv[1:]))
@@ -0,0 +1,458 @@
+"""
+Streaming indexer: the DAO's history from its txn stream into SQLite, for stake, vote and treasury dashboards.
+
+Reads txns in the shape of the Algorand indexer's /v2/transactions (one JSON object per line in a file, or paged from
+an indexer endpoint) and decodes each app call: the method selector, the log records (degen2_contract.events) and
+the global/local state deltas, plus algo and asset flows in and out of the app account. Rows are buffered and
+written with executemany in one SQLite transaction per batch, batches only end on round boundaries and record the
+last round written, so a restart picks up after it and memory stays at one batch however long the stream is.
+
+tables (see schema): calls, stakes, votes, proposals, executions, sales, transfers, delegations, swaps, airdrops,
+claims, deltas, checkpoint.
+A delegator voting itself after its delegate did is a votes row for the delegate with the stake as a negative weight.
+
+usage:
+    python degen2_indexer.py --synthesize 20000 stream.jsonl          # random groups through degen2_interpreter
+    python degen2_indexer.py --jsonl stream.jsonl --app-id 1001 --db degen2.sqlite
+    python degen2_indexer.py --indexer http://localhost:8980 --app-id 1001 --db degen2.sqlite
+"""
+
+import argparse
+import base64
+import hashlib
+import heapq
+import json
+import random
+import sqlite3
+import sys
+import time
+
+from degen2_contract import decode_event, methods, proposal_types
+
+schema = """
+create table if not exists calls (round integer, intra integer, txid text, sender text, method text, on_completion text);
+create table if not exists stakes (
+    round integer, txid text, account text, event text, amount integer, stake integer, total_stake integer, proposal integer
+);
+create table if not exists votes (
+    round integer, txid text, proposal integer, account text, side text, weight integer, tally integer
+);
+create table if not exists proposals (
+    proposal integer primary key, round integer, txid text, proposer text, type text, value integer, asset integer,
+    end_time integer, executed integer, executed_round integer
+);
+create table if not exists executions (round integer, txid text, proposal integer, executor text, executed integer);
+create table if not exists sales (round integer, txid text, account text, method text, bought integer);
+create table if not exists transfers (
+    round integer, txid text, direction text, account text, asset integer, amount integer, method text
+);
+create table if not exists delegations (
+    round integer, txid text, account text, delegate text, stake integer, delegated integer
+);
+create table if not exists swaps (round integer, txid text, asset integer, ratio integer, end_time integer);
+create table if not exists airdrops (
+    round integer, txid text, airdrop integer, account text, event text, amount integer, count integer, end_time integer
+);
+create table if not exists claims (
+    round integer, txid text, airdrop integer, account text, leaf integer, amount integer, remaining integer
+);
+create table if not exists deltas (
+    round integer, intra integer, txid text, account text, key text, uint integer, bytes blob, deleted integer
+);
+create table if not exists checkpoint (app_id integer primary key, round integer);
+create index if not exists calls_sender on calls (sender);
+create index if not exists stakes_account on stakes (account);
+create index if not exists votes_proposal on votes (proposal);
+create index if not exists votes_account on votes (account);
+create index if not exists executions_proposal on executions (proposal);
+create index if not exists sales_account on sales (account);
+create index if not exists transfers_account on transfers (account);
+create index if not exists delegations_account on delegations (account);
+create index if not exists delegations_delegate on delegations (delegate);
+create index if not exists swaps_asset on swaps (asset);
+create index if not exists airdrops_airdrop on airdrops (airdrop);
+create index if not exists claims_airdrop on claims (airdrop);
+create index if not exists claims_account on claims (account);
+create index if not exists deltas_account on deltas (account, key);
+"""
+
+# columns of each table, rows are tuples in this order
+columns = {
+    "calls": ("round", "intra", "txid", "sender", "method", "on_completion"),
+    "stakes": ("round", "txid", "account", "event", "amount", "stake", "total_stake", "proposal"),
+    "votes": ("round", "txid", "proposal", "account", "side", "weight", "tally"),
+    "proposals": ("proposal", "round", "txid", "proposer", "type", "value", "asset", "end_time"),
+    "executions": ("round", "txid", "proposal", "executor", "executed"),
+    "sales": ("round", "txid", "account", "method", "bought"),
+    "transfers": ("round", "txid", "direction", "account", "asset", "amount", "method"),
+    "delegations": ("round", "txid", "account", "delegate", "stake", "delegated"),
+    "swaps": ("round", "txid", "asset", "ratio", "end_time"),  # ratio 0: retired
+    # event airdrop: opened with amount over count leaves, close_airdrop: amount unclaimed went back to the treasury
+    "airdrops": ("round", "txid", "airdrop", "account", "event", "amount", "count", "end_time"),
+    "claims": ("round", "txid", "airdrop", "account", "leaf", "amount", "remaining"),
+    "deltas": ("round", "intra", "txid", "account", "key", "uint", "bytes", "deleted"),
+}
+
+missing = object()
+method_names = {selector: name for name, selector in methods.items()}
+type_names = {selector: name for name, selector in proposal_types.items()}
+
+
+def encode_address(raw):
+    """Base32 address with checksum, like algosdk.encoding.encode_address without needing algosdk."""
+    checksum = hashlib.new("sha512_256", raw).digest()[-4:]
+    return base64.b32encode(raw + checksum).decode().rstrip("=")
+
+
+def application_address(app_id):
+    return encode_address(hashlib.new("sha512_256", b"appID" + app_id.to_bytes(8, "big")).digest())
+
+
+def decode_txn(txn, app_id, app_address):
+    """(table, row) for everything one top level txn did to the app, empty if it didn't touch it."""
+    round, intra, txid = txn["confirmed-round"], txn.get("intra-round-offset", 0), txn["id"]
+    kind = txn["tx-type"]
+    if kind == "pay":
+        payment = txn["payment-transaction"]
+        if payment["receiver"] == app_address and payment["amount"]:
+            yield "transfers", (round, txid, "in", txn["sender"], 0, payment["amount"], None)
+        return
+    if kind == "axfer":
+        transfer = txn["asset-transfer-transaction"]
+        if transfer["receiver"] == app_address and transfer["amount"]:
+            yield "transfers", (round, txid, "in", txn["sender"], transfer["asset-id"], transfer["amount"], None)
+        return
+    call = txn.get("application-transaction")
+    if kind != "appl" or call["application-id"] != app_id:
+        return
+
+    args = [base64.b64decode(arg) for arg in call.get("application-args", [])]
+    method = method_names.get(args[0].decode(errors="replace")) if args and call["on-completion"] == "noop" else None
+    yield "calls", (round, intra, txid, txn["sender"], method, call["on-completion"])
+
+    for record in txn.get("logs", []):
+        event = decode_event(base64.b64decode(record))
+        if event is None:
+            continue
+        name, account, fields = event
+        account = encode_address(account)
+        if name in ("local_stake", "withdraw", "slash_stake"):
+            yield "stakes", (
+                round, txid, account, name, fields["amount"], fields["stake"], fields["total_stake"], fields.get("proposal"),
+            )
+        elif name in ("up_px", "dn_px"):
+            tally = fields["upvotes"] if name == "up_px" else fields["dnvotes"]
+            yield "votes", (round, txid, fields["proposal"], account, name[:2], fields["stake"], tally)
+        elif name == "override":
+            side = ("up", "dn")[fields["side"] - 1]
+            yield "votes", (round, txid, fields["proposal"], account, side, -fields["stake"], fields["tally"])
+        elif name == "delegate":
+            delegate = None if account == txn["sender"] else account  # None: it took its stake back
+            yield "delegations", (round, txid, txn["sender"], delegate, fields["stake"], fields["delegated"])
+        elif name == "propose":
+            selector = fields["type"].to_bytes(8, "big").lstrip(b"\0").decode(errors="replace")
+            yield "proposals", (
+                fields["proposal"], round, txid, account, type_names.get(selector, selector), fields["value"],
+                fields["index"], fields["end_time"],
+            )
+        elif name == "execute":
+            yield "executions", (round, txid, fields["proposal"], account, fields["executed"])
+        elif name == "swap_table":
+            yield "swaps", (round, txid, fields["asset"], fields["ratio"], fields["end_time"])
+        elif name == "airdrop":
+            yield "airdrops", (round, txid, fields["proposal"], account, name, fields["amount"], fields["count"], fields["end_time"])
+        elif name == "close_airdrop":
+            yield "airdrops", (round, txid, fields["airdrop"], account, name, fields["remaining"], None, None)
+        elif name == "claim":
+            yield "claims", (round, txid, fields["airdrop"], account, fields["index"], fields["amount"], fields["remaining"])
+        elif name in ("buy", "swap1"):
+            yield "sales", (round, txid, account, name, fields["bought"])
+        # fund_rewards comes in as the payment in front of it
+
+    for delta in txn.get("global-state-delta", []):
+        yield "deltas", (round, intra, txid, None) + decode_delta(delta)
+    for account in txn.get("local-state-delta", []):
+        for delta in account["delta"]:
+            yield "deltas", (round, intra, txid, account["address"]) + decode_delta(delta)
+
+    for inner in txn.get("inner-txns", []):
+        if inner["tx-type"] == "pay" and inner["payment-transaction"]["amount"]:
+            payment = inner["payment-transaction"]
+            yield "transfers", (round, txid, "out", payment["receiver"], 0, payment["amount"], method)
+        elif inner["tx-type"] == "axfer" and inner["asset-transfer-transaction"]["amount"]:
+            transfer = inner["asset-transfer-transaction"]
+            yield "transfers", (
+                round, txid, "out", transfer["receiver"], transfer["asset-id"], transfer["amount"], method,
+            )
+
+
+def decode_delta(delta):
+    """(key, uint, bytes, deleted) of one state delta entry, action 1 sets bytes, 2 a uint, 3 deletes."""
+    value = delta["value"]
+    key = base64.b64decode(delta["key"]).decode(errors="replace")
+    if value["action"] == 1:
+        return key, None, base64.b64decode(value.get("bytes", "")), 0
+    if value["action"] == 2:
+        return key, value.get("uint", 0), None, 0
+    return key, None, None, 1
+
+
+class Store:
+    """The SQLite side: buffered rows, one transaction per flush, and the checkpoint."""
+
+    def __init__(self, path, app_id):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(schema)
+        self.app_id = app_id
+        self.buffer = {table: [] for table in columns}
+        self.size = 0
+        row = self.db.execute("select round from checkpoint where app_id = ?", (app_id,)).fetchone()
+        self.round = row[0] if row else 0  # everything up to and including this round is written
+
+    def add(self, table, row):
+        self.buffer[table].append(row)
+        self.size += 1
+
+    def flush(self, round):
+        """Write the buffer, all rounds up to round are complete."""
+        with self.db:
+            for table, rows in self.buffer.items():
+                if rows:
+                    self.db.executemany(
+                        "insert or replace into %s (%s) values (%s)" % (table, ", ".join(columns[table]), ", ".join("?" * len(columns[table]))),
+                        rows,
+                    )
+            # proposals are inserted first, so an execute in the same batch finds its proposal
+            self.db.executemany(
+                "update proposals set executed = ?, executed_round = ? where proposal = ?",
+                [(executed, round_, proposal) for round_, _, proposal, _, executed in self.buffer["executions"]],
+            )
+            self.db.execute("insert or replace into checkpoint (app_id, round) values (?, ?)", (self.app_id, round))
+        for rows in self.buffer.values():
+            rows.clear()
+        self.size = 0
+        self.round = round
+
+
+def index(txns, store, batch=50000, out=sys.stdout):
+    """Decode txns (in round order) into store, skipping rounds already written. Returns the number of txns read."""
+    app_address = application_address(store.app_id)
+    count = 0
+    current = None
+    start = time.perf_counter()
+    for txn in txns:
+        round = txn["confirmed-round"]
+        if round <= store.round:
+            continue
+        if round != current:
+            if current is not None and store.size >= batch:
+                store.flush(current)
+                out.write("round %d, %d txns, %.0f txns/s\n" % (current, count, count / (time.perf_counter() - start)))
+            current = round
+        for table, row in decode_txn(txn, store.app_id, app_address):
+            store.add(table, row)
+        count += 1
+    if current is not None:
+        store.flush(current)
+    elapsed = time.perf_counter() - start
+    out.write("%d txns indexed up to round %d in %.2fs: %.0f txns/s\n" % (count, store.round, elapsed, count / max(elapsed, 1e-9)))
+    return count
+
+
+def read_jsonl(path):
+    """Txns from a file of one indexer txn object per line."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_indexer(address, token, app_id, min_round, page=1000):
+    """Txns from an indexer endpoint: calls to the app merged with payments/transfers to its account, in chain order."""
+    from algosdk.v2client.indexer import IndexerClient
+    client = IndexerClient(token, address)
+
+    def pages(search, **filters):
+        next_page = None
+        while True:
+            response = search(min_round=min_round, limit=page, next_page=next_page, **filters)
+            yield from response.get("transactions", [])
+            next_page = response.get("next-token")
+            if not next_page or not response.get("transactions"):
+                return
+
+    calls = pages(client.search_transactions, application_id=app_id)
+    deposits = (
+        txn for txn in pages(client.search_transactions_by_address, address=application_address(app_id))
+        if txn["tx-type"] in ("pay", "axfer")
+    )
+    order = lambda txn: (txn["confirmed-round"], txn.get("intra-round-offset", 0))
+    return heapq.merge(calls, deposits, key=order)
+
+
+def synthesize(path, groups, seed=0, users=16, groups_per_round=4, out=sys.stdout):
+    """Write a stream of approved random groups run through degen2_interpreter, in the indexer's txn shape.
+
+    State deltas come from diffing the app's global state and the group's accounts' local state around each group.
+    Returns the app id the stream is for.
+    """
+    from degen2_interpreter import TealBackend
+    from degen2_model import Dao, call, random_group, setup
+    backend = TealBackend()
+    ledger = backend.ledger
+    addresses = backend.new_accounts(users, 10**12)
+    swap_token = backend.create_asset(addresses[0], 10**9)
+    args = (3 * 24 * 3600, 10, 4200001)
+    app_id, app = backend.create_app(addresses[0], args)
+    dao = Dao(app_id, app, addresses[0], now=backend.now())
+    for address in addresses:
+        dao.fund(address, 10**12)
+    dao.create_asset(addresses[0], 10**9, asset_id=swap_token)
+    dao.apply([call(addresses[0], 0, *args)])
+    rng = random.Random(seed)
+    round, intra, written = 1, 0, 0
+
+    def run(group):
+        nonlocal round, intra, written
+        touched = {address for txn in group if txn.type == "appl" for address in txn.accounts}
+        before_global = dict(ledger.globals[app_id])
+        before_local = {address: dict(ledger.locals.get(address, {}).get(app_id, {})) for address in touched}
+        result = ledger.apply(group)
+        dao.apply(group, result.created)
+        if not result.approved:
+            return
+        if intra // 16 >= groups_per_round:
+            round, intra = round + 1, 0
+        for index, txn in enumerate(group):
+            record = indexer_txn(txn, round, intra, ledger.now)
+            if txn.type == "appl":
+                record["logs"] = [base64.b64encode(log).decode() for i, log in result.logs if i == index]
+                record["inner-txns"] = [inner_txn(fields, app) for i, fields in result.inner if i == index]
+                record["global-state-delta"] = state_delta(before_global, ledger.globals[app_id])
+                record["local-state-delta"] = [
+                    {"address": encode_address(address), "delta": delta}
+                    for address in sorted(touched)
+                    for delta in [state_delta(before_local[address], ledger.locals.get(address, {}).get(app_id, {}))]
+                    if delta
+                ]
+            f.write(json.dumps(record) + "\n")
+            intra += 1
+            written += 1
+        intra = (intra // 16 + 1) * 16  # next group starts on its own block of offsets
+
+    with open(path, "w") as f:
+        for group in setup(dao, addresses, addresses[0], [swap_token]):
+            run(group)
+        for _ in range(groups):
+            group = random_group(dao, rng, addresses)
+            if isinstance(group, int):
+                backend.advance(group)
+                dao.now = backend.now()
+                round, intra = round + 1, 0
+                continue
+            run(group)
+    out.write("%d txns for app %d written to %s\n" % (written, app_id, path))
+    return app_id
+
+
+def indexer_txn(txn, round, intra, now):
+    """A degen2_model Txn as the indexer shows it."""
+    record = {
+        "id": hashlib.sha256(b"%d:%d" % (round, intra)).hexdigest(),
+        "confirmed-round": round,
+        "intra-round-offset": intra,
+        "round-time": now,
+        "sender": encode_address(txn.sender),
+        "tx-type": txn.type,
+        "fee": txn.fee,
+    }
+    if txn.type == "pay":
+        record["payment-transaction"] = {"receiver": encode_address(txn.receiver), "amount": txn.amount}
+    elif txn.type == "axfer":
+        record["asset-transfer-transaction"] = {
+            "receiver": encode_address(txn.receiver), "amount": txn.amount, "asset-id": txn.asset,
+        }
+    else:
+        record["application-transaction"] = {
+            "application-id": txn.app_id,
+            "on-completion": txn.on_completion,
+            "application-args": [base64.b64encode(arg).decode() for arg in txn.args],
+            "accounts": [encode_address(address) for address in txn.accounts[1:]],
+            "foreign-assets": list(txn.assets),
+        }
+    return record
+
+
+def inner_txn(fields, app):
+    """An itxn_field dict from degen2_interpreter as the indexer shows the inner txn."""
+    sender = encode_address(fields.get("Sender", app))
+    if fields["TypeEnum"] == 1:
+        return {"tx-type": "pay", "sender": sender, "payment-transaction": {
+            "receiver": encode_address(fields.get("Receiver", bytes(32))), "amount": fields.get("Amount", 0),
+        }}
+    if fields["TypeEnum"] == 4:
+        return {"tx-type": "axfer", "sender": sender, "asset-transfer-transaction": {
+            "receiver": encode_address(fields.get("AssetReceiver", bytes(32))), "amount": fields.get("AssetAmount", 0),
+            "asset-id": fields.get("XferAsset", 0),
+        }}
+    if fields["TypeEnum"] == 6:  # degen2_factory's calls into the DAOs it deploys, theirs nested under them
+        app_id = fields.get("ApplicationID", 0)
+        callee = (app_id or fields["CreatedApplicationID"]).to_bytes(8, "big")
+        callee = hashlib.new("sha512_256", b"appID" + callee).digest()
+        return {"tx-type": "appl", "sender": sender, "application-transaction": {
+            "application-id": app_id, "on-completion": "noop",
+            "application-args": [base64.b64encode(arg).decode() for arg in fields.get("ApplicationArgs", [])],
+        }, "created-application-index": fields.get("CreatedApplicationID", 0),
+            "logs": [base64.b64encode(record).decode() for record in fields.get("Logs", [])],
+            "inner-txns": [inner_txn(inner, callee) for inner in fields.get("InnerTxns", [])]}
+    return {"tx-type": "acfg", "sender": sender, "created-asset-index": fields.get("CreatedAssetID", 0)}
+
+
+def state_delta(before, after):
+    """The indexer's state delta list between two {key: value} dicts."""
+    delta = []
+    for key in sorted(set(before) | set(after)):
+        if key not in after:
+            value = {"action": 3}
+        elif before.get(key, missing) == after[key]:
+            continue
+        elif isinstance(after[key], int):
+            value = {"action": 2, "uint": after[key]}
+        else:
+            value = {"action": 1, "bytes": base64.b64encode(after[key]).decode()}
+        delta.append({"key": base64.b64encode(key).decode(), "value": value})
+    return delta
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="index the degen2 DAO's txn stream into SQLite")
+    parser.add_argument("--synthesize", type=int, metavar="GROUPS", help="write a random stream to the path given and exit")
+    parser.add_argument("path", nargs="?", help="output file of --synthesize")
+    parser.add_argument("--jsonl", help="file of indexer txns, one per line, in round order")
+    parser.add_argument("--indexer", help="indexer endpoint, e.g. http://localhost:8980")
+    parser.add_argument("--indexer-token", default="a" * 64)
+    parser.add_argument("--app-id", type=int)
+    parser.add_argument("--db", default="degen2.sqlite")
+    parser.add_argument("--batch", type=int, default=50000, help="rows buffered before a write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.synthesize:
+        if not args.path:
+            parser.error("--synthesize needs an output path")
+        synthesize(args.path, args.synthesize, args.seed)
+        return 0
+    if not args.app_id or not (args.jsonl or args.indexer):
+        parser.error("--app-id and one of --jsonl / --indexer are required")
+    store = Store(args.db, args.app_id)
+    if args.jsonl:
+        txns = read_jsonl(args.jsonl)
+    else:
+        txns = read_indexer(args.indexer, args.indexer_token, args.app_id, store.round + 1)
+    index(txns, store, args.batch)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
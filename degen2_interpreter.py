@@ -0,0 +1,1120 @@
+"""
+Local evaluator for the approval program, no node needed.
+
+Runs the TEAL text (degen2_approval.teal, or approval() compiled on the fly) against a synthetic Ledger: accounts,
+asset holdings, apps with their global/local state and boxes. apply() takes a group of degen2_model Txns and returns
+a Result with approval, the inner txns sent, the log records and the opcode cost charged per txn and per source line.
+Budget is pooled over the group's app calls like on chain, so a group short on pad calls fails here too.
+
+Covers the opcodes and fields this contract and degen2_factory emit (TEAL 9) plus the common stack ops, anything
+else raises. Like degen2_model, fees and resource availability aren't checked. Inner app calls (degen2_factory's)
+run as a group of their own, and an inner create needs program bytes from Ledger.assemble: there's no assembler
+here, the bytes stand in for the TEAL they were made from.
+
+usage:
+    python degen2_interpreter.py                    # a walk through the proposal life cycle, cost per group
+    python degen2_interpreter.py --profile 15       # plus the 15 most expensive source lines
+    python degen2_interpreter.py --bench 2000       # random degen2_model groups, scenarios per second
+    python degen2_interpreter.py --differential 5000 --seed 1  # degen2_model.differential() without a node
+    python degen2_interpreter.py --approval degen2_approval.teal
+"""
+
+import argparse
+import collections
+import hashlib
+import os
+import random
+import sys
+import time
+
+from degen2_analyzer import Program, costs, parse_bytes, parse_int
+from degen2_model import axfer, call, pay
+
+app_budget = 700
+max_stack_bytes = 4096
+zero_address = bytes(32)
+missing = object()  # journal marker for a key that wasn't in the dict
+type_enums = {"pay": 1, "acfg": 3, "axfer": 4, "appl": 6}
+on_completions = {"noop": 0, "optin": 1, "closeout": 2, "clear": 3, "update": 4, "delete": 5}
+array_fields = {
+    "ApplicationArgs", "Accounts", "Assets", "Applications", "ApprovalProgramPages", "ClearStateProgramPages",
+}
+
+
+class Failure(Exception):
+    """The txn is rejected: err, a failed assert, a panic, a 0 on top of the stack or a ledger rule."""
+
+
+def application_address(app_id):
+    return hashlib.new("sha512_256", b"appID" + app_id.to_bytes(8, "big")).digest()
+
+
+class Code:
+    """A Program decoded for running: immediates parsed, labels resolved to instruction indexes."""
+
+    def __init__(self, teal):
+        program = Program(teal)
+        self.version = program.version
+        self.intc = program.intc
+        self.bytec = program.bytec
+        self.lines = []  # source line of each instruction
+        self.ops = []  # (op, decoded immediates, cost)
+        for op, args, line in program.ops:
+            if op in ("b", "bz", "bnz", "callsub"):
+                args = program.labels[args[0]]
+            elif op in ("int", "pushint"):
+                args = parse_int(args[0])
+            elif op in ("byte", "pushbytes"):
+                args = parse_bytes(" ".join(args) if args[0] == "base64" else args[0])
+            elif op in ("intcblock", "bytecblock"):
+                args = None
+            elif op.startswith("intc_") or op.startswith("bytec_"):
+                args = int(op.rsplit("_", 1)[1])
+                op = op.rsplit("_", 1)[0]
+            elif op in ("intc", "bytec", "load", "store", "frame_dig", "frame_bury", "dig", "cover", "uncover",
+                        "bury", "popn", "dupn", "replace2"):
+                args = int(args[0])
+            elif op in ("extract", "proto"):
+                args = (int(args[0]), int(args[1]))
+            elif op in ("gtxn", "gtxna", "txna"):
+                args = tuple(parse_int(a) if a.isdigit() else a for a in args)
+            self.ops.append((op, args, costs.get(op, 1)))
+            self.lines.append(line)
+        self.source = teal.splitlines()
+
+
+class App:
+    __slots__ = ("approval", "clear", "creator", "global_schema", "local_schema", "extra_pages")
+
+    def __init__(self, approval, clear, creator, global_schema, local_schema, extra_pages=0):
+        self.approval = approval
+        self.clear = clear
+        self.creator = creator
+        self.global_schema = global_schema  # (uints, byte slices)
+        self.local_schema = local_schema
+        self.extra_pages = extra_pages
+
+
+class Result:
+    """What a group did. cost is per txn (0 for non app calls), profile is opcode cost per (app id, source line)."""
+
+    __slots__ = ("approved", "error", "failed_at", "cost", "inner", "created", "logs", "profile")
+
+    def __init__(self):
+        self.approved = True
+        self.error = None
+        self.failed_at = None  # group index of the txn that failed
+        self.cost = []
+        self.inner = []  # (group index, itxn field dict) of every inner txn submitted, an app call's own in "InnerTxns"
+        self.created = []  # ids of assets created by inner txns, at any depth
+        self.logs = []  # (group index, record) of every log
+        self.profile = collections.Counter()
+
+
+class Ledger:
+    """Everything a group reads and writes. Setup helpers (fund, create_asset, opt_in_asset) bypass the journal."""
+
+    def __init__(self, now=0, next_id=1000):
+        self.now = now  # Global.LatestTimestamp
+        self.round = 1
+        self.next_id = next_id
+        self.algo = {}  # address -> microalgo
+        self.holdings = {}  # address -> {asset: amount}, present when opted in
+        self.assets = {}  # asset -> (creator, clawback, total)
+        self.apps = {}  # app id -> App
+        self.app_ids = {}  # app address -> app id
+        self.globals = {}  # app id -> {key: value}
+        self.locals = {}  # address -> {app id: {key: value}}, present when opted in
+        self.boxes = {}  # app id -> {name: bytes}
+        self.programs = {}  # program bytes from assemble() -> the TEAL an app created with them runs
+        self.journal = []
+
+    # setup
+    def fund(self, address, algo):
+        self.algo[address] = self.algo.get(address, 0) + algo
+
+    def create_asset(self, creator, total, clawback=None, asset_id=None):
+        asset_id = asset_id or self._new_id()
+        self.assets[asset_id] = (creator, clawback, total)
+        self.holdings.setdefault(creator, {})[asset_id] = total
+        return asset_id
+
+    def opt_in_asset(self, address, asset):
+        self.holdings.setdefault(address, {}).setdefault(asset, 0)
+
+    def create_app(self, creator, approval_teal, clear_teal, args=(), global_schema=(64, 0), local_schema=(16, 0),
+                   extra_pages=0):
+        """Create an app running the given TEAL, returns (app id, Result of the create call)."""
+        app_id = self._new_id()
+        self.apps[app_id] = App(Code(approval_teal), Code(clear_teal), creator, global_schema, local_schema, extra_pages)
+        self.app_ids[application_address(app_id)] = app_id
+        self.globals[app_id] = {}
+        self.boxes[app_id] = {}
+        result = self.apply([call(creator, app_id, *args)], creating=app_id)
+        if not result.approved:
+            del self.apps[app_id], self.globals[app_id], self.boxes[app_id]
+        return app_id, result
+
+    def assemble(self, teal):
+        """Stand-in bytecode for teal, as long as goal would assemble it: an app created with it runs teal."""
+        digest = hashlib.sha256(teal.encode()).digest()
+        size = Program(teal).size()
+        program = (digest * (size // len(digest) + 1))[:size]
+        self.programs[program] = teal
+        return program
+
+    # reads
+    def min_balance(self, address):
+        """100000 per account and asset, the local schemas opted in to, the apps it created with their extra pages
+        and global schemas, and boxes if it's an app account."""
+        balance = 100000 * (1 + len(self.holdings.get(address, ())))
+        for app_id in self.locals.get(address, ()):
+            uints, byte_slices = self.apps[app_id].local_schema
+            balance += 100000 + 28500 * uints + 50000 * byte_slices
+        for app in self.apps.values():
+            if app.creator == address:
+                uints, byte_slices = app.global_schema
+                balance += 100000 * (1 + app.extra_pages) + 28500 * uints + 50000 * byte_slices
+        if address in self.app_ids:
+            boxes = self.boxes[self.app_ids[address]]
+            balance += sum(2500 + 400 * (len(name) + len(value)) for name, value in boxes.items())
+        return balance
+
+    def snapshot(self, app_id, addresses=()):
+        """The app's state in the shape degen2_model.Dao.snapshot returns."""
+        app = application_address(app_id)
+        return {
+            "global": dict(self.globals[app_id]),
+            "local": {
+                address: dict(self.locals[address][app_id])
+                for address in addresses if app_id in self.locals.get(address, ())
+            },
+            "boxes": dict(self.boxes[app_id]),
+            "algo": self.algo.get(app, 0),
+            "holdings": dict(self.holdings.get(app, {})),
+        }
+
+    # groups
+    def apply(self, group, creating=None, extra_budget=0):
+        """Run a group, all or nothing. creating is the id of the app the group's first txn creates, extra_budget
+        opcode budget on top of the app calls' pooled 700 each (simulate's extra-opcode-budget)."""
+        result = Result()
+        self.journal = []
+        budget = [app_budget * sum(1 for txn in group if txn.type == "appl") + extra_budget]
+        try:
+            if not 0 < len(group) <= 16:
+                raise Failure("group size")
+            for index, txn in enumerate(group):
+                result.failed_at = index
+                if txn.type == "pay":
+                    self._pay(txn.sender, txn.receiver, txn.amount)
+                    result.cost.append(0)
+                elif txn.type == "axfer":
+                    self._axfer(txn.sender, txn.receiver, txn.asset, txn.amount)
+                    result.cost.append(0)
+                else:
+                    result.cost.append(self._call(group, index, txn, budget, result, creating if index == 0 else None))
+            result.failed_at = None
+        except Failure as e:
+            self._undo()
+            result.approved = False
+            result.error = str(e)
+            result.inner, result.created, result.logs = [], [], []  # nothing of a failed group makes it on chain
+        return result
+
+    def simulate(self, group, extra_budget=0):
+        """The Result apply() would give group, with nothing it wrote kept, like algod's simulate."""
+        next_id = self.next_id
+        result = self.apply(group, extra_budget=extra_budget)
+        self._undo()
+        self.next_id = next_id
+        return result
+
+    # journaled writes
+    def _undo(self):
+        for target, key, old in reversed(self.journal):
+            if old is missing:
+                del target[key]
+            else:
+                target[key] = old
+        self.journal = []
+
+    def _put(self, mapping, key, value):
+        self.journal.append((mapping, key, mapping.get(key, missing)))
+        mapping[key] = value
+
+    def _pop(self, mapping, key):
+        self.journal.append((mapping, key, mapping[key]))
+        del mapping[key]
+
+    def _holdings(self, address):
+        if address not in self.holdings:
+            self._put(self.holdings, address, {})
+        return self.holdings[address]
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _check_min_balance(self, address):
+        if self.algo.get(address, 0) or self.holdings.get(address):  # an empty account has no minimum
+            if self.algo.get(address, 0) < self.min_balance(address):
+                raise Failure("below min balance")
+
+    def _pay(self, sender, receiver, amount):
+        if self.algo.get(sender, 0) < amount:
+            raise Failure("algo overspend")
+        self._put(self.algo, sender, self.algo.get(sender, 0) - amount)
+        self._put(self.algo, receiver, self.algo.get(receiver, 0) + amount)
+
+    def _axfer(self, sender, receiver, asset, amount, clawback_from=None, close_to=None):
+        source = self._holdings(clawback_from or sender)
+        target = self._holdings(receiver)
+        if clawback_from is None and sender == receiver and amount == 0 and asset not in target:
+            if asset not in self.assets:
+                raise Failure("unknown asset")
+            self._put(target, asset, 0)  # opt in
+            return
+        if clawback_from is not None and self.assets.get(asset, (None, None))[1] != sender:
+            raise Failure("not the clawback")
+        if asset not in source or asset not in target:
+            raise Failure("asset not opted in")
+        if source[asset] < amount:
+            raise Failure("asset overspend")
+        self._put(source, asset, source[asset] - amount)
+        self._put(target, asset, target[asset] + amount)
+        if close_to is not None:
+            closer = self._holdings(close_to)
+            if asset not in closer and self.assets[asset][0] != close_to:
+                raise Failure("close to not opted in")
+            self._put(closer, asset, closer.get(asset, 0) + source[asset])
+            self._pop(source, asset)
+
+    def _call(self, group, index, txn, budget, result, creating):
+        app_id = creating or txn.app_id
+        if app_id not in self.apps:
+            raise Failure("unknown app")
+        app = self.apps[app_id]
+        if txn.sender not in self.locals:
+            self._put(self.locals, txn.sender, {})
+        opted = self.locals[txn.sender]
+        if txn.on_completion == "clear":
+            if app_id not in opted:
+                raise Failure("not opted in")
+            cost = Eval(self, group, index, app_id, app.clear, budget, result, creating).run(clear=True)
+            self._pop(opted, app_id)
+            return cost
+        if txn.on_completion == "optin":
+            if app_id in opted:
+                raise Failure("already opted in")
+            self._put(opted, app_id, {})
+        cost = Eval(self, group, index, app_id, app.approval, budget, result, creating).run()
+        self._check_min_balance(application_address(app_id))
+        return cost
+
+
+class Eval:
+    """One run of a program for one app call of the group."""
+
+    def __init__(self, ledger, group, index, app_id, code, budget, result, creating):
+        self.ledger = ledger
+        self.group = group
+        self.index = index
+        self.txn = group[index]
+        self.app_id = app_id
+        self.app_address = application_address(app_id)
+        self.code = code
+        self.budget = budget  # [opcode budget left in the group's pool]
+        self.result = result
+        self.creating = creating
+        self.stack = []
+        self.scratch = [0] * 256
+        self.frames = []
+        self.inner = None  # inner group being built
+        self.logged = [0, 0]  # log calls, bytes logged
+        self.last_inner = None
+
+    def run(self, clear=False):
+        code, stack, profile = self.code, self.stack, self.result.profile
+        pc, cost = 0, 0
+        ops = code.ops
+        try:
+            while pc < len(ops):
+                op, args, op_cost = ops[pc]
+                cost += op_cost
+                self.budget[0] -= op_cost
+                profile[(self.app_id, code.lines[pc])] += op_cost
+                if self.budget[0] < 0:
+                    raise Failure("dynamic cost budget exceeded")
+                if op == "b":
+                    pc = args
+                    continue
+                if op == "bz" or op == "bnz":
+                    if (stack.pop() != 0) == (op == "bnz"):
+                        pc = args
+                        continue
+                elif op == "callsub":
+                    self.frames.append([pc + 1, len(stack), 0, 0])
+                    pc = args
+                    continue
+                elif op == "retsub":
+                    ret, height, nargs, nrets = self.frames.pop()
+                    if nargs or nrets:
+                        results = stack[len(stack) - nrets:] if nrets else []
+                        del stack[height - nargs:]
+                        stack.extend(results)
+                    pc = ret
+                    continue
+                elif op == "return":
+                    return self._finish(stack.pop(), cost, clear)
+                else:
+                    handler = getattr(self, "op_" + opnames.get(op, op), None)
+                    if handler is None:
+                        raise Failure("interpreter doesn't implement " + op)
+                    handler(args)
+                pc += 1
+            if len(stack) != 1:
+                raise Failure("stack should hold exactly one value at the end")
+            return self._finish(stack.pop(), cost, clear)
+        except (IndexError, TypeError, OverflowError) as e:
+            raise Failure("panic at line %d: %s" % (code.lines[min(pc, len(ops) - 1)], e))
+        except Failure as e:
+            if not str(e).startswith("panic at line"):
+                raise Failure("%s at line %d" % (e, code.lines[min(pc, len(ops) - 1)]))
+            raise
+
+    def _finish(self, value, cost, clear):
+        if not clear and (type(value) is not int or value == 0):  # a failing clear program still clears
+            raise Failure("rejected")
+        return cost
+
+    # helpers
+    def uint(self, value):
+        if type(value) is not int:
+            raise Failure("expected a uint64")
+        if value > 0xFFFFFFFFFFFFFFFF:
+            raise Failure("uint64 overflow")
+        return value
+
+    def bytes_(self, value):
+        if type(value) is not bytes:
+            raise Failure("expected bytes")
+        if len(value) > max_stack_bytes:
+            raise Failure("bytes value over 4096")
+        return value
+
+    def account(self, ref):
+        """An account argument: an address, or an index into Accounts."""
+        if type(ref) is int:
+            accounts = self.txn.accounts
+            if ref >= len(accounts):
+                raise Failure("invalid account index")
+            return accounts[ref]
+        return ref
+
+    def binary(self, fn):
+        b, a = self.stack.pop(), self.stack.pop()
+        self.stack.append(fn(self.uint(a), self.uint(b)))
+
+    def txn_field(self, txn, index, field, array_index=None):
+        if field == "Sender":
+            return txn.sender
+        if field == "TypeEnum":
+            return type_enums[txn.type]
+        if field == "Receiver":
+            return txn.receiver if txn.type == "pay" else zero_address
+        if field == "Amount":
+            return txn.amount if txn.type == "pay" else 0
+        if field == "AssetReceiver":
+            return txn.receiver if txn.type == "axfer" else zero_address
+        if field == "AssetAmount":
+            return txn.amount if txn.type == "axfer" else 0
+        if field == "XferAsset":
+            return txn.asset if txn.type == "axfer" else 0
+        if field == "Fee":
+            return txn.fee
+        if field == "GroupIndex":
+            return index
+        if field == "ApplicationID":
+            if txn.type != "appl" or (txn is self.txn and self.creating):
+                return 0
+            return txn.app_id
+        if field == "OnCompletion":
+            return on_completions[txn.on_completion] if txn.type == "appl" else 0
+        if field == "NumAppArgs":
+            return len(txn.args)
+        if field == "NumAccounts":
+            return len(txn.accounts) - 1
+        if field == "NumAssets":
+            return len(txn.assets)
+        if field == "ApplicationArgs":
+            return txn.args[array_index]
+        if field == "Accounts":
+            return txn.accounts[array_index]
+        if field == "Assets":
+            return txn.assets[array_index]
+        raise Failure("interpreter doesn't implement txn field " + field)
+
+    def inner_call(self, fields):
+        """Run an inner app call as a group of its own, creating the app first if ApplicationID is 0."""
+        ledger, sender = self.ledger, self.app_address
+        app_id, creating = fields.get("ApplicationID", 0), None
+        if not app_id:
+            approval = b"".join(fields.get("ApprovalProgramPages", [])) or fields.get("ApprovalProgram", b"")
+            clear = b"".join(fields.get("ClearStateProgramPages", [])) or fields.get("ClearStateProgram", b"")
+            if approval not in ledger.programs or clear not in ledger.programs:
+                raise Failure("interpreter can only create apps from Ledger.assemble bytes")
+            app_id = creating = ledger._new_id()
+            ledger._put(ledger.apps, app_id, App(
+                Code(ledger.programs[approval]), Code(ledger.programs[clear]), sender,
+                (fields.get("GlobalNumUint", 0), fields.get("GlobalNumByteSlice", 0)),
+                (fields.get("LocalNumUint", 0), fields.get("LocalNumByteSlice", 0)), fields.get("ExtraProgramPages", 0),
+            ))
+            ledger._put(ledger.app_ids, application_address(app_id), app_id)
+            ledger._put(ledger.globals, app_id, {})
+            ledger._put(ledger.boxes, app_id, {})
+            fields["CreatedApplicationID"] = app_id
+        elif app_id not in ledger.apps:
+            raise Failure("unknown app")
+        on_completion = {value: name for name, value in on_completions.items()}[fields.get("OnCompletion", 0)]
+        txn = call(sender, app_id, *fields.get("ApplicationArgs", ()), on_completion=on_completion,
+                   accounts=fields.get("Accounts", ()), assets=fields.get("Assets", ()))
+        self.budget[0] += app_budget  # every inner app call adds to the pool, like on chain
+        result = Result()
+        result.profile = self.result.profile
+        ledger._call([txn], 0, txn, self.budget, result, creating)
+        self.result.created += result.created
+        fields["Logs"] = [record for _, record in result.logs]
+        fields["InnerTxns"] = [inner for _, inner in result.inner]
+
+    # constants, scratch, stack
+    def op_int(self, args):
+        self.stack.append(args)
+
+    def op_byte(self, args):
+        self.stack.append(args)
+
+    def op_intc(self, args):
+        self.stack.append(self.code.intc[args])
+
+    def op_bytec(self, args):
+        self.stack.append(self.code.bytec[args])
+
+    def op_intcblock(self, args):
+        pass
+
+    def op_load(self, args):
+        self.stack.append(self.scratch[args])
+
+    def op_store(self, args):
+        self.scratch[args] = self.stack.pop()
+
+    def op_pop(self, args):
+        self.stack.pop()
+
+    def op_dup(self, args):
+        self.stack.append(self.stack[-1])
+
+    def op_dup2(self, args):
+        self.stack.extend(self.stack[-2:])
+
+    def op_dig(self, args):
+        self.stack.append(self.stack[-1 - args])
+
+    def op_swap(self, args):
+        self.stack[-1], self.stack[-2] = self.stack[-2], self.stack[-1]
+
+    def op_cover(self, args):
+        self.stack.insert(len(self.stack) - 1 - args, self.stack.pop())
+
+    def op_uncover(self, args):
+        self.stack.append(self.stack.pop(len(self.stack) - 1 - args))
+
+    def op_select(self, args):
+        c, b, a = self.stack.pop(), self.stack.pop(), self.stack.pop()
+        self.stack.append(b if self.uint(c) else a)
+
+    def op_proto(self, args):
+        self.frames[-1][2:] = args
+
+    def op_frame_dig(self, args):
+        self.stack.append(self.stack[self.frames[-1][1] + args])
+
+    def op_frame_bury(self, args):
+        value = self.stack.pop()
+        self.stack[self.frames[-1][1] + args] = value
+
+    # flow
+    def op_err(self, args):
+        raise Failure("err")
+
+    def op_assert(self, args):
+        if self.stack.pop() == 0:
+            raise Failure("assert failed")
+
+    # arithmetic and logic
+    def op_add(self, args):
+        self.binary(lambda a, b: self.uint(a + b))
+
+    def op_sub(self, args):
+        def sub(a, b):
+            if a < b:
+                raise Failure("- would be negative")
+            return a - b
+        self.binary(sub)
+
+    def op_mul(self, args):
+        self.binary(lambda a, b: self.uint(a * b))
+
+    def op_div(self, args):
+        def div(a, b):
+            if b == 0:
+                raise Failure("/ 0")
+            return a // b
+        self.binary(div)
+
+    def op_mod(self, args):
+        def mod(a, b):
+            if b == 0:
+                raise Failure("% 0")
+            return a % b
+        self.binary(mod)
+
+    def op_lt(self, args):
+        self.binary(lambda a, b: int(a < b))
+
+    def op_gt(self, args):
+        self.binary(lambda a, b: int(a > b))
+
+    def op_le(self, args):
+        self.binary(lambda a, b: int(a <= b))
+
+    def op_ge(self, args):
+        self.binary(lambda a, b: int(a >= b))
+
+    def op_and(self, args):
+        self.binary(lambda a, b: int(bool(a and b)))
+
+    def op_or(self, args):
+        self.binary(lambda a, b: int(bool(a or b)))
+
+    def op_eq(self, args):
+        b, a = self.stack.pop(), self.stack.pop()
+        if type(a) is not type(b):
+            raise Failure("== of a uint64 and bytes")
+        self.stack.append(int(a == b))
+
+    def op_ne(self, args):
+        self.op_eq(args)
+        self.stack.append(1 - self.stack.pop())
+
+    def op_not(self, args):
+        self.stack.append(int(self.uint(self.stack.pop()) == 0))
+
+    def op_mulw(self, args):
+        b, a = self.uint(self.stack.pop()), self.uint(self.stack.pop())
+        product = a * b
+        self.stack.extend([product >> 64, product & 0xFFFFFFFFFFFFFFFF])
+
+    def op_divmodw(self, args):
+        d_lo, d_hi, n_lo, n_hi = (self.uint(self.stack.pop()) for _ in range(4))
+        divisor, dividend = (d_hi << 64) | d_lo, (n_hi << 64) | n_lo
+        if divisor == 0:
+            raise Failure("divmodw by 0")
+        quotient, remainder = divmod(dividend, divisor)
+        mask = 0xFFFFFFFFFFFFFFFF
+        self.stack.extend([quotient >> 64, quotient & mask, remainder >> 64, remainder & mask])
+
+    # bytes
+    def op_btoi(self, args):
+        value = self.bytes_(self.stack.pop())
+        if len(value) > 8:
+            raise Failure("btoi of more than 8 bytes")
+        self.stack.append(int.from_bytes(value, "big"))
+
+    def op_itob(self, args):
+        self.stack.append(self.uint(self.stack.pop()).to_bytes(8, "big"))
+
+    def op_len(self, args):
+        self.stack.append(len(self.bytes_(self.stack.pop())))
+
+    def op_concat(self, args):
+        b, a = self.bytes_(self.stack.pop()), self.bytes_(self.stack.pop())
+        self.stack.append(self.bytes_(a + b))
+
+    def op_bzero(self, args):
+        self.stack.append(bytes(self.uint(self.stack.pop())))
+
+    def op_sha256(self, args):
+        self.stack.append(hashlib.sha256(self.bytes_(self.stack.pop())).digest())
+
+    def op_getbit(self, args):
+        bit, value = self.uint(self.stack.pop()), self.stack.pop()
+        if type(value) is int:
+            if bit >= 64:
+                raise Failure("getbit index beyond uint64")
+            self.stack.append(value >> bit & 1)
+            return
+        if bit >= 8 * len(value):
+            raise Failure("getbit index beyond bytes")
+        self.stack.append(value[bit // 8] >> (7 - bit % 8) & 1)  # bit 0 is the high bit of the first byte
+
+    def op_setbit(self, args):
+        new, bit, value = self.uint(self.stack.pop()), self.uint(self.stack.pop()), self.stack.pop()
+        if new > 1:
+            raise Failure("setbit value > 1")
+        if type(value) is int:
+            if bit >= 64:
+                raise Failure("setbit index beyond uint64")
+            self.stack.append(value | 1 << bit if new else value & ~(1 << bit))
+            return
+        if bit >= 8 * len(value):
+            raise Failure("setbit index beyond bytes")
+        mask = 1 << (7 - bit % 8)
+        byte = value[bit // 8] | mask if new else value[bit // 8] & ~mask
+        self.stack.append(value[:bit // 8] + bytes([byte]) + value[bit // 8 + 1:])
+
+    def op_extract(self, args):
+        start, length = args
+        value = self.bytes_(self.stack.pop())
+        end = len(value) if length == 0 else start + length
+        if start > len(value) or end > len(value):
+            raise Failure("extract out of range")
+        self.stack.append(value[start:end])
+
+    def op_extract3(self, args):
+        length, start = self.uint(self.stack.pop()), self.uint(self.stack.pop())
+        value = self.bytes_(self.stack.pop())
+        if start + length > len(value):
+            raise Failure("extract out of range")
+        self.stack.append(value[start:start + length])
+
+    def op_extract_uint64(self, args):
+        start, value = self.uint(self.stack.pop()), self.bytes_(self.stack.pop())
+        if start + 8 > len(value):
+            raise Failure("extract_uint64 out of range")
+        self.stack.append(int.from_bytes(value[start:start + 8], "big"))
+
+    def op_replace2(self, args):
+        self.stack.insert(len(self.stack) - 1, args)
+        self.op_replace3(None)
+
+    def op_replace3(self, args):
+        new, start, value = self.bytes_(self.stack.pop()), self.uint(self.stack.pop()), self.bytes_(self.stack.pop())
+        if start + len(new) > len(value):
+            raise Failure("replace out of range")
+        self.stack.append(value[:start] + new + value[start + len(new):])
+
+    def op_log(self, args):
+        record = self.bytes_(self.stack.pop())
+        self.logged[0] += 1
+        self.logged[1] += len(record)
+        if self.logged[0] > 32 or self.logged[1] > 1024:
+            raise Failure("more than 32 logs or 1024 bytes logged")
+        self.result.logs.append((self.index, record))
+
+    # txn and global
+    def op_txn(self, args):
+        self.stack.append(self.txn_field(self.txn, self.index, args[0]))
+
+    def op_txna(self, args):
+        self.stack.append(self.txn_field(self.txn, self.index, args[0], args[1]))
+
+    def op_gtxn(self, args):
+        self.stack.append(self.txn_field(self.group[args[0]], args[0], args[1]))
+
+    def op_gtxna(self, args):
+        self.stack.append(self.txn_field(self.group[args[0]], args[0], args[1], args[2]))
+
+    def op_gtxns(self, args):
+        index = self.uint(self.stack.pop())
+        self.stack.append(self.txn_field(self.group[index], index, args[0]))
+
+    def op_gtxnsa(self, args):
+        index = self.uint(self.stack.pop())
+        self.stack.append(self.txn_field(self.group[index], index, args[0], int(args[1])))
+
+    def op_global(self, args):
+        field = args[0]
+        if field == "GroupSize":
+            value = len(self.group)
+        elif field == "LatestTimestamp":
+            value = self.ledger.now
+        elif field == "Round":
+            value = self.ledger.round
+        elif field == "CurrentApplicationID":
+            value = self.app_id
+        elif field == "CurrentApplicationAddress":
+            value = self.app_address
+        elif field == "CreatorAddress":
+            value = self.ledger.apps[self.app_id].creator
+        elif field == "ZeroAddress":
+            value = zero_address
+        elif field == "MinTxnFee":
+            value = 1000
+        else:
+            raise Failure("interpreter doesn't implement global " + field)
+        self.stack.append(value)
+
+    # state
+    def op_app_global_get(self, args):
+        self.stack.append(self.ledger.globals[self.app_id].get(self.bytes_(self.stack.pop()), 0))
+
+    def op_app_global_put(self, args):
+        value, key = self.stack.pop(), self.bytes_(self.stack.pop())
+        state = self.ledger.globals[self.app_id]
+        self.check_schema(state, key, value, self.ledger.apps[self.app_id].global_schema)
+        self.ledger._put(state, key, value)
+
+    def local_state(self, ref):
+        opted = self.ledger.locals.get(self.account(ref), {})
+        if self.app_id not in opted:
+            raise Failure("account not opted in to the app")
+        return opted[self.app_id]
+
+    def op_app_local_get(self, args):
+        key, ref = self.bytes_(self.stack.pop()), self.stack.pop()
+        self.stack.append(self.local_state(ref).get(key, 0))
+
+    def op_app_local_put(self, args):
+        value, key, ref = self.stack.pop(), self.bytes_(self.stack.pop()), self.stack.pop()
+        state = self.local_state(ref)
+        self.check_schema(state, key, value, self.ledger.apps[self.app_id].local_schema)
+        self.ledger._put(state, key, value)
+
+    def check_schema(self, state, key, value, schema):
+        if len(key) > 64 or len(key) + (len(value) if type(value) is bytes else 0) > 128:
+            raise Failure("key/value too long")
+        if key not in state or type(state[key]) is not type(value):
+            kind = type(value)
+            used = sum(1 for k, v in state.items() if type(v) is kind and k != key)
+            if used + 1 > schema[0 if kind is int else 1]:
+                raise Failure("store would exceed the state schema")
+
+    def op_app_opted_in(self, args):
+        app_id, ref = self.uint(self.stack.pop()), self.stack.pop()
+        self.stack.append(int(app_id in self.ledger.locals.get(self.account(ref), ())))
+
+    def op_asset_holding_get(self, args):
+        asset, ref = self.uint(self.stack.pop()), self.stack.pop()
+        if args[0] != "AssetBalance":
+            raise Failure("interpreter doesn't implement asset_holding_get " + args[0])
+        holdings = self.ledger.holdings.get(self.account(ref), {})
+        self.stack.extend([holdings.get(asset, 0), int(asset in holdings)])
+
+    def op_balance(self, args):
+        self.stack.append(self.ledger.algo.get(self.account(self.stack.pop()), 0))
+
+    def op_min_balance(self, args):
+        self.stack.append(self.ledger.min_balance(self.account(self.stack.pop())))
+
+    def op_app_params_get(self, args):
+        app_id = self.uint(self.stack.pop())
+        app = self.ledger.apps.get(app_id)
+        if args[0] == "AppAddress":
+            value = application_address(app_id) if app else zero_address
+        elif args[0] == "AppCreator":
+            value = app.creator if app else zero_address
+        else:
+            raise Failure("interpreter doesn't implement app_params_get " + args[0])
+        self.stack.extend([value, int(app is not None)])
+
+    # boxes
+    def box_name(self, name):
+        name = self.bytes_(name)
+        if not 0 < len(name) <= 64:
+            raise Failure("box name length")
+        return name
+
+    def op_box_get(self, args):
+        name, boxes = self.box_name(self.stack.pop()), self.ledger.boxes[self.app_id]
+        self.stack.extend([boxes.get(name, b""), int(name in boxes)])
+
+    def op_box_len(self, args):
+        name, boxes = self.box_name(self.stack.pop()), self.ledger.boxes[self.app_id]
+        self.stack.extend([len(boxes.get(name, b"")), int(name in boxes)])
+
+    def op_box_create(self, args):
+        size, name = self.uint(self.stack.pop()), self.box_name(self.stack.pop())
+        boxes = self.ledger.boxes[self.app_id]
+        if size > 32768:
+            raise Failure("box size")
+        if name in boxes:
+            if len(boxes[name]) != size:
+                raise Failure("box_create with a different size")
+            self.stack.append(0)
+            return
+        self.ledger._put(boxes, name, bytes(size))
+        self.stack.append(1)
+
+    def op_box_extract(self, args):
+        length, start, name = self.uint(self.stack.pop()), self.uint(self.stack.pop()), self.box_name(self.stack.pop())
+        boxes = self.ledger.boxes[self.app_id]
+        if name not in boxes:
+            raise Failure("no such box")
+        if start + length > len(boxes[name]):
+            raise Failure("box_extract out of range")
+        self.stack.append(boxes[name][start:start + length])
+
+    def op_box_put(self, args):
+        value, name = self.bytes_(self.stack.pop()), self.box_name(self.stack.pop())
+        boxes = self.ledger.boxes[self.app_id]
+        if name in boxes and len(boxes[name]) != len(value):
+            raise Failure("box_put with a different size")
+        self.ledger._put(boxes, name, value)
+
+    def op_box_replace(self, args):
+        value, start, name = self.bytes_(self.stack.pop()), self.uint(self.stack.pop()), self.box_name(self.stack.pop())
+        boxes = self.ledger.boxes[self.app_id]
+        if name not in boxes:
+            raise Failure("no such box")
+        box = boxes[name]
+        if start + len(value) > len(box):
+            raise Failure("box_replace out of range")
+        self.ledger._put(boxes, name, box[:start] + value + box[start + len(value):])
+
+    def op_box_del(self, args):
+        name, boxes = self.box_name(self.stack.pop()), self.ledger.boxes[self.app_id]
+        present = name in boxes
+        if present:
+            self.ledger._pop(boxes, name)
+        self.stack.append(int(present))
+
+    # inner txns
+    def op_itxn_begin(self, args):
+        if self.inner is not None:
+            raise Failure("itxn_begin without itxn_submit")
+        self.inner = [{}]
+
+    def op_itxn_next(self, args):
+        if self.inner is None:
+            raise Failure("itxn_next without itxn_begin")
+        self.inner.append({})
+
+    def op_itxn_field(self, args):
+        if self.inner is None:
+            raise Failure("itxn_field without itxn_begin")
+        if args[0] in array_fields:
+            self.inner[-1].setdefault(args[0], []).append(self.stack.pop())
+        else:
+            self.inner[-1][args[0]] = self.stack.pop()
+
+    def op_itxn_submit(self, args):
+        if self.inner is None:
+            raise Failure("itxn_submit without itxn_begin")
+        if len(self.inner) > 16:
+            raise Failure("inner group over 16")
+        ledger, app = self.ledger, self.app_address
+        for fields in self.inner:
+            kind = fields.get("TypeEnum")
+            sender = fields.get("Sender", app)
+            if sender != app:
+                raise Failure("inner sender isn't the app")
+            if kind == type_enums["pay"]:
+                ledger._pay(sender, fields.get("Receiver", zero_address), fields.get("Amount", 0))
+            elif kind == type_enums["axfer"]:
+                ledger._axfer(
+                    sender, fields.get("AssetReceiver", zero_address), fields.get("XferAsset", 0),
+                    fields.get("AssetAmount", 0), fields.get("AssetSender"), fields.get("AssetCloseTo"),
+                )
+            elif kind == type_enums["acfg"]:
+                asset = ledger._new_id()
+                ledger._put(ledger.assets, asset, (sender, fields.get("ConfigAssetClawback"), fields.get("ConfigAssetTotal", 0)))
+                ledger._put(ledger._holdings(sender), asset, fields.get("ConfigAssetTotal", 0))
+                fields["CreatedAssetID"] = asset
+                self.result.created.append(asset)
+            elif kind == type_enums["appl"]:
+                self.inner_call(fields)
+            else:
+                raise Failure("interpreter doesn't implement inner txn type %r" % kind)
+            ledger._check_min_balance(app)
+            self.result.inner.append((self.index, fields))
+        self.last_inner, self.inner = self.inner[-1], None
+
+    def op_itxn(self, args):
+        if self.last_inner is None or args[0] not in self.last_inner:
+            raise Failure("no inner txn field " + args[0])
+        self.stack.append(self.last_inner[args[0]])
+
+
+# TEAL op -> Eval method suffix where the op isn't a valid name
+opnames = {
+    "+": "add", "-": "sub", "*": "mul", "/": "div", "%": "mod", "<": "lt", ">": "gt", "<=": "le", ">=": "ge",
+    "&&": "and", "||": "or", "==": "eq", "!=": "ne", "!": "not", "pushint": "int", "pushbytes": "byte",
+    "bytecblock": "intcblock",
+}
+
+
+def approval_teal(path=None, packed=False):
+    """TEAL of the approval program: the file if given, otherwise approval() from degen2_build's cache."""
+    if path:
+        with open(path) as f:
+            return f.read()
+    from degen2_build import programs
+    return programs(packed=packed)[0]
+
+
+def clear_teal():
+    from degen2_build import programs
+    return programs()[1]
+
+
+class TealBackend:
+    """Runs the compiled program here instead of on a node, a drop-in for AlgodBackend in degen2_model.differential()."""
+
+    def __init__(self, approval_path=None, now=1700000000, packed=False):
+        self.ledger = Ledger(now=now)
+        self.approval_path = approval_path
+        self.packed = packed  # approval(packed=True), or the --approval file was compiled that way
+        self.app_id = 0
+        self.returned = []  # (group index, record) of each query return log in the last group
+
+    def new_accounts(self, count, algo):
+        addresses = [hashlib.sha512(b"account%d" % i).digest()[:32] for i in range(count)]
+        for address in addresses:
+            self.ledger.fund(address, algo)
+        return addresses
+
+    def now(self):
+        return self.ledger.now
+
+    def advance(self, seconds):
+        self.ledger.now += seconds
+
+    def create_asset(self, creator, total):
+        return self.ledger.create_asset(creator, total)
+
+    def create_app(self, creator, args):
+        from degen2_contract import global_schema, local_schema
+        self.app_id, result = self.ledger.create_app(
+            creator, approval_teal(self.approval_path, self.packed), clear_teal(), args,
+            global_schema=global_schema(self.packed), local_schema=local_schema(),
+        )
+        if not result.approved:
+            raise ValueError("app creation failed: " + result.error)
+        return self.app_id, application_address(self.app_id)
+
+    def apply(self, group):
+        from degen2_contract import return_prefix
+        result = self.ledger.apply(group)
+        self.returned = [(index, record) for index, record in result.logs if record[:4] == return_prefix]
+        return result.approved, result.created
+
+    def snapshot(self, addresses):
+        return self.ledger.snapshot(self.app_id, addresses)
+
+
+def life_cycle(backend, out=sys.stdout):
+    """Create, mint, buy, stake, propose, vote and execute, printing what each group cost. Returns the Results."""
+    from degen2_contract import decode_event, methods, proposal_types
+    from degen2_model import proposal_box
+    users = backend.new_accounts(3, 10**12)
+    creator, voter, receiver = users
+    swap_token = backend.create_asset(creator, 10**9)
+    app_id, app = backend.create_app(creator, (3 * 24 * 3600, 10, 100))
+    ledger = backend.ledger
+    results = []
+
+    def run(name, group):
+        result = ledger.apply(group)
+        results.append(result)
+        state = "ok" if result.approved else "REJECTED (%s)" % result.error
+        out.write("%-20s cost %-12s inner %-3d %s\n" % (name, "+".join(map(str, result.cost)), len(result.inner), state))
+        for _, record in result.logs:
+            event, account, values = decode_event(record)
+            out.write("%20s %s %s %s\n" % ("", event, account.hex()[:8], " ".join("%s=%d" % kv for kv in values.items())))
+        return result
+
+    run("fund app", [pay(creator, app, 10000000)])
+    degen2 = run("create_token", [call(creator, app_id, methods["create_token"], swap_token)]).created[0]
+    for user in users:
+        run("opt in", [call(user, app_id, on_completion="optin"), axfer(user, user, degen2, 0)])
+    run("buy", [pay(voter, app, 5000000000), pay(creator, app, 100000000), call(voter, app_id, methods["buy"], assets=[degen2])])
+    run("local_stake", [axfer(voter, app, degen2, 400000), call(voter, app_id, methods["local_stake"])])
+    run("local_stake", [axfer(creator, app, degen2, 10000), call(creator, app_id, methods["local_stake"])])
+    proposal_id = ledger.globals[app_id][b"pn"]
+    run("propose pay_token", [
+        call(voter, app_id, methods["propose"], "pay the receiver", proposal_types["pay_token"], 1000, degen2,
+             accounts=[receiver], assets=[degen2], boxes=[proposal_box(proposal_id)]),
+        pay(voter, app, 2000000),
+        axfer(voter, app, degen2, 10),
+    ])
+    run("up_px", [call(voter, app_id, methods["up_px"], proposal_id)])
+    run("dn_px", [call(creator, app_id, methods["dn_px"], proposal_id)])
+    run("up_px twice", [call(voter, app_id, methods["up_px"], proposal_id)])
+    backend.advance(3 * 24 * 3600 + 1)
+    run("execute", [call(voter, app_id, methods["execute"], proposal_id, accounts=[receiver], assets=[degen2])])
+    run("withdraw", [pay(voter, app, 1000000), call(voter, app_id, methods["withdraw"], 1000, assets=[degen2])])
+    return results
+
+
+def print_profile(ledger, results, top, out=sys.stdout):
+    """The top most expensive source lines over all results."""
+    profile = collections.Counter()
+    for result in results:
+        profile.update(result.profile)
+    out.write("\n%6s  %5s  source\n" % ("cost", "line"))
+    for (app_id, line), cost in profile.most_common(top):
+        out.write("%6d  %5d  %s\n" % (cost, line, ledger.apps[app_id].approval.source[line - 1].strip()))
+
+
+def bench(groups, seed=0, approval_path=None, packed=False, out=sys.stdout):
+    """Random degen2_model groups through the interpreter, to see how many scenarios a test run can afford."""
+    from degen2_model import random_group, setup, Dao
+    backend = TealBackend(approval_path, packed=packed)
+    users = backend.new_accounts(16, 10**12)
+    swap_token = backend.create_asset(users[0], 10**9)
+    app_id, app = backend.create_app(users[0], (3 * 24 * 3600, 10, 4200001))
+    # the model only picks the groups, it follows along so random_group sees the current proposals and stakes
+    dao = Dao(app_id, app, users[0], now=backend.now(), packed=packed)
+    for user in users:
+        dao.fund(user, 10**12)
+    dao.create_asset(users[0], 10**9, asset_id=swap_token)
+    dao.apply([call(users[0], 0, 3 * 24 * 3600, 10, 4200001)])
+    for group in setup(dao, users, users[0], [swap_token]):
+        approved, created = backend.apply(group)
+        dao.apply(group, created)
+    rng = random.Random(seed)
+    approved = ops = 0
+    start = time.perf_counter()
+    for _ in range(groups):
+        group = random_group(dao, rng, users)
+        if isinstance(group, int):
+            backend.advance(group)
+            dao.now = backend.now()
+            continue
+        result = backend.ledger.apply(group)
+        dao.apply(group, result.created)
+        approved += result.approved
+        ops += sum(result.cost)
+    elapsed = time.perf_counter() - start
+    out.write("%d groups, %d approved, %d opcodes in %.2fs: %.0f groups/s\n" % (groups, approved, ops, elapsed, groups / elapsed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run the degen2 approval program locally")
+    parser.add_argument("--approval", help="TEAL file to run, approval() compiled now if unset")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="print the N most expensive source lines")
+    parser.add_argument("--bench", type=int, metavar="GROUPS", help="random groups instead of the life cycle walk")
+    parser.add_argument("--differential", type=int, metavar="STEPS", help="check degen2_model against the program here")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--packed", action="store_true", help="approval(packed=True), or what --approval was compiled with")
+    args = parser.parse_args(argv)
+    if args.approval and not os.path.exists(args.approval):
+        parser.error("no such file: %s (python degen2_contract.py writes it)" % args.approval)
+
+    if args.differential:
+        from degen2_model import differential
+        return 1 if differential(TealBackend(args.approval, packed=args.packed), args.differential, args.seed) else 0
+    if args.bench:
+        bench(args.bench, args.seed, args.approval, args.packed)
+        return 0
+    backend = TealBackend(args.approval, packed=args.packed)
+    results = life_cycle(backend)
+    if args.profile:
+        print_profile(backend.ledger, results, args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
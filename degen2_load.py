@@ -0,0 +1,252 @@
+"""
+Load test: a large population of stakers through one proposal cycle on degen2_interpreter's Ledger, the compiled
+approval program and no node.
+
+Phases run in order, each staker once per phase: opt in (app and degen2), buy degen2 in batched buys, local_stake,
+one proposal, a vote each, execute once the vote is over, withdraw everything. A fund_rewards lands between staking
+and the proposal so withdrawals settle rewards too. With --stake-vote only the proposer stakes up front and everyone
+else stakes and votes in one stake_vote group, one round trip per voter instead of two.
+
+Groups are packed into rounds of --round-txns top level txns in submission order, roughly a full block, and every
+write to the app's global keys, boxes and the app account's balances is counted per round: the hot keys
+a busy round serializes on (the vote tallies in the proposal box, total stake, the app's degen2 holding).
+
+Per phase it reports evaluator throughput, opcode cost per app call against the pooled budget, fees at the minimum
+with inner txns pooled on the call, and how the app account's minimum balance grew.
+
+usage:
+    python degen2_load.py                          # 10000 stakers
+    python degen2_load.py --stakers 2000 --round-txns 5000 --hot 10
+    python degen2_load.py --packed
+    python degen2_load.py --stake-vote
+"""
+
+import argparse
+import collections
+import hashlib
+import random
+import sys
+import time
+
+from degen2_contract import max_open_proposals, methods, proposal_types
+from degen2_interpreter import TealBackend, app_budget
+from degen2_model import axfer, call, pay, proposal_box
+
+min_fee = 1000
+buy_batch = 12  # payers per buy, with the call and 3 pad calls a full group
+
+
+def box_label(key):
+    """A box name as its kind and what it's keyed by: proposal id, delegate address (hex prefix), swap asset, airdrop."""
+    prefix, rest = key[:1], key[1:]
+    if prefix in (b"p", b"s") or (prefix == b"a" and len(rest) == 8):
+        return "box %s%d" % (prefix.decode(), int.from_bytes(rest, "big"))
+    if prefix == b"a":  # a claimed bitmap: the airdrop, then the chunk
+        return "box a%d/%d" % (int.from_bytes(rest[:8], "big"), int.from_bytes(rest[8:], "big"))
+    if prefix == b"d":
+        return "box d%s" % rest[:4].hex()
+    return "box %s" % key.hex()
+
+
+class Phase:
+    """Totals for one phase of the cycle."""
+
+    __slots__ = ("name", "groups", "txns", "approved", "calls", "cost", "max_cost", "fees", "elapsed", "min_balance",
+                 "errors")
+
+    def __init__(self, name):
+        self.name = name
+        self.groups = self.txns = self.approved = self.calls = self.cost = self.max_cost = self.fees = 0
+        self.elapsed = 0.0
+        self.min_balance = 0
+        self.errors = collections.Counter()
+
+
+class Load:
+    """Drives a population through the cycle, counting cost, fees and per round writes as it goes."""
+
+    def __init__(self, stakers, round_txns=10000, seed=0, packed=False):
+        self.backend = TealBackend(packed=packed)
+        self.ledger = self.backend.ledger
+        self.rng = random.Random(seed)
+        self.round_txns = round_txns
+        self.round = 0
+        self.round_used = 0
+        self.writes = collections.defaultdict(collections.Counter)  # key label -> {round: groups writing it}
+        self.phases = []
+
+        self.creator, self.receiver = self.backend.new_accounts(2, 10**13)
+        self.stakers = [hashlib.sha512(b"staker%d" % i).digest()[:32] for i in range(stakers)]
+        for staker in self.stakers:
+            self.ledger.fund(staker, 10**9)
+        swap_token = self.backend.create_asset(self.creator, 10**9)
+        self.proposal_fee = 10
+        self.app_id, self.app = self.backend.create_app(self.creator, (3 * 24 * 3600, self.proposal_fee, 100))
+        self.ledger.fund(self.app, 10000000)
+        self.degen2 = self.ledger.apply([call(self.creator, self.app_id, methods["create_token"], swap_token)]).created[0]
+        self.ledger.opt_in_asset(self.receiver, self.degen2)
+
+    # bookkeeping
+    def run(self, phase, group):
+        """Apply a group as the next one in the current round."""
+        if self.round_used + len(group) > self.round_txns:
+            self.round += 1
+            self.round_used = 0
+        self.round_used += len(group)
+        ledger = self.ledger
+        start = time.perf_counter()
+        result = ledger.apply(group)
+        phase.elapsed += time.perf_counter() - start
+        phase.groups += 1
+        phase.txns += len(group)
+        if not result.approved:
+            phase.errors[result.error] += 1
+            return result
+        calls = sum(1 for txn in group if txn.type == "appl")
+        phase.approved += 1
+        phase.calls += calls
+        phase.cost += sum(result.cost)
+        phase.max_cost = max(phase.max_cost, sum(result.cost) / calls if calls else 0)
+        phase.fees += min_fee * (len(group) + len(result.inner))
+        for label in self.written(ledger.journal):
+            self.writes[label][self.round] += 1
+        return result
+
+    def written(self, journal):
+        """Labels of the contended state a successful group's journal wrote, each once."""
+        ledger, app_id, app = self.ledger, self.app_id, self.app
+        global_state, boxes, app_holdings = ledger.globals[app_id], ledger.boxes[app_id], ledger.holdings.get(app)
+        labels = set()
+        for target, key, _ in journal:
+            if target is global_state:
+                labels.add("global %s" % key.decode(errors="replace"))
+            elif target is boxes:
+                labels.add(box_label(key))
+            elif target is ledger.algo and key == app:
+                labels.add("app algo")
+            elif target is app_holdings:
+                labels.add("app asset %d" % key)
+        return labels
+
+    def phase(self, name, groups):
+        phase = Phase(name)
+        for group in groups:
+            self.run(phase, group)
+        phase.min_balance = self.ledger.min_balance(self.app)
+        self.phases.append(phase)
+        return phase
+
+    # the cycle
+    def opt_in(self):
+        for staker in self.stakers:
+            yield [call(staker, self.app_id, on_completion="optin"), axfer(staker, staker, self.degen2, 0)]
+
+    def buy(self, rng):
+        for i in range(0, len(self.stakers), buy_batch):
+            payers = self.stakers[i:i + buy_batch]
+            yield [pay(payer, self.app, 10000 * rng.randint(100, 1000)) for payer in payers] + [
+                call(payers[0], self.app_id, methods["buy"], assets=[self.degen2])] + [
+                call(payers[0], self.app_id, methods["pad"]) for _ in range(3)]
+
+    def stake(self, stakers):
+        for staker in stakers:
+            held = self.ledger.holdings[staker].get(self.degen2, 0)
+            # keep the proposal fee back, any of them could be the proposer
+            yield [axfer(staker, self.app, self.degen2, held - self.proposal_fee), call(staker, self.app_id, methods["local_stake"])]
+
+    def propose(self):
+        proposer = self.stakers[0]
+        self.proposal_id = self.ledger.globals[self.app_id][b"pn"]
+        yield [
+            call(proposer, self.app_id, methods["propose"], b"load test", proposal_types["pay_token"], 1000, self.degen2,
+                 accounts=[self.receiver], assets=[self.degen2],
+                 boxes=[proposal_box(self.proposal_id), proposal_box(self.proposal_id - max_open_proposals)]),
+            pay(proposer, self.app, 2000000),
+            axfer(proposer, self.app, self.degen2, self.proposal_fee),
+        ]
+
+    def stake_vote(self, rng):
+        for staker in self.stakers:
+            side = methods["up_px"] if rng.random() < 0.7 else methods["dn_px"]
+            held = self.ledger.holdings[staker].get(self.degen2, 0)
+            yield [axfer(staker, self.app, self.degen2, held),
+                   call(staker, self.app_id, methods["stake_vote"], self.proposal_id, side, boxes=[proposal_box(self.proposal_id)])]
+
+    def vote(self, rng):
+        for staker in self.stakers:
+            method = methods["up_px"] if rng.random() < 0.7 else methods["dn_px"]
+            yield [call(staker, self.app_id, method, self.proposal_id, boxes=[proposal_box(self.proposal_id)])]
+
+    def execute(self):
+        yield [call(self.creator, self.app_id, methods["execute"], self.proposal_id, accounts=[self.receiver],
+                    assets=[self.degen2], boxes=[proposal_box(self.proposal_id)])]
+
+    def withdraw(self):
+        for staker in self.stakers:
+            stake = self.ledger.locals[staker][self.app_id].get(b"s", 0)
+            yield [pay(staker, self.app, 1000000), call(staker, self.app_id, methods["withdraw"], stake, assets=[self.degen2])]
+
+    def cycle(self, stake_vote=False):
+        rng = self.rng
+        start = Phase("start")
+        start.min_balance = self.ledger.min_balance(self.app)
+        self.phases.append(start)
+        self.phase("opt_in", self.opt_in())
+        self.phase("buy", self.buy(rng))
+        self.phase("local_stake", self.stake(self.stakers[:1] if stake_vote else self.stakers))
+        self.phase("fund_rewards", [[pay(self.creator, self.app, 10**9), call(self.creator, self.app_id, methods["fund_rewards"])]])
+        self.phase("propose", self.propose())
+        if stake_vote:
+            self.phase("stake_vote", self.stake_vote(rng))
+        else:
+            self.phase("vote", self.vote(rng))
+        self.backend.advance(self.ledger.globals[self.app_id].get(b"r", 3 * 24 * 3600) + 1)
+        self.phase("execute", self.execute())
+        self.phase("withdraw", self.withdraw())
+
+    # report
+    def report(self, hot=8, out=sys.stdout):
+        out.write("%-13s %7s %8s %8s %9s %10s %9s %8s %12s %12s\n" % (
+            "phase", "groups", "txns", "approved", "groups/s", "cost/call", "max/call", "budget", "fees algo",
+            "app min bal"))
+        previous = self.phases[0].min_balance
+        total = Phase("total")
+        for phase in self.phases[1:]:
+            per_call = phase.cost / phase.calls if phase.calls else 0
+            out.write("%-13s %7d %8d %8d %9.0f %10.1f %9.0f %7.0f%% %12.3f %+12d\n" % (
+                phase.name, phase.groups, phase.txns, phase.approved, phase.groups / phase.elapsed if phase.elapsed else 0,
+                per_call, phase.max_cost, 100 * per_call / app_budget, phase.fees / 1e6, phase.min_balance - previous))
+            for error, count in phase.errors.most_common(3):
+                out.write("%13s %d rejected: %s\n" % ("", count, error))
+            previous = phase.min_balance
+            for name in ("groups", "txns", "approved", "fees"):
+                setattr(total, name, getattr(total, name) + getattr(phase, name))
+            total.elapsed += phase.elapsed
+        out.write("%-13s %7d %8d %8d %9.0f %10s %9s %8s %12.3f %+12d\n" % (
+            "total", total.groups, total.txns, total.approved, total.groups / total.elapsed, "", "", "",
+            total.fees / 1e6, self.phases[-1].min_balance - self.phases[0].min_balance))
+        out.write("\n%d rounds of up to %d txns. hottest state, by most groups writing it in one round:\n" % (
+            self.round + 1, self.round_txns))
+        out.write("%-22s %8s %12s %14s\n" % ("key", "writes", "rounds", "max per round"))
+        ranked = sorted(self.writes.items(), key=lambda item: (-max(item[1].values()), item[0]))
+        for label, rounds in ranked[:hot]:
+            out.write("%-22s %8d %12d %14d\n" % (label, sum(rounds.values()), len(rounds), max(rounds.values())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="drive many stakers through a proposal cycle on the local evaluator")
+    parser.add_argument("--stakers", type=int, default=10000)
+    parser.add_argument("--round-txns", type=int, default=10000, help="top level txns per round")
+    parser.add_argument("--hot", type=int, default=8, help="hot keys to list")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--packed", action="store_true", help="approval(packed=True)")
+    parser.add_argument("--stake-vote", action="store_true", help="stake and vote in one group instead of two")
+    args = parser.parse_args(argv)
+    load = Load(args.stakers, args.round_txns, args.seed, args.packed)
+    load.cycle(args.stake_vote)
+    load.report(args.hot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+Mock algod for exercising degen2_client without a node: the algod REST endpoints a client touches, in front of a
+degen2_interpreter Ledger that runs the real approval program.
+
+Every accepted group is its own round (like a dev mode node), submitted groups are decoded from msgpack and run
+through Ledger.apply, so a group the contract would reject gets the same 400 algod gives. Signatures aren't checked.
+/v2/teal/compile gives Ledger.assemble's stand-in bytes, an app created with them (top level or by degen2_factory)
+runs the TEAL they came from and one created with any other bytes runs approval(). App calls over algod's reference
+limits get its 400 (reference_error). Otherwise it's the ledger degen2_interpreter models: no fees, no resource
+availability checks beyond those counts.
+
+endpoints: GET /v2/status, /v2/status/wait-for-block-after/{round}, /v2/transactions/params,
+/v2/transactions/pending/{txid}, /v2/accounts/{address}, /v2/applications/{id}, /v2/applications/{id}/box;
+POST /v2/transactions, /v2/transactions/simulate (one group: logs, inner txns, opcode budget added and consumed,
+failure message), /v2/teal/compile
+
+usage:
+    python degen2_mock_algod.py --port 4001          # prints funded accounts and their keys, then serves
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import msgpack
+
+from degen2_indexer import encode_address, inner_txn
+from degen2_interpreter import Ledger, application_address, approval_teal, clear_teal
+from degen2_model import Txn
+
+genesis_hash = base64.b64encode(hashlib.sha256(b"degen2 mock").digest()).decode()
+on_completions = {0: "noop", 1: "optin", 3: "clear"}
+max_args, max_accounts, max_references = 16, 4, 8  # per app call: args, accounts, accounts + assets + apps + boxes
+
+
+def decode_address(address):
+    return base64.b32decode(address + "=" * (-len(address) % 8))[:32]
+
+
+def txid(txn):
+    """Id of a decoded txn map, the same algosdk's Transaction.get_txid gives."""
+    digest = hashlib.new("sha512_256", b"TX" + msgpack.packb(txn, use_bin_type=True)).digest()
+    return base64.b32encode(digest).decode().rstrip("=")
+
+
+def reference_error(txn):
+    """algod's message for a decoded app call over its args or foreign reference limits, None if it's within them."""
+    if txn.get("type") != "appl":
+        return None
+    if len(txn.get("apaa", ())) > max_args:
+        return "tx.ApplicationArgs too long, max number of arguments is %d" % max_args
+    if len(txn.get("apat", ())) > max_accounts:
+        return "tx.Accounts too long, max number of accounts is %d" % max_accounts
+    references = sum(len(txn.get(field, ())) for field in ("apat", "apas", "apfa", "apbx"))
+    if references > max_references:
+        return "tx references exceed MaxAppTotalTxnReferences = %d" % max_references
+    return None
+
+
+def model_txn(txn):
+    """A decoded msgpack txn map as a degen2_model Txn."""
+    kind = txn.get("type")
+    if kind == "pay":
+        return Txn("pay", txn["snd"], txn.get("rcv", bytes(32)), txn.get("amt", 0), fee=txn.get("fee", 0))
+    if kind == "axfer":
+        return Txn("axfer", txn["snd"], txn.get("arcv", bytes(32)), txn.get("aamt", 0), txn.get("xaid", 0), fee=txn.get("fee", 0))
+    if kind == "appl":
+        if txn.get("apan", 0) not in on_completions:
+            raise ValueError("on completion %d not supported" % txn["apan"])
+        return Txn(
+            "appl", txn["snd"], app_id=txn.get("apid", 0), on_completion=on_completions[txn.get("apan", 0)],
+            args=txn.get("apaa", ()), accounts=txn.get("apat", ()), assets=txn.get("apas", ()),
+            boxes=[box.get("n", b"") for box in txn.get("apbx", ())], fee=txn.get("fee", 0),
+        )
+    raise ValueError("txn type %r not supported" % kind)
+
+
+def pending_inner(fields, app):
+    """An inner txn as algod's pending info shows it: the indexer's shape, created ids without "created-"."""
+    txn = inner_txn(fields, app)
+    nested = [txn]
+    while nested:
+        inner = nested.pop()
+        for key in ("created-asset-index", "created-application-index"):
+            if key in inner:
+                inner[key[len("created-"):]] = inner.pop(key)
+        nested += inner.get("inner-txns", [])
+    return txn
+
+
+class MockAlgod(ThreadingHTTPServer):
+    """A ThreadingHTTPServer holding the ledger, requests run one at a time against it behind a lock."""
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), now=1700000000, packed=False):
+        super().__init__(address, Handler)
+        self.ledger = Ledger(now=now)
+        self.packed = packed
+        self.lock = threading.Lock()
+        self.last_round = 1
+        self.confirmed = {}  # txid -> pending info
+        self.round_changed = threading.Condition(self.lock)
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server_address[:2]
+
+    def fund(self, address, algo):
+        """Give a base32 address algo outside any group."""
+        with self.lock:
+            self.ledger.fund(decode_address(address), algo)
+
+    def submit(self, raw):
+        """Apply the signed txns in raw as a group, returns (status, response)."""
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(raw)
+        signed = list(unpacker)
+        try:
+            txns = [model_txn(stxn["txn"]) for stxn in signed]
+        except (KeyError, ValueError) as e:
+            return 400, {"message": "can't decode txn: %s" % e}
+        for stxn in signed:
+            error = reference_error(stxn["txn"])
+            if error:
+                return 400, {"message": "transaction %s: %s" % (txid(stxn["txn"]), error)}
+        ids = [txid(stxn["txn"]) for stxn in signed]
+        groups = {stxn["txn"].get("grp") for stxn in signed}
+        if len(groups) != 1 or (len(signed) > 1 and None in groups):
+            return 400, {"message": "txns don't share a group id"}
+        with self.lock:
+            created_app = None
+            if any(txn.type == "appl" and txn.app_id == 0 for txn in txns):
+                if len(txns) > 1:
+                    return 400, {"message": "the mock only creates apps in a group of their own"}
+                created_app, result = self._create_app(txns[0], signed[0]["txn"])
+            else:
+                result = self.ledger.apply(txns)
+            if not result.approved:
+                return 400, {"message": "TransactionPool.Remember: transaction %s: %s" % (ids[result.failed_at or 0], result.error)}
+            self.last_round += 1
+            for index, (txn, tid) in enumerate(zip(txns, ids)):
+                info = {"confirmed-round": self.last_round, "pool-error": "", "txn": {"txn": {"type": txn.type}}}
+                if txn.type == "appl":
+                    app = application_address(created_app or txn.app_id)
+                    info["logs"] = [base64.b64encode(log).decode() for i, log in result.logs if i == index]
+                    info["inner-txns"] = [pending_inner(fields, app) for i, fields in result.inner if i == index]
+                    if created_app:
+                        info["application-index"] = created_app
+                self.confirmed[tid] = info
+            self.round_changed.notify_all()
+        return 200, {"txId": ids[0]}
+
+    def simulate(self, raw):
+        """Run the group of a simulate request without keeping anything, returns (status, response)."""
+        request = msgpack.unpackb(raw, raw=False, strict_map_key=False)
+        groups = request.get("txn-groups", [])
+        if len(groups) != 1:
+            return 400, {"message": "the mock simulates one group at a time"}
+        signed = groups[0].get("txns", [])
+        try:
+            txns = [model_txn(stxn["txn"]) for stxn in signed]
+        except (KeyError, ValueError) as e:
+            return 400, {"message": "can't decode txn: %s" % e}
+        for stxn in signed:
+            error = reference_error(stxn["txn"])
+            if error:
+                return 400, {"message": "transaction %s: %s" % (txid(stxn["txn"]), error)}
+        extra = request.get("extra-opcode-budget", 0)
+        with self.lock:
+            result = self.ledger.simulate(txns, extra)
+        group = {
+            "txn-results": [
+                {"txn-result": {
+                    "logs": [base64.b64encode(log).decode() for i, log in result.logs if i == index],
+                    "inner-txns": [
+                        pending_inner(fields, application_address(txn.app_id))
+                        for i, fields in result.inner if i == index
+                    ],
+                }}
+                for index, txn in enumerate(txns)
+            ],
+            "app-budget-added": 700 * sum(1 for txn in txns if txn.type == "appl") + extra,
+            "app-budget-consumed": sum(result.cost),
+        }
+        if not result.approved:
+            group["failure-message"] = result.error
+            group["failed-at"] = [result.failed_at or 0]
+        return 200, {"last-round": self.last_round, "txn-groups": [group], "version": 2}
+
+    def _create_app(self, txn, raw):
+        schema = raw.get("apgs", {})
+        local_schema = raw.get("apls", {})
+        programs = self.ledger.programs
+        approval = programs.get(raw.get("apap", b"")) or approval_teal(packed=self.packed)
+        clear = programs.get(raw.get("apsu", b"")) or clear_teal()
+        app_id, result = self.ledger.create_app(
+            txn.sender, approval, clear, txn.args,
+            global_schema=(schema.get("nui", 0), schema.get("nbs", 0)),
+            local_schema=(local_schema.get("nui", 0), local_schema.get("nbs", 0)), extra_pages=raw.get("apep", 0),
+        )
+        return app_id, result
+
+    def compile(self, raw):
+        """/v2/teal/compile of TEAL text, returns (status, response)."""
+        with self.lock:
+            program = self.ledger.assemble(raw.decode())
+        digest = hashlib.new("sha512_256", b"Program" + program).digest()
+        return 200, {"hash": encode_address(digest), "result": base64.b64encode(program).decode()}
+
+    def box(self, app_id, name):
+        """/v2/applications/{id}/box?name=b64:..., None if there's no such box."""
+        value = self.ledger.boxes[app_id].get(name)
+        if value is None:
+            return None
+        return {
+            "name": base64.b64encode(name).decode(), "round": self.last_round, "value": base64.b64encode(value).decode(),
+        }
+
+    def account(self, address):
+        raw = decode_address(address)
+        ledger = self.ledger
+        return {
+            "address": address,
+            "amount": ledger.algo.get(raw, 0),
+            "min-balance": ledger.min_balance(raw),
+            "assets": [{"asset-id": asset, "amount": amount, "is-frozen": False} for asset, amount in ledger.holdings.get(raw, {}).items()],
+            "apps-local-state": [
+                {"id": app_id, "key-value": state_json(state)} for app_id, state in ledger.locals.get(raw, {}).items()
+            ],
+            "round": self.last_round,
+        }
+
+    def application(self, app_id):
+        app = self.ledger.apps[app_id]
+        return {"id": app_id, "params": {
+            "creator": encode_address(app.creator),
+            "global-state": state_json(self.ledger.globals[app_id]),
+            "global-state-schema": {"num-uint": app.global_schema[0], "num-byte-slice": app.global_schema[1]},
+            "local-state-schema": {"num-uint": app.local_schema[0], "num-byte-slice": app.local_schema[1]},
+        }}
+
+
+def state_json(state):
+    """{key: value} as algod's TealKeyValue list."""
+    return [
+        {"key": base64.b64encode(key).decode(), "value": (
+            {"type": 2, "uint": value, "bytes": ""} if isinstance(value, int)
+            else {"type": 1, "uint": 0, "bytes": base64.b64encode(value).decode()}
+        )}
+        for key, value in state.items()
+    ]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled client connections get reused
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?")[0]
+        if path == "/v2/transactions/simulate":
+            return self.reply(*self.server.simulate(raw))
+        if path == "/v2/teal/compile":
+            return self.reply(*self.server.compile(raw))
+        if path != "/v2/transactions":
+            return self.reply(404, {"message": "not found"})
+        self.reply(*self.server.submit(raw))
+
+    def do_GET(self):
+        server = self.server
+        parts = self.path.split("?")[0].strip("/").split("/")
+        with server.lock:
+            if parts == ["v2", "status"]:
+                return self.reply(200, {"last-round": server.last_round, "time-since-last-round": 0, "catchup-time": 0})
+            if parts[:3] == ["v2", "status", "wait-for-block-after"]:
+                server.round_changed.wait_for(lambda: server.last_round > int(parts[3]), timeout=5)
+                return self.reply(200, {"last-round": server.last_round, "time-since-last-round": 0, "catchup-time": 0})
+            if parts == ["v2", "transactions", "params"]:
+                return self.reply(200, {
+                    "consensus-version": "future", "fee": 0, "genesis-hash": genesis_hash, "genesis-id": "mock-v1",
+                    "last-round": server.last_round, "min-fee": 1000,
+                })
+            if parts[:3] == ["v2", "transactions", "pending"] and len(parts) == 4:
+                if parts[3] not in server.confirmed:
+                    return self.reply(404, {"message": "txn not found"})
+                return self.reply(200, server.confirmed[parts[3]])
+            if parts[:2] == ["v2", "accounts"] and len(parts) == 3:
+                return self.reply(200, server.account(parts[2]))
+            if parts[:2] == ["v2", "applications"] and len(parts) == 3 and int(parts[2]) in server.ledger.apps:
+                return self.reply(200, server.application(int(parts[2])))
+            if parts[:2] == ["v2", "applications"] and parts[3:] == ["box"] and int(parts[2]) in server.ledger.apps:
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                name = query.get("name", [""])[0]
+                encoding, _, value = name.partition(":")
+                if encoding != "b64":
+                    return self.reply(400, {"message": "box names as b64:..."})
+                box = server.box(int(parts[2]), base64.b64decode(value))
+                if box is None:
+                    return self.reply(404, {"message": "box not found"})
+                return self.reply(200, box)
+        self.reply(404, {"message": "not found"})
+
+
+def serve(port, accounts=4, algo=10**12):
+    """Serve forever on port with a few funded accounts, printed with their keys for a client to use."""
+    from algosdk import account
+    server = MockAlgod(("127.0.0.1", port))
+    for _ in range(accounts):
+        key, address = account.generate_account()
+        server.fund(address, algo)
+        print(address, key)
+    print("mock algod on %s" % server.url)
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="serve a mock algod running the degen2 approval program")
+    parser.add_argument("--port", type=int, default=4001)
+    parser.add_argument("--accounts", type=int, default=4, help="funded accounts to print")
+    args = parser.parse_args(argv)
+    serve(args.port, args.accounts)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
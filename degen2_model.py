@@ -0,0 +1,1440 @@
+"""
+Pure-Python reference model of approval(), for simulating governance parameters and attack sequences without a node.
+
+Dao holds the same state as the contract (Globals for the global keys, Local for an account's local keys, Proposal
+for a proposal box, Delegate for a delegate box, (ratio, end time) for a swap table box, Airdrop for an airdrop box
+and the bytes of its claimed bitmap boxes) next to a minimal ledger (algo, asset holdings, the app's min balance) and runs transaction
+groups against it. A group is all or nothing like on chain: every write is journaled and rolled back on a Reject.
+
+Not modelled: fees (a group is assumed to pay enough for its inner txns), opcode budget (see degen2_analyzer.py),
+resource availability (foreign arrays, box refs) and min balance of anything but the app account.
+
+Throughput is about 75k txns/s for bench, making up random groups included, and 150k txns/s in Dao.apply alone
+(one core), not millions: every txn runs through Python one at a time, its writes journaled for the rollback, and
+each check branches on state the txn before it left, so there's no batch of independent txns to vectorize. Sweeps
+over many parameter sets scale by running a Dao per process.
+
+differential() runs random groups through the model and the compiled program on a dev mode node side by side and
+stops at the first group they disagree on, so the model can't silently drift from the contract.
+
+usage:
+    python degen2_model.py --bench 100000
+    python degen2_model.py --differential 500 --seed 1 --algod http://localhost:4001 --kmd http://localhost:4002
+"""
+
+import argparse
+import base64
+import functools
+import hashlib
+import random
+import sys
+import time
+
+from degen2_contract import (
+    airdrop_box_size, airdrop_chunk, airdrop_window, delegate_box_size, global_schema, local_schema, max_open_proposals, methods, packed_key, packed_params,
+    max_airdrop_chunks, max_swap_entries, proposal_states, proposal_text, proposal_types, queries, return_prefix, reward_scale,
+    selector_key, swap_box_size, swap_entry,
+)
+
+week = 3600 * 24 * 7
+degen2_total = 420000069
+uint64_max = 2**64 - 1
+zero_address = bytes(32)
+missing = object()  # journal marker for a key that wasn't in the dict
+
+# contract keys of each Globals / Local field, must match the Bytes() keys in approval()
+global_keys = {
+    "degen2": b"d2",
+    "total_stake": b"tl",
+    "reserved": b"rv",
+    "duration": b"r",
+    "cooldown": b"o",
+    "threshold": b"t",
+    "price": b"pc",
+    "proposal_fee": b"pf",
+    "end_creator_opt_in": b"e",
+    "next_proposal": b"pn",
+    "reward_per_share": b"ap",
+    "rewards_owed": b"ao",
+}
+local_keys = {
+    "stake": b"s",
+    "last_vote": b"lv",
+    "locked_until": b"lk",
+    "reward_checkpoint": b"rc",
+    "delegate": b"dg",
+}
+kind = {name: selector_key(selector) for name, selector in proposal_types.items()}
+
+
+class Reject(Exception):
+    """The group fails on chain: an assert, a panic (underflow, missing arg, ...) or a ledger check."""
+
+
+def check(condition, why):
+    if not condition:
+        raise Reject(why)
+
+
+def add(a, b):
+    check(a + b <= uint64_max, "+ overflowed")
+    return a + b
+
+
+def sub(a, b):
+    check(a >= b, "- went below zero")
+    return a - b
+
+
+def div(a, b):
+    check(b != 0, "/ by zero")
+    return a // b
+
+
+def btoi(value):
+    check(len(value) <= 8, "btoi of more than 8 bytes")
+    return int.from_bytes(value, "big")
+
+
+def itob(value):
+    return value.to_bytes(8, "big")
+
+
+def encode_arg(arg):
+    if isinstance(arg, int):
+        return itob(arg)
+    if isinstance(arg, str):
+        return arg.encode()
+    return bytes(arg)
+
+
+class Txn:
+    """One txn of a group: type "pay", "axfer" or "appl".
+
+    accounts and assets are the foreign arrays as TEAL sees them, accounts[0] is the sender.
+    boxes and fee only matter to a real node, the model doesn't look at them.
+    """
+
+    __slots__ = ("type", "sender", "receiver", "amount", "asset", "app_id", "on_completion", "args", "accounts",
+                 "assets", "boxes", "fee")
+
+    def __init__(self, type, sender, receiver=None, amount=0, asset=0, app_id=0, on_completion="noop", args=(),
+                 accounts=(), assets=(), boxes=(), fee=1000):
+        self.type = type
+        self.sender = sender
+        self.receiver = receiver
+        self.amount = amount
+        self.asset = asset
+        self.app_id = app_id
+        self.on_completion = on_completion
+        self.args = tuple(encode_arg(arg) for arg in args)
+        self.accounts = (sender,) + tuple(accounts)
+        self.assets = tuple(assets)
+        self.boxes = tuple(boxes)
+        self.fee = fee
+
+
+def pay(sender, receiver, amount, fee=1000):
+    return Txn("pay", sender, receiver, amount, fee=fee)
+
+
+def axfer(sender, receiver, asset, amount, fee=1000):
+    return Txn("axfer", sender, receiver, amount, asset, fee=fee)
+
+
+def call(sender, app_id, *args, **fields):
+    return Txn("appl", sender, app_id=app_id, args=args, **fields)
+
+
+def proposal_box(proposal_id):
+    return b"p" + itob(proposal_id)
+
+
+def delegate_box(address):
+    return b"d" + address
+
+
+def swap_box(asset):
+    return b"s" + itob(asset)
+
+
+def airdrop_box(airdrop_id, chunk=None):
+    """The airdrop's box, or with chunk its claimed bitmap box for leaves chunk * airdrop_chunk on."""
+    return b"a" + itob(airdrop_id) + (b"" if chunk is None else itob(chunk))
+
+
+def airdrop_boxes(airdrop_id, count):
+    """Every box close_airdrop deletes for an airdrop of count leaves."""
+    return [airdrop_box(airdrop_id)] + [airdrop_box(airdrop_id, chunk) for chunk in range(-(-count // airdrop_chunk))]
+
+
+def airdrop_leaf(address, index, amount):
+    return hashlib.sha256(address + itob(index) + itob(amount)).digest()
+
+
+def airdrop_tree(allocations, count):
+    """Levels of the merkle tree over count leaves, {node index: hash} each, from the leaves up to {0: root}.
+
+    allocations is {leaf index: (address, amount)}. Leaves without one are 32 zero bytes, so a level only holds the
+    nodes above an allocation and everything else is the hash of an empty subtree.
+    """
+    empty = bytes(32)
+    levels = [{index: airdrop_leaf(address, index, amount) for index, (address, amount) in allocations.items()}]
+    for _ in range((count - 1).bit_length()):
+        below, level = levels[-1], {}
+        for index in {i // 2 for i in below}:
+            level[index] = hashlib.sha256(below.get(2 * index, empty) + below.get(2 * index + 1, empty)).digest()
+        levels.append(level)
+        empty = hashlib.sha256(empty + empty).digest()
+    levels[-1] = {0: levels[-1].get(0, empty)}
+    return levels
+
+
+def airdrop_proof(levels, index):
+    """The sibling hashes claim takes for leaf index, from the leaf up."""
+    empty, proof = bytes(32), b""
+    for level in levels[:-1]:
+        proof += level.get(index ^ 1, empty)
+        index //= 2
+        empty = hashlib.sha256(empty + empty).digest()
+    return proof
+
+
+class Globals:
+    __slots__ = tuple(global_keys)
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+
+class Local:
+    __slots__ = tuple(local_keys)
+
+    def __init__(self, reward_checkpoint):
+        self.stake = 0
+        self.last_vote = (0,) * max_open_proposals  # lv as one id per slot
+        self.locked_until = 0
+        self.reward_checkpoint = reward_checkpoint
+        self.delegate = zero_address
+
+    def encode(self, name):
+        if name == "last_vote":
+            return b"".join(itob(proposal_id) for proposal_id in self.last_vote)
+        return getattr(self, name)
+
+
+class Proposal:
+    __slots__ = ("type", "value", "index", "end_time", "upvotes", "dnvotes", "receiver", "payout_hash", "text")
+
+    def __init__(self, type, value, index, end_time, receiver, payout_hash, text):
+        self.type = type
+        self.value = value
+        self.index = index
+        self.end_time = end_time
+        self.upvotes = 0
+        self.dnvotes = 0
+        self.receiver = receiver
+        self.payout_hash = payout_hash
+        self.text = text
+
+    def encode(self):
+        """The box contents, layout in degen2_contract.proposal_fields."""
+        return b"".join([
+            itob(self.type), itob(self.value), itob(self.index), itob(self.end_time), itob(self.upvotes),
+            itob(self.dnvotes), self.receiver, self.payout_hash, self.text,
+        ])
+
+    def min_balance(self):
+        return 2500 + 400 * (9 + proposal_text + len(self.text))
+
+
+class Airdrop:
+    """An airdrop box, layout in degen2_contract.airdrop_fields."""
+
+    __slots__ = ("root", "remaining", "end_time", "count")
+
+    def __init__(self, root, remaining, end_time, count):
+        self.root = root
+        self.remaining = remaining
+        self.end_time = end_time
+        self.count = count
+
+    def encode(self):
+        return self.root + itob(self.remaining) + itob(self.end_time) + itob(self.count)
+
+    @staticmethod
+    def min_balance():
+        return 2500 + 400 * (9 + airdrop_box_size)
+
+
+class Delegate:
+    """A delegate box, layout in degen2_contract.delegate_fields. slots is (proposal id, side, weight) per vote slot."""
+
+    __slots__ = ("delegated", "locked_until", "slots")
+
+    def __init__(self):
+        self.delegated = 0
+        self.locked_until = 0
+        self.slots = ((0, 0, 0),) * max_open_proposals
+
+    def encode(self):
+        return itob(self.delegated) + itob(self.locked_until) + b"".join(itob(v) for slot in self.slots for v in slot)
+
+    @staticmethod
+    def min_balance():
+        return 2500 + 400 * (33 + delegate_box_size)
+
+
+class Account:
+    __slots__ = ("algo", "assets", "local")
+
+    def __init__(self, algo=0):
+        self.algo = algo
+        self.assets = {}  # asset id -> amount, present when opted in
+        self.local = None
+
+
+class Dao:
+    """The app and the ledger around it. Setup helpers (fund, create_asset, opt_in_asset) bypass the journal,
+    everything a group does goes through apply()."""
+
+    __slots__ = ("app_id", "app_address", "creator", "now", "globals", "proposals", "delegates", "swaps", "airdrops",
+                 "claimed", "accounts",
+                 "asset_params", "next_id", "created", "journal", "group", "index", "error", "returned", "packed")
+
+    def __init__(self, app_id, app_address, creator, now=0, next_id=1000, packed=False):
+        """packed: the app was compiled with approval(packed=True), only changes what snapshot() shows."""
+        self.app_id = app_id
+        self.app_address = app_address
+        self.creator = creator
+        self.now = now  # Global.latest_timestamp
+        self.globals = Globals()
+        self.proposals = {}  # id -> Proposal
+        self.delegates = {}  # address -> Delegate
+        self.swaps = {}  # asset id -> (ratio, end time), the swap table
+        self.airdrops = {}  # id -> Airdrop
+        self.claimed = {}  # (airdrop id, chunk) -> the bitmap box's bytes
+        self.accounts = {app_address: Account()}
+        self.asset_params = {}  # id -> (creator, clawback)
+        self.next_id = next_id
+        self.created = iter(())
+        self.journal = []
+        self.group = ()
+        self.index = 0
+        self.error = None
+        self.returned = []  # (group index, record) of each query's return log in the last group applied
+        self.packed = packed
+
+    # setup
+    def fund(self, address, algo):
+        self.account(address).algo += algo
+
+    def create_asset(self, creator, total, clawback=None, asset_id=None):
+        asset_id = asset_id or self._new_id()
+        self.asset_params[asset_id] = (creator, clawback)
+        self.account(creator).assets[asset_id] = total
+        return asset_id
+
+    def opt_in_asset(self, address, asset):
+        self.account(address).assets.setdefault(asset, 0)
+
+    def account(self, address):
+        if address not in self.accounts:
+            self.accounts[address] = Account()
+        return self.accounts[address]
+
+    # groups
+    def apply(self, group, created=()):
+        """Run a group, True if every txn in it was approved. On a reject nothing changes and self.error says why.
+
+        created is the ids a node gave the assets the group creates, so model and chain ids line up in differential().
+        """
+        self.journal = []
+        self.returned = []
+        self.created = iter(created)
+        self.group = group
+        try:
+            check(0 < len(group) <= 16, "group size")
+            for self.index, txn in enumerate(group):
+                if txn.type == "pay":
+                    self._pay(txn.sender, txn.receiver, txn.amount)
+                elif txn.type == "axfer":
+                    self._axfer(txn.sender, txn.receiver, txn.asset, txn.amount)
+                else:
+                    self._call(txn)
+                    self._check_min_balance()
+        except Reject as e:
+            for target, key, old in reversed(self.journal):
+                if isinstance(target, dict):
+                    if old is missing:
+                        del target[key]
+                    else:
+                        target[key] = old
+                else:
+                    setattr(target, key, old)
+            self.error = str(e)
+            self.returned = []
+            return False
+        self.error = None
+        return True
+
+    def min_balance(self):
+        app = self.accounts[self.app_address]
+        return (100000 * (1 + len(app.assets)) + sum(p.min_balance() for p in self.proposals.values())
+                + Delegate.min_balance() * len(self.delegates) + (2500 + 400 * (9 + swap_box_size)) * len(self.swaps)
+                + Airdrop.min_balance() * len(self.airdrops) + (2500 + 400 * (17 + airdrop_chunk // 8)) * len(self.claimed))
+
+    def _check_min_balance(self):
+        app = self.accounts[self.app_address]
+        if app.algo or app.assets or self.proposals:  # an empty account has no minimum
+            check(app.algo >= self.min_balance(), "app below min balance")
+
+    def snapshot(self, addresses=None):
+        """The contract's state as chain reads would show it: {"global", "local", "boxes", "algo", "holdings"}."""
+        g = self.globals
+        accounts = self.accounts if addresses is None else {a: self.accounts[a] for a in addresses if a in self.accounts}
+        app = self.accounts[self.app_address]
+        state = {key: getattr(g, name) for name, key in global_keys.items()}
+        if self.packed:
+            for name in packed_params:
+                del state[global_keys[name]]
+            state[packed_key.encode()] = b"".join(itob(getattr(g, name)) for name in sorted(packed_params, key=packed_params.get))
+        return {
+            "global": state,
+            "local": {
+                address: {key: account.local.encode(name) for name, key in local_keys.items()}
+                for address, account in accounts.items() if account.local is not None
+            },
+            "boxes": dict(
+                [(proposal_box(proposal_id), p.encode()) for proposal_id, p in self.proposals.items()]
+                + [(delegate_box(address), d.encode()) for address, d in self.delegates.items()]
+                + [(swap_box(asset), itob(ratio) + itob(end_time)) for asset, (ratio, end_time) in self.swaps.items()]
+                + [(airdrop_box(airdrop_id), a.encode()) for airdrop_id, a in self.airdrops.items()]
+                + [(airdrop_box(*key), bitmap) for key, bitmap in self.claimed.items()]
+            ),
+            "algo": app.algo,
+            "holdings": dict(app.assets),
+        }
+
+    # journaled writes
+    def _set(self, target, name, value):
+        self.journal.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def _put(self, mapping, key, value):
+        self.journal.append((mapping, key, mapping.get(key, missing)))
+        mapping[key] = value
+
+    def _pop(self, mapping, key):
+        self.journal.append((mapping, key, mapping[key]))
+        del mapping[key]
+
+    def _new_id(self):
+        asset_id = next(self.created, None)
+        if asset_id is None:
+            asset_id = self.next_id
+            self.next_id += 1
+        return asset_id
+
+    # ledger
+    def _pay(self, sender, receiver, amount):
+        source = self.account(sender)
+        check(source.algo >= amount, "algo overspend")
+        self._set(source, "algo", source.algo - amount)
+        target = self.account(receiver)
+        self._set(target, "algo", target.algo + amount)
+        if sender == self.app_address:
+            self._check_min_balance()
+
+    def _axfer(self, sender, receiver, asset, amount, clawback_from=None, close_to=None):
+        source = self.account(clawback_from or sender)
+        target = self.account(receiver)
+        if clawback_from is None and sender == receiver and amount == 0 and asset not in target.assets:
+            check(asset in self.asset_params, "unknown asset")
+            self._put(target.assets, asset, 0)  # opt in
+            if sender == self.app_address:
+                self._check_min_balance()
+            return
+        if clawback_from is not None:
+            check(self.asset_params.get(asset, (None, None))[1] == sender, "not the clawback")
+        check(asset in source.assets, "sender not opted in")
+        check(asset in target.assets, "receiver not opted in")
+        check(source.assets[asset] >= amount, "asset overspend")
+        self._put(source.assets, asset, source.assets[asset] - amount)
+        self._put(target.assets, asset, target.assets[asset] + amount)
+        if close_to is not None:
+            closer = self.account(close_to)
+            check(asset in closer.assets or self.asset_params[asset][0] == close_to, "close to not opted in")
+            self._put(closer.assets, asset, closer.assets.get(asset, 0) + source.assets[asset])
+            self._pop(source.assets, asset)
+
+    def _holding(self, address, asset):
+        return self.account(address).assets.get(asset, 0)
+
+    # the app
+    def _arg(self, txn, index):
+        check(index < len(txn.args), "missing application arg")
+        return txn.args[index]
+
+    def _foreign(self, array, index):
+        check(index < len(array), "missing foreign reference")
+        return array[index]
+
+    def _local(self, address):
+        account = self.accounts.get(address)
+        check(account is not None and account.local is not None, "account not opted in to the app")
+        return account.local
+
+    def _call(self, txn):
+        if txn.app_id == 0:
+            return self._on_creation(txn)
+        check(txn.app_id == self.app_id, "unknown app")
+        account = self.account(txn.sender)
+        if txn.on_completion == "clear":
+            check(account.local is not None, "not opted in")
+            self._set(account, "local", None)
+            return
+        if txn.on_completion == "optin":
+            check(account.local is None, "already opted in")
+            self._set(account, "local", Local(self.globals.reward_per_share))
+            return
+        check(txn.on_completion == "noop", "on completion not handled")
+        handler = handlers.get(self._arg(txn, 0))
+        check(handler is not None, "unknown method")
+        handler(self, txn)
+
+    def _on_creation(self, txn):
+        g = self.globals
+        check(btoi(self._arg(txn, 0)) >= g.cooldown, "duration too short")
+        check(btoi(self._arg(txn, 1)) >= 1, "proposal fee too small")
+        self._set(g, "duration", btoi(txn.args[0]))
+        self._set(g, "cooldown", 3600 * 24)
+        self._set(g, "proposal_fee", btoi(txn.args[1]))
+        self._set(g, "threshold", btoi(self._arg(txn, 2)))
+        self._set(g, "price", 10000)
+        self._set(g, "next_proposal", max_open_proposals)
+        self._set(g, "end_creator_opt_in", self.now + week)
+
+    def create_token(self, txn):
+        check(txn.sender == self.creator, "creator only")
+        check(self.globals.degen2 == 0, "token already created")
+        asset_id = self._new_id()
+        self._put(self.asset_params, asset_id, (self.app_address, self.app_address))
+        self._put(self.accounts[self.app_address].assets, asset_id, degen2_total)
+        self._check_min_balance()
+        self._set(self.globals, "degen2", asset_id)
+        if len(txn.args) > 1:
+            self._put_swap(btoi(txn.args[1]), 1, self.now + week)
+
+    def creator_token_opt_in(self, txn):
+        check(txn.sender == self.creator, "creator only")
+        check(self.now < self.globals.end_creator_opt_in, "creator opt in is over")
+        self._axfer(self.app_address, self.app_address, self._foreign(txn.assets, 0), 0)
+
+    def token_opt_in(self, txn):
+        g0 = self.group[0]
+        check(len(self.group) >= 2, "group size")
+        check(g0.type == "pay" and g0.amount >= 1000000 and g0.receiver == self.app_address, "opt in fee")
+        check(self._local(txn.sender).stake >= self.globals.proposal_fee, "stake below the proposal fee")
+        self._axfer(self.app_address, self.app_address, self._foreign(txn.assets, 0), 0)
+
+    def token_opt_out(self, txn):
+        asset = self._foreign(txn.assets, 0)
+        check(self._holding(self.app_address, asset) == 0, "asset balance isn't 0")
+        self._axfer(self.app_address, self.app_address, asset, 0, close_to=txn.sender)
+
+    def _sell(self, txn, is_payment, rate):
+        g = self.globals
+        asset = self._foreign(txn.assets, 0)
+        balance = self._holding(self.app_address, asset)
+        check(asset == g.degen2, "not degen2")
+        sold = []
+        for index, other in enumerate(self.group):
+            if is_payment(other):
+                check(other.amount >= rate, "below the minimum purchase")
+                sold.append((other.sender, div(other.amount, rate)))
+            elif other.type == "appl" and other.app_id == self.app_id and index != self.index:
+                check(self._arg(other, 0) == methods["pad"].encode(), "another call in the group")
+        total = sum(amount for _, amount in sold)
+        check(total > 0, "nothing sold")
+        check(add(g.total_stake, g.reserved) <= sub(balance, total), "would dip into stake")
+        check(len(sold) <= 16, "inner group size")
+        for payer, amount in sold:
+            self._axfer(self.app_address, payer, asset, amount)
+
+    def buy(self, txn):
+        app = self.app_address
+        self._sell(txn, lambda t: t.type == "pay" and t.receiver == app, self.globals.price)
+
+    def swap1(self, txn):
+        token = btoi(self._arg(txn, 1))
+        check(token in self.swaps, "not in the swap table")
+        ratio, end_time = self.swaps[token]
+        check(self.now < end_time, "swap period is over")
+        app = self.app_address
+        self._sell(txn, lambda t: t.type == "axfer" and t.asset == token and t.receiver == app, ratio)
+
+    def local_stake(self, txn):
+        g, g0 = self.globals, self.group[0]
+        check(self.index == 1, "not right after the deposit")
+        check(g0.type == "axfer" and g0.asset == g.degen2 and g0.receiver == self.app_address, "stake deposit")
+        self._settle(txn.sender)
+        local = self._local(txn.sender)
+        self._set(local, "stake", add(local.stake, g0.amount))
+        self._set(g, "total_stake", add(g.total_stake, g0.amount))
+        self._move_delegated(txn.sender, g0.amount, 0, True)
+
+    def propose(self, txn):
+        g, group, app = self.globals, self.group, self.accounts[self.app_address]
+        balance = self._holding(self.app_address, self._foreign(txn.assets, 0))
+        requested = btoi(self._arg(txn, 3))
+        check(len(group) == 3, "group size")
+        check(group[1].type == "pay" and group[1].amount >= 2000000 and group[1].receiver == self.app_address, "proposal payment")
+        check(group[2].type == "axfer" and group[2].amount >= g.proposal_fee and group[2].asset == g.degen2
+              and group[2].receiver == self.app_address, "proposal fee")
+
+        previous = self.proposals.get(g.next_proposal - max_open_proposals)
+        if previous is not None:
+            check(add(previous.end_time, g.cooldown) < self.now, "queue is full")
+            self._close(g.next_proposal - max_open_proposals)
+        proposal_type, index = self._arg(txn, 2), btoi(self._arg(txn, 4))
+        if proposal_type == proposal_types["pay_algo"].encode():
+            if self._arg(txn, 1) == b"a":
+                check(requested <= sub(app.algo, self.min_balance()), "more than the treasury")
+            else:
+                check(requested < app.algo // 10, "more than 10% of the treasury")
+        if proposal_type == proposal_types["pay_token"].encode() and index == g.degen2:
+            check(requested < 20000000, "too much degen2")
+            check(txn.assets[0] == g.degen2, "not degen2")
+            check(add(g.total_stake, g.reserved) <= sub(balance, requested), "would dip into stake")
+            self._set(g, "reserved", add(g.reserved, requested))
+        payout_hash = zero_address
+        if proposal_type == proposal_types["airdrop"].encode():
+            payout_hash = self._arg(txn, 5)
+            check(len(payout_hash) == 32, "merkle root")
+            check(0 < index <= airdrop_chunk * max_airdrop_chunks, "leaf count")
+            check(txn.assets[0] == g.degen2, "not degen2")
+            check(add(g.total_stake, g.reserved) <= sub(balance, requested), "would dip into stake")
+            self._set(g, "reserved", add(g.reserved, requested))
+        if proposal_type in (proposal_types["pay_tokens"].encode(), proposal_types["swap_table"].encode()):
+            entries = self._arg(txn, 5)
+            size = 16 if proposal_type == proposal_types["pay_tokens"].encode() else swap_entry
+            check(len(entries) > 0 and len(entries) % size == 0, "payout list")
+            check(size == 16 or len(entries) <= swap_entry * max_swap_entries, "more swaps than execute can log")
+            payout_hash = hashlib.sha256(entries).digest()
+        check(self._local(txn.sender).stake > 0, "no stake")
+
+        proposal_id = g.next_proposal
+        self._set(g, "next_proposal", add(proposal_id, 1))
+        end_time = add(self.now, g.duration)
+        receiver = self._foreign(txn.accounts, 1)
+        self._put(self.proposals, proposal_id, Proposal(
+            btoi(proposal_type), requested, index, end_time, receiver, payout_hash, self._arg(txn, 1)))
+        if receiver in self.accounts and self.accounts[receiver].local is not None:
+            self._lock(receiver, add(end_time, g.cooldown))
+
+    def _vote(self, txn, tally):
+        local = self._local(txn.sender)
+        proposal_id = btoi(self._arg(txn, 1))
+        p = self.proposals.get(proposal_id)
+        check(p is not None, "no such proposal")
+        slot = proposal_id % max_open_proposals
+        check(local.last_vote[slot] != proposal_id, "already voted")
+        check(self.now < p.end_time, "vote is over")
+        weight = local.stake
+        if local.delegate != zero_address:  # voting yourself overrides the delegation
+            d = self._delegate(local.delegate)
+            _, side, left_out = self._open_slot(d, proposal_id)
+            if side:
+                side_tally = "upvotes" if side == 1 else "dnvotes"
+                self._set(p, side_tally, sub(getattr(p, side_tally), weight))
+                self._set_slot(d, proposal_id, side, sub(left_out, weight))
+            else:
+                self._set_slot(d, proposal_id, 0, add(left_out, weight))
+        if txn.sender in self.delegates:  # plus what's delegated to the sender, less what voted itself
+            d = self.delegates[txn.sender]
+            left_out = self._open_slot(d, proposal_id)[2]
+            delegated = d.delegated - left_out if d.delegated > left_out else 0
+            self._set_slot(d, proposal_id, 1 if tally == "upvotes" else 2, delegated)
+            if d.locked_until < p.end_time:
+                self._set(d, "locked_until", p.end_time)
+            weight = add(weight, delegated)
+        check(weight > 0, "no stake")
+        self._set(p, tally, add(getattr(p, tally), weight))
+        self._set(local, "last_vote", local.last_vote[:slot] + (proposal_id,) + local.last_vote[slot + 1:])
+        self._lock(txn.sender, p.end_time)
+
+    def up_px(self, txn):
+        self._vote(txn, "upvotes")
+
+    def dn_px(self, txn):
+        self._vote(txn, "dnvotes")
+
+    def execute(self, txn):
+        g = self.globals
+        proposal_id = btoi(self._arg(txn, 1))
+        p = self.proposals.get(proposal_id)
+        check(p is not None, "no such proposal")
+        check(p.end_time < self.now, "vote isn't over")
+        if self._executes(p):
+            branch = executors.get(p.type)
+            if branch is not None:
+                branch(self, txn, p)
+            self._pay(self.app_address, txn.sender, 1000000)
+        self._close(proposal_id)
+
+    def stake_vote(self, txn):
+        self.local_stake(txn)
+        side = self._arg(txn, 2)
+        check(side in (methods["up_px"].encode(), methods["dn_px"].encode()), "not a side")
+        self._vote(txn, "upvotes" if side == methods["up_px"].encode() else "dnvotes")
+
+    def delegate(self, txn):
+        g0 = self.group[0]
+        check(self.index == 1, "not right after the fee")
+        check(g0.type == "pay" and g0.amount >= 1000000 and g0.receiver == self.app_address, "delegate fee")
+        local = self._local(txn.sender)
+        self._move_delegated(txn.sender, 0, local.stake, True)
+        target = self._foreign(txn.accounts, 1)
+        if target == txn.sender:
+            self._set(local, "delegate", zero_address)
+            return
+        self._set(local, "delegate", target)
+        if target not in self.delegates:
+            self._put(self.delegates, target, Delegate())
+        self._move_delegated(txn.sender, local.stake, 0, True)
+
+    def withdraw(self, txn):
+        self._settle(txn.sender)
+        self._unstake(txn, btoi(self._arg(txn, 1)), self.group[0])
+
+    def restake(self, txn):
+        withdrawn = btoi(self._arg(txn, 1))
+        self.local_stake(txn)
+        if withdrawn > 0:
+            check(len(self.group) > 2, "no withdraw fee")
+            self._unstake(txn, withdrawn, self.group[2])
+
+    def _unstake(self, txn, withdrawn, fee):
+        g, local = self.globals, self._local(txn.sender)
+        check(local.locked_until < self.now, "stake is locked")
+        check(fee.type == "pay" and fee.amount >= 1000000 and fee.receiver == self.app_address, "withdraw fee")
+        check(withdrawn <= local.stake, "more than staked")
+        check(self._foreign(txn.assets, 0) == g.degen2, "not degen2")
+        self._axfer(self.app_address, txn.sender, g.degen2, withdrawn)
+        self._set(local, "stake", local.stake - withdrawn)
+        self._move_delegated(txn.sender, 0, withdrawn, True)
+        self._set(g, "total_stake", sub(g.total_stake, withdrawn))
+
+    def pad(self, txn):
+        pass
+
+    def fund_rewards(self, txn):
+        g0 = self.group[0]
+        check(self.index == 1, "not right after the payment")
+        check(g0.type == "pay" and g0.amount > 0 and g0.receiver == self.app_address, "reward payment")
+        self._distribute(g0.amount)
+
+    def claim(self, txn):
+        g = self.globals
+        airdrop_id = btoi(self._arg(txn, 1))
+        a = self.airdrops.get(airdrop_id)
+        check(a is not None, "no such airdrop")
+        index, amount = btoi(self._arg(txn, 2)), btoi(self._arg(txn, 3))
+        check(index < a.count, "no such leaf")
+        check(self.now < a.end_time, "airdrop is over")
+        check(self._foreign(txn.assets, 0) == g.degen2, "not degen2")
+        node, position, proof = airdrop_leaf(txn.sender, index, amount), index, self._arg(txn, 4)
+        for offset in range(0, len(proof), 32):
+            check(offset + 32 <= len(proof), "proof length")
+            sibling = proof[offset:offset + 32]
+            node = hashlib.sha256(sibling + node if position % 2 else node + sibling).digest()
+            position //= 2
+        check(node == a.root, "not in the tree")
+        chunk, bit = divmod(index, airdrop_chunk)
+        bitmap = self.claimed.get((airdrop_id, chunk), bytes(airdrop_chunk // 8))
+        mask = 1 << (7 - bit % 8)
+        check(not bitmap[bit // 8] & mask, "claimed already")
+        self._put(self.claimed, (airdrop_id, chunk), bitmap[:bit // 8] + bytes([bitmap[bit // 8] | mask]) + bitmap[bit // 8 + 1:])
+        self._set(a, "remaining", sub(a.remaining, amount))
+        self._set(g, "reserved", sub(g.reserved, amount))
+        self._axfer(self.app_address, txn.sender, g.degen2, amount)
+
+    def close_airdrop(self, txn):
+        g = self.globals
+        airdrop_id = btoi(self._arg(txn, 1))
+        a = self.airdrops.get(airdrop_id)
+        check(a is not None, "no such airdrop")
+        check(a.end_time < self.now, "airdrop is still open")
+        self._set(g, "reserved", sub(g.reserved, a.remaining))
+        for chunk in range(-(-a.count // airdrop_chunk)):
+            if (airdrop_id, chunk) in self.claimed:
+                self._pop(self.claimed, (airdrop_id, chunk))
+        self._pop(self.airdrops, airdrop_id)
+
+    # read-only queries
+    def proposal_status(self, txn):
+        p = self.proposals.get(btoi(self._arg(txn, 1)))
+        if p is None:
+            return self._return("proposal_status", proposal_states.index("none"), 0, 0, 0, 0, 0, 0)
+        status = "voting" if self.now < p.end_time else "passed" if self._executes(p) else "failed"
+        self._return("proposal_status", proposal_states.index(status), p.type, p.value, p.index, p.end_time, p.upvotes, p.dnvotes)
+
+    def quote(self, txn):
+        spare = self._spare(txn)[1]
+        price = self.globals.price
+        bought = div(btoi(self._arg(txn, 1)), price)
+        self._return("quote", bought, price, int(0 < bought <= spare))
+
+    def swap_quote(self, txn):
+        spare = self._spare(txn)[1]
+        ratio, end_time = self.swaps.get(btoi(self._arg(txn, 1)), (0, 0))
+        bought = div(btoi(self._arg(txn, 2)), ratio) if ratio else 0  # the amount isn't read without a ratio
+        self._return("swap_quote", bought, ratio, end_time, int(0 < bought <= spare and self.now < end_time))
+
+    def headroom(self, txn):
+        g = self.globals
+        held, spare = self._spare(txn)
+        self._return("headroom", held, g.total_stake, g.reserved, spare)
+
+    def eligibility(self, txn):
+        proposal_id = btoi(self._arg(txn, 1))
+        voter = self._foreign(txn.accounts, 1)
+        p = self.proposals.get(proposal_id)
+        end_time = p.end_time if p else 0
+        local = self.accounts[voter].local if voter in self.accounts else None
+        weight = voted = locked_until = 0
+        if local is not None:
+            weight, locked_until = local.stake, local.locked_until
+            voted = int(local.last_vote[proposal_id % max_open_proposals] == proposal_id)
+            d = self.delegates.get(voter)
+            if d is not None:
+                slot_id, _, left_out = d.slots[proposal_id % max_open_proposals]
+                if slot_id != proposal_id:
+                    left_out = 0
+                weight = add(weight, d.delegated - left_out if d.delegated > left_out else 0)
+        self._return("eligibility", int(self.now < end_time and not voted and weight > 0), weight, voted, locked_until)
+
+    # execute branches
+    def _start_swap1(self, txn, p):
+        self._put_swap(p.index, p.value, self.now + week)
+
+    def _swap_table(self, txn, p):
+        entries = self._arg(txn, 2)
+        check(hashlib.sha256(entries).digest() == p.payout_hash, "not the proposed list")
+        for offset in range(0, len(entries), swap_entry):
+            check(offset + swap_entry <= len(entries), "swap list")
+            self._put_swap(*(btoi(entries[i:i + 8]) for i in range(offset, offset + swap_entry, 8)))
+
+    def _clawback(self, txn, p):
+        check(self._foreign(txn.assets, 0) == self.globals.degen2, "not degen2")
+        check(self._foreign(txn.accounts, 1) == p.receiver, "not the receiver")
+        self._axfer(self.app_address, self.app_address, self.globals.degen2, p.value, clawback_from=p.receiver)
+
+    def _slash_stake(self, txn, p):
+        g = self.globals
+        check(self._foreign(txn.accounts, 1) == p.receiver, "not the receiver")
+        self._settle(p.receiver)
+        local = self._local(p.receiver)
+        check(p.value <= local.stake // 2, "more than half the stake")
+        self._set(local, "stake", local.stake - p.value)
+        self._set(g, "total_stake", sub(g.total_stake, p.value))
+        self._move_delegated(p.receiver, 0, p.value, False)
+
+    def _change_proposal_fee(self, txn, p):
+        fee = self.globals.proposal_fee
+        check(2 * fee // 3 < p.value < 4 * fee // 3 and 9 < p.value < 20000000, "fee out of bounds")
+        self._set(self.globals, "proposal_fee", p.value)
+
+    def _change_duration(self, txn, p):
+        check(p.value >= 600 and p.index >= 1800, "duration out of bounds")
+        self._set(self.globals, "duration", p.value)
+        self._set(self.globals, "cooldown", p.index)
+
+    def _change_threshold(self, txn, p):
+        threshold = self.globals.threshold
+        check(2 * threshold // 3 < p.value < 4 * threshold // 3 and 4200000 < p.value < 315000069, "threshold out of bounds")
+        self._set(self.globals, "threshold", p.value)
+
+    def _change_price(self, txn, p):
+        price = self.globals.price
+        check(2 * price // 3 < p.value < 4 * price // 3 and p.value > 9, "price out of bounds")
+        self._set(self.globals, "price", p.value)
+
+    def _pay_algo(self, txn, p):
+        app = self.accounts[self.app_address]
+        check(self._foreign(txn.accounts, 1) == p.receiver, "not the receiver")
+        if p.value > app.algo // 10:
+            check(p.upvotes >= 280000046, "big payouts need 2/3 of the supply")
+        check(add(p.value, self.globals.rewards_owed) <= sub(app.algo, self.min_balance()), "would spend rewards")
+        self._pay(self.app_address, p.receiver, p.value)
+
+    def _share_treasury(self, txn, p):
+        app = self.accounts[self.app_address]
+        check(add(p.value, self.globals.rewards_owed) <= sub(app.algo, self.min_balance()), "would spend rewards")
+        self._distribute(p.value)
+
+    def _pay_token(self, txn, p):
+        check(self._foreign(txn.assets, 0) == p.index, "not the proposed token")
+        check(self._foreign(txn.accounts, 1) == p.receiver, "not the receiver")
+        self._axfer(self.app_address, p.receiver, p.index, p.value)
+
+    def _pay_tokens(self, txn, p):
+        g = self.globals
+        payouts = self._arg(txn, 2)
+        check(self._foreign(txn.accounts, 1) == p.receiver, "not the receiver")
+        check(hashlib.sha256(payouts).digest() == p.payout_hash, "not the proposed list")
+        for offset in range(0, len(payouts), 16):
+            check(offset + 16 <= len(payouts), "payout list")
+            asset, amount = btoi(payouts[offset:offset + 8]), btoi(payouts[offset + 8:offset + 16])
+            self._axfer(self.app_address, p.receiver, asset, amount)
+        check(add(g.total_stake, g.reserved) <= self._holding(self.app_address, g.degen2), "would dip into stake")
+
+    def _airdrop(self, txn, p):
+        g = self.globals
+        self._put(self.airdrops, btoi(txn.args[1]), Airdrop(p.payout_hash, p.value, add(self.now, airdrop_window), p.index))
+        self._set(g, "reserved", add(g.reserved, p.value))  # _close takes it off again, the airdrop holds it now
+
+    # shared pieces
+    def _executes(self, p):
+        """Whether execute would run p's branch now, or only clean up. The vote has to be over for either."""
+        g = self.globals
+        in_grace = add(p.end_time, g.cooldown) > self.now
+        passed = p.upvotes > p.dnvotes and add(p.upvotes, p.dnvotes) > g.threshold
+        return in_grace and passed
+
+    def _spare(self, txn):
+        """(the app's degen2, what of it is neither staked nor reserved), assets[0] has to be degen2."""
+        g = self.globals
+        check(self._foreign(txn.assets, 0) == g.degen2, "not degen2")
+        held = self._holding(self.app_address, g.degen2)
+        committed = add(g.total_stake, g.reserved)
+        return held, held - committed if held > committed else 0
+
+    def _return(self, name, *values):
+        assert len(values) == len(queries[name]), name
+        self.returned.append((self.index, return_prefix + b"".join(itob(value) for value in values)))
+
+    def _close(self, proposal_id):
+        g, p = self.globals, self.proposals[proposal_id]
+        if p.type == kind["pay_token"] and p.index == g.degen2 or p.type == kind["airdrop"]:
+            self._set(g, "reserved", sub(g.reserved, p.value))
+        self._pop(self.proposals, proposal_id)
+
+    def _delegate(self, address):
+        check(address in self.delegates, "no such box")
+        return self.delegates[address]
+
+    def _move_delegated(self, address, added, removed, check_frozen):
+        local = self._local(address)
+        if local.delegate == zero_address:
+            return
+        d = self._delegate(local.delegate)
+        if check_frozen:
+            check(local.locked_until < self.now, "stake is locked by its own votes")
+            check(d.locked_until < self.now, "stake is locked by the delegate's votes")
+        self._set(d, "delegated", sub(add(d.delegated, added), removed))
+
+    def _open_slot(self, d, proposal_id):
+        """proposal_id's slot in d, cleared first if it held an older proposal."""
+        slot = proposal_id % max_open_proposals
+        if d.slots[slot][0] != proposal_id:
+            self._set_slot(d, proposal_id, 0, 0)
+        return d.slots[slot]
+
+    def _set_slot(self, d, proposal_id, side, weight):
+        slot = proposal_id % max_open_proposals
+        self._set(d, "slots", d.slots[:slot] + ((proposal_id, side, weight),) + d.slots[slot + 1:])
+
+    def _put_swap(self, asset, ratio, end_time):
+        if ratio:
+            self._put(self.swaps, asset, (ratio, end_time))
+        elif asset in self.swaps:
+            self._pop(self.swaps, asset)
+
+    def _lock(self, address, until):
+        local = self._local(address)
+        if local.locked_until < until:
+            self._set(local, "locked_until", until)
+
+    def _distribute(self, amount):
+        g = self.globals
+        check(g.total_stake > 0, "nobody staked")
+        self._set(g, "reward_per_share", add(g.reward_per_share, amount * reward_scale // g.total_stake))
+        self._set(g, "rewards_owed", add(g.rewards_owed, amount))
+
+    def _settle(self, address):
+        g, local = self.globals, self._local(address)
+        owed = local.stake * sub(g.reward_per_share, local.reward_checkpoint) // reward_scale
+        check(owed <= uint64_max, "wide ratio overflowed")
+        if owed > 0:
+            self._set(g, "rewards_owed", sub(g.rewards_owed, owed))
+            self._pay(self.app_address, address, owed)
+        self._set(local, "reward_checkpoint", g.reward_per_share)
+
+
+# application_args[0] -> handler, proposal type -> execute branch
+handlers = {selector.encode(): getattr(Dao, name) for name, selector in methods.items()}
+executors = {kind[name]: getattr(Dao, "_" + name) for name in proposal_types}
+
+
+def random_group(dao, rng, users):
+    """A random group against the model's current state, valid often enough to get deep into governance.
+
+    Returns a list of Txn, or an int: seconds to let pass before the next group.
+    """
+    g, app, app_id = dao.globals, dao.app_address, dao.app_id
+    user = rng.choice(users)
+    other = rng.choice(users)
+    local = dao.accounts[user].local if user in dao.accounts else None
+    d2 = g.degen2
+    roll = rng.random()
+    if roll < 0.05:
+        if dao.airdrops and rng.random() < 0.1:
+            return airdrop_window
+        return rng.choice([60, 3600, g.duration // 2, g.duration, g.cooldown + 1])
+    if roll < 0.1:
+        return [call(user, app_id, on_completion="optin" if local is None or rng.random() < 0.8 else "clear")]
+    tokens = [asset for asset in dao.asset_params if asset != d2]
+    if roll < 0.26:
+        payers = rng.sample(users, rng.randint(1, 3))
+        amounts = [rng.choice([g.price, g.price * rng.randint(1, 5000), g.price - 1]) for _ in payers]
+        return [pay(payer, app, amount) for payer, amount in zip(payers, amounts)] + [
+            call(user, app_id, methods["buy"], assets=[d2], fee=1000 * (1 + len(payers)))]
+    if roll < 0.3:
+        token = rng.choice(tokens) if tokens else 0
+        ratio = dao.swaps.get(token, (1, 0))[0]
+        payers = rng.sample(users, rng.randint(1, 3))
+        amounts = [rng.choice([ratio, ratio * rng.randint(1, 50), ratio - 1]) for _ in payers]
+        return [axfer(payer, app, token, amount) for payer, amount in zip(payers, amounts)] + [
+            call(user, app_id, methods["swap1"], token, assets=[d2], boxes=[swap_box(token)], fee=1000 * (1 + len(payers)))]
+    if roll < 0.45:
+        held = dao.accounts[user].assets.get(d2, 0) if user in dao.accounts else 0
+        deposit = axfer(user, app, d2, rng.randint(0, held) if held else 0)
+        which = rng.random()
+        if which < 0.5:
+            return [deposit, call(user, app_id, methods["local_stake"], fee=2000)]
+        if which < 0.75:
+            proposal_id = rng.choice(list(dao.proposals) or [g.next_proposal])
+            side = rng.choice([methods["up_px"], methods["dn_px"], "x"])
+            return [deposit, call(user, app_id, methods["stake_vote"], proposal_id, side, boxes=vote_boxes(dao, user, proposal_id), fee=2000)]
+        stake = local.stake if local else 0
+        return [deposit, call(user, app_id, methods["restake"], rng.choice([0, 0, stake // 2, stake + 1]), assets=[d2], fee=3000),
+                pay(user, app, rng.choice([1000000, 1000000, 10]))]
+    if roll < 0.53:
+        stake = local.stake if local else 0
+        return [pay(user, app, 1000000),
+                call(user, app_id, methods["withdraw"], rng.choice([0, stake, stake // 2, stake + 1]), assets=[d2], fee=3000)]
+    if roll < 0.63:
+        name = rng.choice(list(proposal_types) + ["text"])
+        value = rng.choice([0, 1, 10, 1000, g.proposal_fee, g.price, g.threshold, 5000000, 4200001])
+        index = rng.choice([0, d2, 1800, 3600] + tokens)
+        if name == "airdrop":
+            index = rng.choice([1, len(users), 3 * airdrop_chunk])
+        lists = {
+            "pay_tokens": lambda: itob(d2) + itob(g.next_proposal % 11),  # execute can rebuild it from the id
+            "swap_table": lambda: random_swaps(rng, tokens),
+            "airdrop": lambda: random_airdrop_tree(tuple(users), index)[-1][0],
+        }
+        args = [b"proposal", proposal_types.get(name, "tx"), value, index] + ([lists[name]()] if name in lists else [])
+        return [
+            call(user, app_id, methods["propose"], *args, accounts=[other], assets=[d2],
+                 boxes=[proposal_box(g.next_proposal), proposal_box(g.next_proposal - max_open_proposals)]),
+            pay(user, app, 2000000),
+            axfer(user, app, d2, g.proposal_fee),
+        ]
+    if roll < 0.68:
+        target = rng.choice([other, other, user])
+        boxes = [delegate_box(target)] + ([delegate_box(local.delegate)] if local and local.delegate != zero_address else [])
+        return [pay(user, app, rng.choice([1000000, 1000000, 10])),
+                call(user, app_id, methods["delegate"], accounts=[target], boxes=boxes)]
+    proposal_id = rng.choice(list(dao.proposals) or [g.next_proposal])
+    p = dao.proposals.get(proposal_id)
+    if roll < 0.72:
+        return [random_query(dao, rng, user, other, proposal_id, tokens)]
+    if roll < 0.76:
+        airdrop_id = rng.choice(list(dao.airdrops) or [proposal_id])
+        count = dao.airdrops[airdrop_id].count if airdrop_id in dao.airdrops else 1
+        if roll < 0.75:
+            return random_claim(rng, users, user, app_id, d2, airdrop_id, count)
+        boxes = airdrop_boxes(airdrop_id, count)
+        return [call(user, app_id, methods["close_airdrop"], airdrop_id, boxes=boxes[:8])] + [
+            call(user, app_id, methods["pad"], boxes=boxes[i:i + 8]) for i in range(8, len(boxes), 8)]
+    if roll < 0.85:
+        vote = methods["up_px"] if rng.random() < 0.7 else methods["dn_px"]
+        return [call(user, app_id, vote, proposal_id, boxes=vote_boxes(dao, user, proposal_id))]
+    if roll < 0.95:
+        receiver = p.receiver if p else other
+        asset = p.index if p and p.type == kind["pay_token"] else d2
+        args, boxes = [methods["execute"], proposal_id], [proposal_box(proposal_id)]
+        if p and p.type == kind["pay_tokens"]:
+            args.append(itob(d2) + itob(proposal_id % 11 if rng.random() < 0.9 else rng.randint(0, 10)))
+        elif p and p.type == kind["swap_table"]:
+            args.append(random_swaps(rng, tokens))
+            boxes += [swap_box(btoi(args[-1][i:i + 8])) for i in range(0, len(args[-1]), swap_entry)]
+        elif p and p.type == kind["start_swap1"]:
+            boxes.append(swap_box(p.index))
+        elif p and p.type == kind["airdrop"]:
+            boxes.append(airdrop_box(proposal_id))
+        return [call(user, app_id, *args, accounts=[receiver], assets=[asset], boxes=boxes, fee=4000)]
+    calls = [call(user, app_id, methods["fund_rewards"], *[b"again"] * i) for i in range(rng.choice([1, 1, 1, 2]))]
+    return [pay(user, app, rng.choice([0, 1000, 1000000]))] + calls  # a second call can't reuse the payment
+
+
+def random_query(dao, rng, user, other, proposal_id, tokens):
+    """One of the read-only calls, now and then missing the reference it needs."""
+    g, app_id, d2 = dao.globals, dao.app_id, dao.globals.degen2
+    asset = rng.choice([d2, d2, d2] + tokens)
+    name = rng.choice(list(queries))
+    if name == "proposal_status":
+        return call(user, app_id, methods[name], proposal_id, boxes=[proposal_box(proposal_id)])
+    if name == "quote":
+        return call(user, app_id, methods[name], rng.choice([0, g.price - 1, g.price * rng.randint(1, 10**6)]), assets=[asset])
+    if name == "swap_quote":
+        token = rng.choice(tokens + [0])
+        ratio = dao.swaps.get(token, (1, 0))[0]
+        args = [token] + ([rng.choice([ratio - 1, ratio * rng.randint(1, 10**9)])] if rng.random() < 0.9 else [])
+        return call(user, app_id, methods[name], *args, assets=[asset], boxes=[swap_box(token)])
+    if name == "headroom":
+        return call(user, app_id, methods[name], assets=[asset])
+    voter = rng.choice([user, other])
+    return call(user, app_id, methods[name], proposal_id, accounts=[voter], boxes=vote_boxes(dao, voter, proposal_id))
+
+
+def random_airdrop(users, count):
+    """Allocations of the airdrops random groups propose, a function of the leaf count so claims can rebuild them."""
+    step = max(1, count // len(users))
+    return {i * step: (user, 1000 + i) for i, user in enumerate(users) if i * step < count}
+
+
+@functools.lru_cache(maxsize=None)
+def random_airdrop_tree(users, count):
+    """airdrop_tree of random_airdrop(users, count), users a tuple. Built once per leaf count, hashing the tree is
+    most of what generating random groups costs."""
+    return airdrop_tree(random_airdrop(users, count), count)
+
+
+def random_claim(rng, users, user, app_id, d2, airdrop_id, count):
+    """A claim of user's leaf, or someone else's, now and then with a wrong amount or a short proof."""
+    allocations = random_airdrop(users, count)
+    mine = [index for index, (address, _) in allocations.items() if address == user]
+    index = mine[0] if mine and rng.random() < 0.9 else rng.choice(list(allocations))
+    amount = allocations[index][1] + (1 if rng.random() < 0.05 else 0)
+    proof = airdrop_proof(random_airdrop_tree(tuple(users), count), index)
+    if proof and rng.random() < 0.05:
+        proof = proof[:-32]
+    boxes = [airdrop_box(airdrop_id), airdrop_box(airdrop_id, index // airdrop_chunk)]
+    return [call(user, app_id, methods["claim"], airdrop_id, index, amount, proof, assets=[d2], boxes=boxes, fee=2000)] + [
+        call(user, app_id, methods["pad"]) for _ in range(2)]
+
+
+def random_swaps(rng, tokens):
+    """A swap_table list from few enough choices that an execute often repeats the proposed one."""
+    entries = rng.sample(tokens, rng.choice([1, 1, len(tokens)])) if tokens else [0]
+    if rng.random() < 0.15:  # one more than execute can log
+        entries = (entries * (max_swap_entries + 1))[:max_swap_entries + 1]
+    return b"".join(itob(token) + itob(rng.choice([0, 2])) + itob(2**40) for token in entries)
+
+
+def vote_boxes(dao, voter, proposal_id):
+    """Box references a vote needs: the proposal, the voter's delegate box and its delegate's."""
+    local = dao.accounts[voter].local if voter in dao.accounts else None
+    delegate = local.delegate if local is not None else zero_address
+    return [proposal_box(proposal_id), delegate_box(voter)] + ([delegate_box(delegate)] if delegate != zero_address else [])
+
+
+def setup(dao, users, creator, swap_tokens=()):
+    """Groups that take a freshly created app to degen2 minted and everyone opted in to the app and degen2.
+
+    swap_tokens are assets creator holds: the first goes in the swap table with create_token, the app opts in to all
+    of them and every user gets some. A generator, each group reads the model as left by the one before.
+    """
+    yield [pay(creator, dao.app_address, 10000000)]
+    yield [call(creator, dao.app_id, methods["create_token"], *swap_tokens[:1], boxes=[swap_box(t) for t in swap_tokens[:1]], fee=2000)]
+    for token in swap_tokens:
+        yield [call(creator, dao.app_id, methods["creator_token_opt_in"], assets=[token], fee=2000)]
+    for user in users:
+        yield [call(user, dao.app_id, on_completion="optin")]
+        yield [axfer(user, user, dao.globals.degen2, 0)]
+        for token in swap_tokens:
+            yield [axfer(user, user, token, 0), axfer(creator, user, token, 10**6)]
+
+
+def pay_tokens_cycle(dao, user, receiver, amount=5):
+    """Groups, and seconds to wait, that take a pay_tokens proposal of amount degen2 to receiver from user's propose
+    through a passing vote to its execute, the last group. A generator like setup.
+    """
+    g, app, app_id, d2 = dao.globals, dao.app_address, dao.app_id, dao.globals.degen2
+    open_until = max([p.end_time for p in dao.proposals.values()] + [dao.now]) + g.cooldown
+    yield open_until + 1 - dao.now  # whatever is open is over, so the queue has room
+    if dao.accounts[user].local is None:
+        yield [call(user, app_id, on_completion="optin")]
+    stake = g.threshold + 1
+    yield [pay(user, app, g.price * (stake + g.proposal_fee)), call(user, app_id, methods["buy"], assets=[d2], fee=2000)]
+    yield [axfer(user, app, d2, stake), call(user, app_id, methods["local_stake"], fee=2000)]
+    proposal_id, payouts = g.next_proposal, itob(d2) + itob(amount)
+    yield [
+        call(user, app_id, methods["propose"], b"proposal", proposal_types["pay_tokens"], 0, 0, payouts,
+             accounts=[receiver], assets=[d2], boxes=[proposal_box(proposal_id), proposal_box(proposal_id - max_open_proposals)]),
+        pay(user, app, 2000000),
+        axfer(user, app, d2, g.proposal_fee),
+    ]
+    yield [call(user, app_id, methods["up_px"], proposal_id, boxes=vote_boxes(dao, user, proposal_id))]
+    yield g.duration + 1
+    yield [call(user, app_id, methods["execute"], proposal_id, payouts, accounts=[receiver], assets=[d2],
+                boxes=[proposal_box(proposal_id)], fee=4000)]
+
+
+def bench(groups, seed=0, users=64, out=sys.stdout):
+    """Run random groups against the model and print the throughput."""
+    rng = random.Random(seed)
+    addresses = [hashlib.sha512(b"user%d" % i).digest()[:32] for i in range(users)]
+    creator = addresses[0]
+    dao = Dao(1, hashlib.sha512(b"app").digest()[:32], creator, now=1700000000)
+    for address in addresses:
+        dao.fund(address, 10**12)
+    dao.apply([call(creator, 0, 3 * 24 * 3600, 10, 4200001)])
+    swap_tokens = [dao.create_asset(creator, 10**12) for _ in range(2)]
+    for group in setup(dao, addresses, creator, swap_tokens):
+        dao.apply(group)
+    approved = txns = 0
+    applying = 0.0  # of elapsed, in Dao.apply rather than making up groups
+    start = time.perf_counter()
+    for _ in range(groups):
+        group = random_group(dao, rng, addresses)
+        if isinstance(group, int):
+            dao.now += group
+            continue
+        before = time.perf_counter()
+        approved += dao.apply(group)
+        applying += time.perf_counter() - before
+        txns += len(group)
+    elapsed = time.perf_counter() - start
+    out.write("%d groups, %d txns, %d approved in %.2fs: %.0f txns/s, %.0f txns/s in the model alone\n" % (
+        groups, txns, approved, elapsed, txns / elapsed, txns / applying))
+    return dao
+
+
+class AlgodBackend:
+    """The compiled approval program on a dev mode node (algokit localnet), the reference for differential().
+
+    Accounts are made fresh and funded from the node's KMD default wallet.
+    """
+
+    def __init__(self, algod_address, algod_token, kmd_address, kmd_token, packed=False):
+        from algosdk.kmd import KMDClient
+        from algosdk.v2client.algod import AlgodClient
+        self.algod = AlgodClient(algod_token, algod_address)
+        self.kmd = KMDClient(kmd_token, kmd_address)
+        self.keys = {}
+        self.app_id = 0
+        self.packed = packed
+        self.returned = []  # (group index, record) of each query return log in the last group
+
+    def new_accounts(self, count, algo):
+        from algosdk import account, encoding, transaction
+        wallet = next(w for w in self.kmd.list_wallets() if w["name"] == "unencrypted-default-wallet")
+        handle = self.kmd.init_wallet_handle(wallet["id"], "")
+        funder = max(self.kmd.list_keys(handle), key=lambda a: self.algod.account_info(a)["amount"])
+        funder_key = self.kmd.export_key(handle, "", funder)
+        addresses = []
+        for _ in range(count):
+            key, address = account.generate_account()
+            self.keys[encoding.decode_address(address)] = key
+            addresses.append(encoding.decode_address(address))
+            txn = transaction.PaymentTxn(funder, self.algod.suggested_params(), address, algo)
+            self._send([txn.sign(funder_key)])
+        return addresses
+
+    def now(self):
+        status = self.algod.status()
+        return self.algod.block_info(status["last-round"])["block"].get("ts", 0)
+
+    def advance(self, seconds):
+        self.algod.set_timestamp_offset(seconds)
+        address = next(iter(self.keys))
+        self.apply([pay(address, address, 0)])  # a block with the offset applied
+        self.algod.set_timestamp_offset(0)
+
+    def create_app(self, creator, args):
+        from algosdk import encoding, logic, transaction
+        from pyteal import Mode, compileTeal
+        from degen2_contract import approval, clear, extra_pages, teal_version
+        programs = [
+            base64.b64decode(self.algod.compile(compileTeal(program, mode=Mode.Application, version=teal_version))["result"])
+            for program in (approval(packed=self.packed), clear())
+        ]
+        uints, byte_slices = global_schema(self.packed)
+        txn = transaction.ApplicationCreateTxn(
+            encoding.encode_address(creator), self.algod.suggested_params(), transaction.OnComplete.NoOpOC,
+            programs[0], programs[1],
+            transaction.StateSchema(num_uints=uints, num_byte_slices=byte_slices),
+            transaction.StateSchema(*local_schema()),
+            app_args=[encode_arg(arg) for arg in args], extra_pages=extra_pages,
+        )
+        info = self._send([txn.sign(self.keys[creator])])
+        self.app_id = info["application-index"]
+        return self.app_id, encoding.decode_address(logic.get_application_address(self.app_id))
+
+    def create_asset(self, creator, total):
+        from algosdk import encoding, transaction
+        txn = transaction.AssetCreateTxn(
+            encoding.encode_address(creator), self.algod.suggested_params(), total, 0, False, unit_name="TEST",
+            asset_name="test",
+        )
+        return self._send([txn.sign(self.keys[creator])])["asset-index"]
+
+    def apply(self, group):
+        """(approved, ids of assets created by inner txns)."""
+        from algosdk import encoding, transaction
+        from algosdk.error import AlgodHTTPError
+        params = self.algod.suggested_params()
+        txns = []
+        for t in group:
+            sp = transaction.SuggestedParams(t.fee, params.first, params.last, params.gh, params.gen, flat_fee=True)
+            sender = encoding.encode_address(t.sender)
+            if t.type == "pay":
+                txns.append(transaction.PaymentTxn(sender, sp, encoding.encode_address(t.receiver), t.amount))
+            elif t.type == "axfer":
+                txns.append(transaction.AssetTransferTxn(sender, sp, encoding.encode_address(t.receiver), t.amount, t.asset))
+            else:
+                on_completion = {
+                    "noop": transaction.OnComplete.NoOpOC, "optin": transaction.OnComplete.OptInOC,
+                    "clear": transaction.OnComplete.ClearStateOC,
+                }[t.on_completion]
+                txns.append(transaction.ApplicationCallTxn(
+                    sender, sp, t.app_id, on_completion, app_args=list(t.args),
+                    accounts=[encoding.encode_address(a) for a in t.accounts[1:]], foreign_assets=list(t.assets),
+                    boxes=[(0, name) for name in t.boxes],
+                ))
+        if len(txns) > 1:
+            transaction.assign_group_id(txns)
+        self.returned = []
+        try:
+            info = self._send([txn.sign(self.keys[t.sender]) for txn, t in zip(txns, group)])
+        except AlgodHTTPError:
+            return False, []
+        created = []
+        for index, txid in enumerate(info["txids"]):
+            pending = self.algod.pending_transaction_info(txid)
+            for inner in pending.get("inner-txns", []):
+                if "asset-index" in inner:
+                    created.append(inner["asset-index"])
+            for record in map(base64.b64decode, pending.get("logs", [])):
+                if record[:4] == return_prefix:
+                    self.returned.append((index, record))
+        return True, created
+
+    def _send(self, signed):
+        from algosdk import transaction
+        txid = self.algod.send_transactions(signed)
+        info = transaction.wait_for_confirmation(self.algod, txid, 10)
+        info["txids"] = [s.get_txid() for s in signed]
+        return info
+
+    def snapshot(self, addresses):
+        from algosdk import encoding, logic
+        app = logic.get_application_address(self.app_id)
+
+        def values(state):
+            return {
+                base64.b64decode(kv["key"]): kv["value"]["uint"] if kv["value"]["type"] == 2 else base64.b64decode(kv["value"]["bytes"])
+                for kv in state
+            }
+
+        local = {}
+        for address in addresses:
+            try:
+                info = self.algod.account_application_info(encoding.encode_address(address), self.app_id)
+            except Exception:
+                continue
+            if "app-local-state" in info:
+                local[address] = values(info["app-local-state"].get("key-value", []))
+        params = self.algod.application_info(self.app_id)["params"]
+        boxes = {}
+        for box in self.algod.application_boxes(self.app_id)["boxes"]:
+            name = base64.b64decode(box["name"])
+            boxes[name] = base64.b64decode(self.algod.application_box_by_name(self.app_id, name)["value"])
+        account = self.algod.account_info(app)
+        return {
+            "global": values(params.get("global-state", [])),
+            "local": local,
+            "boxes": boxes,
+            "algo": account["amount"],
+            "holdings": {holding["asset-id"]: holding["amount"] for holding in account.get("assets", [])},
+        }
+
+
+def differential(chain, steps, seed=0, users=8, out=sys.stdout):
+    """Run the same random groups through the model and chain, a backend like AlgodBackend.
+
+    Returns the first step where approval or state differ as (step, group, model snapshot, chain snapshot), or None.
+    """
+    rng = random.Random(seed)
+    addresses = chain.new_accounts(users, 10**11)
+    creator = addresses[0]
+    swap_tokens = [chain.create_asset(creator, 10**12) for _ in range(2)]
+    args = (3 * 24 * 3600, 10, 1000)  # a low threshold, so random votes pass proposals and every execute branch runs
+    app_id, app_address = chain.create_app(creator, args)
+    dao = Dao(app_id, app_address, creator, now=chain.now(), packed=chain.packed)
+    for address in addresses:
+        dao.fund(address, 10**11)
+    for token in swap_tokens:
+        dao.create_asset(creator, 10**12, asset_id=token)
+    dao.apply([call(creator, 0, *args)])
+    for group in setup(dao, addresses, creator, swap_tokens):
+        approved, created = chain.apply(group)
+        dao.apply(group, created)
+
+    def groups():
+        for _ in range(steps):
+            yield random_group(dao, rng, addresses)
+        yield from pay_tokens_cycle(dao, user, receiver, amount)
+
+    # then one pay_tokens proposal that passes for sure, random votes rarely get one through to a matching execute
+    user, receiver, amount = addresses[1], addresses[2], 5
+    paid = None
+    for step, group in enumerate(groups()):
+        if step == steps:
+            paid = dao._holding(receiver, dao.globals.degen2)
+        if isinstance(group, int):
+            chain.advance(group)
+            continue
+        dao.now = chain.now()
+        approved, created = chain.apply(group)
+        model_approved = dao.apply(group, created)
+        model, actual = dao.snapshot(addresses), chain.snapshot(addresses)
+        if model_approved != approved or model != actual or dao.returned != chain.returned:
+            out.write("step %d: model %s (%s), chain %s\n" % (step, model_approved, dao.error, approved))
+            if dao.returned != chain.returned:
+                out.write("  returned: model %r, chain %r\n" % (dao.returned, chain.returned))
+            return step, group, model, actual
+    if dao._holding(receiver, dao.globals.degen2) != paid + amount:
+        out.write("step %d: pay_tokens execute didn't pay (%s)\n" % (step, dao.error))
+        return step, group, model, actual
+    out.write("%d steps, model and chain agree\n" % steps)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="simulate the degen2 DAO in pure Python")
+    parser.add_argument("--bench", type=int, metavar="GROUPS", help="run random groups against the model and report throughput")
+    parser.add_argument("--differential", type=int, metavar="STEPS", help="check the model against a dev mode node")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--packed", action="store_true", help="differential against approval(packed=True)")
+    parser.add_argument("--algod", default="http://localhost:4001")
+    parser.add_argument("--algod-token", default="a" * 64)
+    parser.add_argument("--kmd", default="http://localhost:4002")
+    parser.add_argument("--kmd-token", default="a" * 64)
+    args = parser.parse_args(argv)
+
+    if args.differential:
+        chain = AlgodBackend(args.algod, args.algod_token, args.kmd, args.kmd_token, args.packed)
+        return 1 if differential(chain, args.differential, args.seed) else 0
+    bench(args.bench or 100000, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Monte Carlo for tuning the governance parameters: how often proposals pass at a given threshold, duration and
+cooldown, and how long moving a parameter takes under the 33% change limits.
+
+A population of stakers is drawn once (stake from a Pareto or lognormal, scaled so --staked of the supply is staked).
+Every simulated proposal draws its support from a beta and how much attention it gets from a lognormal, then every
+staker turns out with the chance it checks in during the vote (--attention is the mean time between looks, so a
+longer duration means more turnout) and votes up with that support. Proposals are computed --batch at a time as
+(proposals x stakers) arrays, one uniform draw per cell and one matrix product per batch for the tallies, no Python
+loop over proposals.
+
+Each batch is checked against the contract's rules:
+    did_proposal_pass   upvotes > dnvotes and upvotes + dnvotes > threshold, for every threshold on the grid
+    pay_algo            upvotes >= 280000046 (2/3 of the supply) on top, for payouts over 10% of the treasury
+    execute             someone has to execute within the cooldown, executors show up every --executor-delay
+The pass rates then drive the time-to-change paths: change_threshold / change_proposal_fee / change_price can only
+move a parameter strictly between 2/3 and 4/3 of its current value (and the hard bounds), so a big change is several
+proposals in a row, each retried until it passes and is executed.
+
+usage:
+    python degen2_sim.py                                    # 1M proposals, threshold curve and time to change
+    python degen2_sim.py --voters 5000 --staked 0.3 --attention 48 --duration 72 --cooldown 24
+    python degen2_sim.py --change proposal_fee --start 10 --targets 100 1000 10000
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from degen2_model import degen2_total
+
+hour = 3600
+supermajority = 280000046  # pay_algo over 10% of the treasury, 2/3 of the supply
+# (min, max) exclusive bounds of each parameter a proposal can move by less than 33% a step, None for no max
+change_bounds = {
+    "threshold": (4200000, 315000069),  # ~1% to 75% of the supply
+    "proposal_fee": (9, 20000000),
+    "price": (9, None),
+}
+
+
+def stakes(voters, staked, distribution="pareto", shape=1.5, rng=None):
+    """Stake per staker, summing to staked of the supply."""
+    rng = rng or np.random.default_rng()
+    if distribution == "pareto":
+        raw = rng.pareto(shape, voters) + 1
+    elif distribution == "lognormal":
+        raw = rng.lognormal(0, shape, voters)
+    else:
+        raw = np.ones(voters)
+    return np.floor(raw / raw.sum() * staked * degen2_total)
+
+
+def look_rates(attention, voters, spread=1.0, rng=None):
+    """Looks per second of each staker: one every attention seconds on average, a per staker gamma around that."""
+    rng = rng or np.random.default_rng()
+    mean_gap = attention * rng.gamma(1 / spread, spread, voters) if spread else np.full(voters, float(attention))
+    return 1 / mean_gap
+
+
+class Curves:
+    """Counts over every simulated proposal, per threshold on grid."""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.proposals = 0
+        self.majority = 0
+        self.quorum = np.zeros(len(grid), dtype=np.int64)  # upvotes + dnvotes > threshold
+        self.passed = np.zeros(len(grid), dtype=np.int64)  # did_proposal_pass
+        self.supermajority = np.zeros(len(grid), dtype=np.int64)  # passed with upvotes >= supermajority
+        self.turnout = 0.0
+
+    def add(self, up, down):
+        total = up + down
+        majority = up > down
+        over = total[:, None] > self.grid[None, :]
+        self.proposals += len(up)
+        self.majority += int(majority.sum())
+        self.quorum += over.sum(0)
+        self.passed += (over & majority[:, None]).sum(0)
+        self.supermajority += (over & (majority & (up >= supermajority))[:, None]).sum(0)
+        self.turnout += float(total.sum())
+
+    def pass_rate(self, threshold):
+        """Pass rate at any threshold, interpolated between grid points."""
+        return float(np.interp(threshold, self.grid, self.passed / self.proposals))
+
+
+def simulate(proposals, stake, rates, duration, interest_spread, support_mean, support_strength, grid, batch, rng):
+    """Curves over proposals proposals against stakers with stake, looking in at rates during a duration long vote.
+
+    A staker votes if it looks in before the end, exp(-duration * interest * rate) is the chance it doesn't. With u one
+    uniform per staker and proposal, u < chance is a vote and u < chance * support an up vote, u / chance is uniform
+    again once it voted.
+    """
+    curves = Curves(grid)
+    a, b = support_mean * support_strength, (1 - support_mean) * support_strength
+    exposure = (-duration * rates).astype(np.float32)
+    for start in range(0, proposals, batch):
+        n = min(batch, proposals - start)
+        support = rng.beta(a, b, n).astype(np.float32)
+        interest = rng.lognormal(-interest_spread**2 / 2, interest_spread, n).astype(np.float32)  # mean 1
+        chance = -np.expm1(interest[:, None] * exposure[None, :])
+        u = rng.random((n, len(stake)), dtype=np.float32)
+        total = (u < chance) @ stake
+        up = (u < chance * support[:, None]) @ stake
+        curves.add(up, total - up)
+    return curves
+
+
+def change_steps(start, target, bounds):
+    """Values a parameter goes through from start to target, each the furthest the 33% limit allows."""
+    low, high = bounds
+    steps, value = [], start
+    while value != target:
+        if target > value:
+            step = min(target, 4 * value // 3 - 1)
+            if high is not None:
+                step = min(step, high - 1)
+        else:
+            step = max(target, 2 * value // 3 + 1)
+            step = max(step, low + 1)
+        if step == value:
+            return None  # stuck against a bound
+        steps.append(step)
+        value = step
+    return steps
+
+
+def time_to_change(steps, pass_rate, executed, duration, paths, rng):
+    """Seconds each of paths takes to pass and execute every step, inf where a step can't pass.
+
+    pass_rate is the chance a proposal passes, one per step (the threshold in force may be the one being changed).
+    Failed attempts are proposed again right after the vote, a passed one still has to be executed in time.
+    """
+    elapsed = np.zeros(paths)
+    for rate in pass_rate:
+        p = rate * executed
+        if p <= 0:
+            return np.full(paths, np.inf)
+        elapsed += rng.geometric(p, paths) * duration
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo pass rates and parameter change times for degen2 governance")
+    parser.add_argument("--proposals", type=int, default=1000000)
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--staked", type=float, default=0.4, help="share of the supply staked")
+    parser.add_argument("--distribution", choices=("pareto", "lognormal", "equal"), default="pareto")
+    parser.add_argument("--shape", type=float, default=1.5, help="pareto alpha or lognormal sigma")
+    parser.add_argument("--duration", type=float, default=72, help="vote length, hours")
+    parser.add_argument("--cooldown", type=float, default=24, help="execute window after the vote, hours")
+    parser.add_argument("--attention", type=float, default=72, help="mean hours between a staker's looks")
+    parser.add_argument("--attention-spread", type=float, default=1.0, help="gamma spread of attention across stakers, 0 for none")
+    parser.add_argument("--interest-spread", type=float, default=0.75, help="lognormal sigma of how much attention a proposal gets")
+    parser.add_argument("--executor-delay", type=float, default=6, help="mean hours until someone executes a passed proposal")
+    parser.add_argument("--support", type=float, default=0.6, help="mean share of voters for a proposal")
+    parser.add_argument("--support-strength", type=float, default=4, help="beta concentration of support, higher is less varied")
+    parser.add_argument("--grid", type=int, default=16, help="thresholds to report, spread over the allowed range")
+    parser.add_argument("--batch", type=int, default=0, help="proposals per batch, by default about 4M cells")
+    parser.add_argument("--change", choices=sorted(change_bounds), default="threshold")
+    parser.add_argument("--start", type=int, default=4200001, help="current value of the changed parameter")
+    parser.add_argument("--targets", type=int, nargs="*", help="values to change it to")
+    parser.add_argument("--threshold", type=int, default=4200001, help="threshold in force when changing something else")
+    parser.add_argument("--paths", type=int, default=100000, help="simulated change histories per target")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    stake = stakes(args.voters, args.staked, args.distribution, args.shape, rng)
+    rates = look_rates(args.attention * hour, args.voters, args.attention_spread, rng)
+    low, high = change_bounds["threshold"]
+    grid = np.unique(np.geomspace(low + 1, high - 1, args.grid).astype(np.int64))
+    batch = args.batch or max(1, 4000000 // args.voters)
+
+    start = time.perf_counter()
+    curves = simulate(
+        args.proposals, stake, rates, args.duration * hour, args.interest_spread, args.support, args.support_strength,
+        grid, batch, rng,
+    )
+    elapsed = time.perf_counter() - start
+    executed = 1 - math.exp(-args.cooldown / args.executor_delay)
+    out = sys.stdout
+    out.write("%d proposals x %d stakers in %.2fs (%.0f proposals/s), %.1f%% of the supply staked, mean turnout %.1f%% of it\n" % (
+        curves.proposals, args.voters, elapsed, curves.proposals / elapsed, 100 * stake.sum() / degen2_total,
+        100 * curves.turnout / curves.proposals / stake.sum()))
+    out.write("majority (up > down) in %.1f%% of proposals, %.1f%% executed within the cooldown\n\n" % (
+        100 * curves.majority / curves.proposals, 100 * executed))
+    out.write("%11s %9s %8s %8s %10s %15s\n" % ("threshold", "% supply", "quorum%", "pass%", "executed%", "supermajority%"))
+    for i, threshold in enumerate(grid):
+        out.write("%11d %9.2f %8.2f %8.2f %10.2f %15.3f\n" % (
+            threshold, 100 * threshold / degen2_total, 100 * curves.quorum[i] / curves.proposals,
+            100 * curves.passed[i] / curves.proposals, 100 * executed * curves.passed[i] / curves.proposals,
+            100 * curves.supermajority[i] / curves.proposals))
+
+    targets = args.targets or ([args.start * 2, args.start * 5, args.start * 10, args.start * 30]
+                               if args.change == "threshold" else [args.start * 2, args.start * 10])
+    out.write("\ntime to change %s from %d, %d paths each, a %g hour vote per attempt\n" % (
+        args.change, args.start, args.paths, args.duration))
+    out.write("%11s %6s %10s %10s %10s\n" % ("target", "steps", "mean days", "p50 days", "p90 days"))
+    for target in targets:
+        steps = change_steps(args.start, target, change_bounds[args.change])
+        if steps is None:
+            out.write("%11d %6s %10s\n" % (target, "-", "out of bounds"))
+            continue
+        # a threshold change is voted on under the threshold it replaces
+        in_force = [args.start] + steps[:-1] if args.change == "threshold" else [args.threshold] * len(steps)
+        days = time_to_change(steps, [curves.pass_rate(t) for t in in_force], executed, args.duration * hour, args.paths, rng) / (24 * hour)
+        if np.isinf(days).any():
+            out.write("%11d %6d %10s\n" % (target, len(steps), "never"))
+            continue
+        out.write("%11d %6d %10.1f %10.1f %10.1f\n" % (
+            target, len(steps), days.mean(), np.percentile(days, 50), np.percentile(days, 90)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
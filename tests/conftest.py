@@ -0,0 +1,131 @@
+"""
+A DAO for the tests on degen2_interpreter's Ledger, the compiled approval program, with degen2_model's Dao run next to
+it: every group goes through both and has to get the same answer and leave the same state, so a test checks the
+contract and the model at once.
+"""
+
+import pytest
+
+from degen2_contract import decode_return, max_open_proposals, methods, proposal_types
+from degen2_interpreter import TealBackend
+from degen2_model import Dao, axfer, call, pay, proposal_box, setup, vote_boxes
+
+duration = 3 * 24 * 3600
+proposal_fee = 10
+threshold = 1000
+
+
+class Chain:
+    """users[0] created the app, minted degen2 and holds the swap tokens, every user is opted in to the app, degen2
+    and the swap tokens."""
+
+    def __init__(self, packed=False, users=4):
+        self.backend = TealBackend(packed=packed)
+        self.users = self.backend.new_accounts(users, 10**11)
+        self.creator = self.users[0]
+        self.swap_tokens = [self.backend.create_asset(self.creator, 10**12) for _ in range(2)]
+        args = (duration, proposal_fee, threshold)
+        self.app_id, self.app = self.backend.create_app(self.creator, args)
+        self.dao = Dao(self.app_id, self.app, self.creator, now=self.backend.now(), packed=packed)
+        for address in self.users:
+            self.dao.fund(address, 10**11)
+        for token in self.swap_tokens:
+            self.dao.create_asset(self.creator, 10**12, asset_id=token)
+        self.dao.apply([call(self.creator, 0, *args)])
+        for group in setup(self.dao, self.users, self.creator, self.swap_tokens):
+            assert self.apply(group), self.dao.error
+        self.degen2 = self.dao.globals.degen2
+
+    def apply(self, group):
+        """Whether both approved group, after checking they agree on that and on the state it leaves."""
+        self.dao.now = self.backend.now()
+        approved, created = self.backend.apply(group)
+        assert self.dao.apply(group, created) == approved, self.dao.error
+        assert self.dao.snapshot(self.users) == self.backend.snapshot(self.users)
+        assert self.dao.returned == self.backend.returned
+        return approved
+
+    def query(self, sender, name, *args, **fields):
+        """{field: value} a query call returns, None if it was rejected."""
+        if not self.apply([self.call(sender, methods[name], *args, **fields)]):
+            return None
+        (_, record), = self.backend.returned
+        return decode_return(name, record)
+
+    def advance(self, seconds):
+        self.backend.advance(seconds)
+
+    def algo(self, address):
+        return self.backend.ledger.algo[address]
+
+    def holding(self, address, asset=None):
+        return self.backend.ledger.holdings[address].get(asset or self.degen2, 0)
+
+    def local(self, address):
+        return self.dao.accounts[address].local
+
+    def call(self, sender, *args, **fields):
+        return call(sender, self.app_id, *args, **fields)
+
+    def buy(self, user, amount):
+        return self.apply([pay(user, self.app, amount * self.dao.globals.price),
+                           self.call(user, methods["buy"], assets=[self.degen2], fee=2000)])
+
+    def stake(self, user, amount):
+        """Buy amount degen2 and stake it."""
+        assert self.buy(user, amount), self.dao.error
+        return self.apply([axfer(user, self.app, self.degen2, amount), self.call(user, methods["local_stake"], fee=2000)])
+
+    def propose(self, user, kind, value=0, index=0, payload=None, receiver=None, asset=None):
+        """The new proposal's id, None if it was rejected. user pays the fee with degen2 bought for it."""
+        g = self.dao.globals
+        proposal_id = g.next_proposal
+        assert self.buy(user, g.proposal_fee), self.dao.error
+        args = [b"proposal", proposal_types.get(kind, kind), value, index] + ([payload] if payload is not None else [])
+        approved = self.apply([
+            self.call(user, methods["propose"], *args, accounts=[receiver or user], assets=[asset or self.degen2],
+                      boxes=[proposal_box(proposal_id), proposal_box(proposal_id - max_open_proposals)]),
+            pay(user, self.app, 2000000),
+            axfer(user, self.app, self.degen2, g.proposal_fee),
+        ])
+        return proposal_id if approved else None
+
+    def vote(self, user, proposal_id, up=True):
+        return self.apply([self.call(user, methods["up_px" if up else "dn_px"], proposal_id,
+                                     boxes=vote_boxes(self.dao, user, proposal_id))])
+
+    def end_vote(self):
+        self.advance(self.dao.globals.duration + 1)
+
+    def execute(self, user, proposal_id, *args, receiver=None, asset=None, boxes=()):
+        """execute with args after the proposal id, pad calls give it the budget of the longest branches."""
+        return self.apply([
+            self.call(user, methods["execute"], proposal_id, *args, accounts=[receiver or user],
+                      assets=[asset or self.degen2], boxes=[proposal_box(proposal_id)] + list(boxes), fee=4000),
+        ] + [self.call(user, methods["pad"], i) for i in range(3)])
+
+    def passed(self, proposer, kind, *args, voter=None, **fields):
+        """Propose, vote it through with voter's stake (proposer's if None) and end the vote, returns the id."""
+        proposal_id = self.propose(proposer, kind, *args, **fields)
+        assert proposal_id is not None, self.dao.error
+        assert self.vote(voter or proposer, proposal_id), self.dao.error
+        self.end_vote()
+        return proposal_id
+
+    def fund_rewards(self, sender, amount):
+        return self.apply([pay(sender, self.app, amount), self.call(sender, methods["fund_rewards"])])
+
+    def withdraw(self, user, amount):
+        return self.apply([pay(user, self.app, 1000000),
+                           self.call(user, methods["withdraw"], amount, assets=[self.degen2], fee=3000)])
+
+
+@pytest.fixture
+def chain():
+    return Chain()
+
+
+@pytest.fixture(params=[False, True], ids=["unpacked", "packed"])
+def layouts(request):
+    """A Chain of approval(packed=False) and of approval(packed=True)."""
+    return Chain(packed=request.param)
@@ -0,0 +1,79 @@
+"""
+Merkle airdrops: an airdrop proposal executed, claims against its root, close_airdrop once the window is over.
+"""
+
+import pytest
+
+from degen2_contract import airdrop_chunk, airdrop_window, methods
+from degen2_model import airdrop_box, airdrop_boxes, airdrop_proof, airdrop_tree
+
+
+@pytest.fixture
+def airdrop(chain):
+    """(airdrop id, allocations, tree) of an executed airdrop of 600 degen2 over users[1:4], users[1] staked."""
+    proposer = chain.users[1]
+    assert chain.stake(proposer, 2000)
+    allocations = {index: (user, 100 * (index + 1)) for index, user in enumerate(chain.users[1:4])}
+    tree = airdrop_tree(allocations, len(allocations))
+    airdrop_id = chain.passed(proposer, "airdrop", 600, len(allocations), tree[-1][0])
+    assert chain.execute(proposer, airdrop_id, boxes=[airdrop_box(airdrop_id)]), chain.dao.error
+    return airdrop_id, allocations, tree
+
+
+def claim(chain, user, airdrop_id, index, amount, proof):
+    boxes = [airdrop_box(airdrop_id), airdrop_box(airdrop_id, index // airdrop_chunk)]
+    return chain.apply([
+        chain.call(user, methods["claim"], airdrop_id, index, amount, proof, assets=[chain.degen2], boxes=boxes, fee=2000),
+    ] + [chain.call(user, methods["pad"], i) for i in range(2)])
+
+
+def close(chain, user, airdrop_id, count):
+    boxes = airdrop_boxes(airdrop_id, count)
+    return chain.apply([chain.call(user, methods["close_airdrop"], airdrop_id, boxes=boxes[:8])] + [
+        chain.call(user, methods["pad"], boxes=boxes[i:i + 8]) for i in range(8, len(boxes), 8)])
+
+
+def test_claim(chain, airdrop):
+    airdrop_id, allocations, tree = airdrop
+    user, amount = allocations[1]
+    before = chain.holding(user)
+    assert claim(chain, user, airdrop_id, 1, amount, airdrop_proof(tree, 1)), chain.dao.error
+    assert chain.holding(user) - before == amount
+    assert chain.dao.airdrops[airdrop_id].remaining == 600 - amount
+
+
+def test_claim_twice(chain, airdrop):
+    airdrop_id, allocations, tree = airdrop
+    user, amount = allocations[0]
+    assert claim(chain, user, airdrop_id, 0, amount, airdrop_proof(tree, 0)), chain.dao.error
+    assert not claim(chain, user, airdrop_id, 0, amount, airdrop_proof(tree, 0))
+
+
+def test_bad_proof(chain, airdrop):
+    airdrop_id, allocations, tree = airdrop
+    user, amount = allocations[2]
+    proof = airdrop_proof(tree, 2)
+    assert not claim(chain, user, airdrop_id, 2, amount, bytes([proof[0] ^ 1]) + proof[1:])
+    assert not claim(chain, user, airdrop_id, 2, amount, proof[:-32])
+    assert not claim(chain, user, airdrop_id, 2, amount + 1, proof)
+    assert not claim(chain, allocations[0][0], airdrop_id, 2, amount, proof)  # someone else's leaf
+    assert claim(chain, user, airdrop_id, 2, amount, proof), chain.dao.error
+
+
+def test_close(chain, airdrop):
+    airdrop_id, allocations, tree = airdrop
+    user, amount = allocations[0]
+    reserved = chain.dao.globals.reserved
+    assert claim(chain, user, airdrop_id, 0, amount, airdrop_proof(tree, 0)), chain.dao.error
+    assert not close(chain, user, airdrop_id, len(allocations))  # the window is still open
+
+    chain.advance(airdrop_window + 1)
+    treasury = chain.holding(chain.app)
+    late, late_amount = allocations[1]
+    assert not claim(chain, late, airdrop_id, 1, late_amount, airdrop_proof(tree, 1))
+    assert close(chain, user, airdrop_id, len(allocations)), chain.dao.error
+    # the 500 nobody claimed is the treasury's again: still held, no longer reserved
+    assert chain.holding(chain.app) == treasury
+    assert chain.dao.globals.reserved == reserved - 600
+    assert airdrop_id not in chain.dao.airdrops
+    assert not close(chain, user, airdrop_id, len(allocations))
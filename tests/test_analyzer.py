@@ -0,0 +1,16 @@
+"""
+degen2_analyzer's budget check on the compiled program.
+"""
+
+import io
+
+from degen2_analyzer import compile_program, report
+from degen2_contract import approval, clear
+
+
+def test_cut_off_path_fails():
+    """A loop bound too low for any way through a path is a failure, not a cost of 0."""
+    out = io.StringIO()
+    failures = report(compile_program(approval()), compile_program(clear()), loops=0, out=out)
+    assert any("unbounded" in failure for failure in failures)
+    assert "UNBOUNDED" in out.getvalue()
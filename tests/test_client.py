@@ -0,0 +1,185 @@
+"""
+degen2_client's group builders against degen2_mock_algod: every layout the contract takes goes through, the layouts
+it asserts against come back as a 400, and so do app calls over algod's reference limits.
+
+usage:
+    python -m pytest -q tests
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from algosdk import account, encoding
+
+from degen2_client import Algod, AlgodError, Client, max_references, sign, sign_many
+from degen2_contract import methods
+from degen2_mock_algod import MockAlgod
+from degen2_model import itob, local_keys
+
+duration = 3 * 24 * 3600
+
+
+@pytest.fixture(scope="module")
+def dao():
+    """(server, client, keys) of a DAO on a fresh mock, every account opted in to the app and degen2 with stake."""
+    server = MockAlgod()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    algod = Algod(server.url, connections=8)
+    keys = {}
+    for _ in range(4):
+        key, address = account.generate_account()
+        keys[address] = key
+        server.fund(address, 10**13)
+    creator = next(iter(keys))
+    swap_token = server.ledger.create_asset(encoding.decode_address(creator), 10**9)
+    client = Client.create(algod, creator, keys[creator], duration, 10, 1000, swap_token)
+    for address in keys:
+        client.submit_wait(client.opt_in(address), keys)
+        client.submit_wait(client.opt_in_degen2(address), keys)
+        client.submit_wait(client.buy([(address, 10**9)]), keys)
+        client.submit_wait(client.local_stake(address, 1000), keys)
+    yield server, client, keys
+    server.shutdown()
+
+
+def rejected(client, group, keys):
+    with pytest.raises(AlgodError) as error:
+        client.submit_wait(group, keys)
+    assert error.value.status == 400
+    return error.value.message
+
+
+def references(txn):
+    return sum(len(refs or ()) for refs in (txn.accounts, txn.foreign_assets, txn.foreign_apps, txn.boxes))
+
+
+def test_propose(dao):
+    server, client, keys = dao
+    proposer, receiver = list(keys)[:2]
+    proposal_id = client.state()[b"pn"]
+    group = client.propose(proposer, b"text", "tx", 0, 0, receiver)
+    assert len(group) == 3
+    assert client.submit_wait(group, keys)["confirmed-round"]
+    assert client.state()[b"pn"] == proposal_id + 1
+
+
+def test_withdraw(dao):
+    server, client, keys = dao
+    assert client.submit_wait(client.withdraw(list(keys)[3], 100), keys)["confirmed-round"]
+
+
+def test_token_opt_in(dao):
+    server, client, keys = dao
+    creator = next(iter(keys))
+    token = server.ledger.create_asset(encoding.decode_address(creator), 10**6)
+    assert client.submit_wait(client.token_opt_in(creator, token), keys)["confirmed-round"]
+
+
+def test_local_stake(dao):
+    server, client, keys = dao
+    address = list(keys)[2]
+    stake = client.algod.local_state(address, client.app_id)[local_keys["stake"]]
+    assert client.submit_wait(client.local_stake(address, 10), keys)["confirmed-round"]
+    assert client.algod.local_state(address, client.app_id)[local_keys["stake"]] == stake + 10
+
+
+def test_payment_after_the_call(dao):
+    server, client, keys = dao
+    payment, call = client.withdraw(list(keys)[1], 0)
+    assert rejected(client, client.group([call, payment]), keys)
+    payment, call = client.token_opt_in(list(keys)[1], client.degen2())
+    assert rejected(client, client.group([call, payment]), keys)
+
+
+def test_missing_payment(dao):
+    server, client, keys = dao
+    address = list(keys)[1]
+    assert rejected(client, client.group(client.withdraw(address, 0)[1:]), keys)
+    call, payment, fee = client.propose(address, b"text", "tx", 0, 0, address)
+    assert rejected(client, client.group([call, fee]), keys)
+
+
+def test_stake_without_deposit(dao):
+    server, client, keys = dao
+    address = list(keys)[1]
+    deposit, call = client.local_stake(address, 10)
+    assert rejected(client, client.group([client.pay(address, client.app_address, 10), call]), keys)
+    assert rejected(client, client.group([call, deposit]), keys)
+
+
+def test_reference_limits(dao):
+    server, client, keys = dao
+    address, pad = list(keys)[1], methods["pad"]
+    boxes = [(0, b"p" + itob(i)) for i in range(max_references + 1)]
+    apps = [client.app_id + 1 + i for i in range(max_references - 1)]
+    assert "MaxAppTotalTxnReferences" in rejected(client, [client.call(address, pad, boxes=boxes)], keys)
+    assert "MaxAppTotalTxnReferences" in rejected(client, [client.call(address, pad, apps=apps, boxes=boxes[:2])], keys)
+    assert "max number of accounts" in rejected(client, [client.call(address, pad, accounts=list(keys) * 2)], keys)
+    assert "max number of arguments" in rejected(client, [client.call(address, pad, *range(17))], keys)
+    assert client.submit_wait([client.call(address, pad, boxes=boxes[:max_references])], keys)["confirmed-round"]
+
+
+def holdings(server, address):
+    return {asset["asset-id"]: asset["amount"] for asset in server.account(address)["assets"]}
+
+
+def test_execute_pay_tokens(dao):
+    """A pay_tokens list over more assets than one call can reference, voted through and executed with fit=True."""
+    server, client, keys = dao
+    creator, executor = list(keys)[:2]
+    tokens = [server.ledger.create_asset(encoding.decode_address(creator), 10**6) for _ in range(7)]
+    for token in tokens:
+        client.submit_wait(client.token_opt_in(creator, token), keys)
+        client.submit_wait([client.axfer(creator, client.app_address, token, 1000)], keys)
+    payouts = [(token, 10 + i) for i, token in enumerate(tokens)] + [(client.degen2(), 5)]
+    proposal_id = client.state()[b"pn"]
+    client.submit_wait(client.propose(creator, b"payouts", "pay_tokens", 0, 0, creator, payouts=payouts), keys)
+    for address in keys:
+        client.submit_wait(client.vote(address, proposal_id), keys)
+    server.ledger.now += duration + 1
+
+    before = holdings(server, creator)
+    group = client.execute(executor, proposal_id, creator, payouts=payouts)
+    assert len(group) > 1 and all(references(txn) <= max_references for txn in group)
+    assert client.submit_wait(group, keys)["confirmed-round"]
+    after = holdings(server, creator)
+    assert {asset: after[asset] - before[asset] for asset, _ in payouts} == dict(payouts)
+
+
+def test_execute_references(dao):
+    server, client, keys = dao
+    receiver = list(keys)[1]
+    swaps = [(client.degen2() + 100 + i, 1, 0) for i in range(14)]
+    assert all(references(txn) <= max_references for txn in client.execute(receiver, 1, receiver, swaps=swaps, fit=False))
+
+
+def test_sign_many(dao):
+    server, client, keys = dao
+    groups = [client.withdraw(address, 0) for address in keys]
+    inline = sign_many(groups, keys)
+    with ThreadPoolExecutor(4) as executor:
+        pooled = sign_many(groups, keys, executor)
+    assert inline == pooled == [sign(group, keys) for group in groups]
+
+
+def test_submit_many(dao):
+    server, client, keys = dao
+    groups = [client.buy([(address, 10**6 + i)]) for address in keys for i in range(8)]
+    groups.append(client.group(client.withdraw(next(iter(keys)), 0)[1:]))  # no payment, the only one rejected
+    results = asyncio.run(client.submit_many(sign_many(groups, keys), concurrency=8))
+    assert len(results) == len(groups)
+    assert all(isinstance(result, str) for result in results[:-1])
+    assert isinstance(results[-1], AlgodError)
+
+
+def test_connection_dropped_after_an_error(dao):
+    server, client, keys = dao
+    algod = Algod(server.url, connections=1)
+    algod.params()
+    assert algod.pool.queue[0] is not None  # kept alive
+    with pytest.raises(AlgodError):
+        algod.request("GET", "/v2/nothing")
+    assert algod.pool.queue == [None]
+    assert algod.params()
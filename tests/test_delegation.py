@@ -0,0 +1,74 @@
+"""
+Delegation: a delegate votes with the stake delegated to it, a delegator's own vote overrides it, delegated stake
+can't move while the delegate's votes are open.
+"""
+
+import pytest
+
+from degen2_contract import methods
+from degen2_model import delegate_box, pay, zero_address
+
+
+def delegate(chain, user, target):
+    """user delegates to target, or takes its stake back with target == user."""
+    current = chain.local(user).delegate
+    boxes = [delegate_box(target)] + ([delegate_box(current)] if current != zero_address else [])
+    return chain.apply([pay(user, chain.app, 1000000), chain.call(user, methods["delegate"], accounts=[target], boxes=boxes)])
+
+
+@pytest.fixture
+def delegated(chain):
+    """(delegate, delegator, open proposal id): 700 staked by the delegate and 500 delegated to it."""
+    voter, delegator = chain.users[1:3]
+    assert chain.stake(voter, 700)
+    assert chain.stake(delegator, 500)
+    assert delegate(chain, delegator, voter), chain.dao.error
+    assert chain.dao.delegates[voter].delegated == 500
+    proposal_id = chain.propose(voter, "tx", receiver=chain.creator)
+    assert proposal_id is not None, chain.dao.error
+    return voter, delegator, proposal_id
+
+
+def tally(chain, proposal_id):
+    p = chain.dao.proposals[proposal_id]
+    return p.upvotes, p.dnvotes
+
+
+def test_delegated_vote(chain, delegated):
+    voter, delegator, proposal_id = delegated
+    assert chain.vote(voter, proposal_id), chain.dao.error
+    assert tally(chain, proposal_id) == (1200, 0)
+
+
+@pytest.mark.parametrize("up", [True, False])
+def test_override_after_the_delegate(chain, delegated, up):
+    voter, delegator, proposal_id = delegated
+    assert chain.vote(voter, proposal_id), chain.dao.error
+    assert chain.vote(delegator, proposal_id, up), chain.dao.error
+    assert tally(chain, proposal_id) == ((1200, 0) if up else (700, 500))
+    assert not chain.vote(delegator, proposal_id, up)
+
+
+@pytest.mark.parametrize("up", [True, False])
+def test_override_before_the_delegate(chain, delegated, up):
+    voter, delegator, proposal_id = delegated
+    assert chain.vote(delegator, proposal_id, up), chain.dao.error
+    assert chain.vote(voter, proposal_id), chain.dao.error
+    assert tally(chain, proposal_id) == ((1200, 0) if up else (700, 500))
+
+
+def test_undelegate_while_voting(chain, delegated):
+    voter, delegator, proposal_id = delegated
+    assert chain.vote(voter, proposal_id), chain.dao.error
+    assert not delegate(chain, delegator, delegator)  # the delegate counted on it until the vote is over
+    chain.end_vote()
+    assert delegate(chain, delegator, delegator), chain.dao.error
+    assert chain.dao.delegates[voter].delegated == 0
+    assert chain.local(delegator).delegate == zero_address
+
+
+def test_undelegate_before_voting(chain, delegated):
+    voter, delegator, proposal_id = delegated
+    assert delegate(chain, delegator, delegator), chain.dao.error
+    assert chain.vote(voter, proposal_id), chain.dao.error
+    assert tally(chain, proposal_id) == (700, 0)
@@ -0,0 +1,69 @@
+"""
+degen2_factory through degen2_client's Factory against degen2_mock_algod: the registry records the programs each DAO
+was created from, and an instance's deployer opts its DAO in to tokens through the factory.
+"""
+
+import threading
+
+import pytest
+from algosdk import account, encoding, logic
+
+from degen2_build import programs as built
+from degen2_client import Algod, AlgodError, Factory
+from degen2_factory import programs_hash
+from degen2_mock_algod import MockAlgod
+
+duration = 3 * 24 * 3600
+
+
+@pytest.fixture(scope="module")
+def factory():
+    """(server, factory, keys, swap token) of a factory on a fresh mock with one DAO deployed by the second key."""
+    server = MockAlgod()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    algod = Algod(server.url)
+    keys = {}
+    for _ in range(3):
+        key, address = account.generate_account()
+        keys[address] = key
+        server.fund(address, 10**13)
+    creator, deployer = list(keys)[:2]
+    swap_token = server.ledger.create_asset(encoding.decode_address(creator), 10**9)
+    factory = Factory.create(algod, creator, keys[creator])
+    factory.submit_wait(factory.deploy(deployer, duration, 10, 1000, swap_token), keys)
+    yield server, factory, keys, swap_token
+    server.shutdown()
+
+
+def holdings(server, address):
+    return {asset["asset-id"]: asset["amount"] for asset in server.account(address)["assets"]}
+
+
+def test_instance_programs(factory):
+    server, factory, keys, swap_token = factory
+    (app, deployer, created, programs), = factory.instances()
+    assert deployer == list(keys)[1]
+    approval, clear = (factory.algod.compile(teal) for teal in built())
+    assert programs == programs_hash(approval, clear)
+
+    # the creator uploading other programs doesn't change what the registry says this DAO runs
+    factory.submit_wait(factory.upload(list(keys)[0], approval, approval[:100])[1], keys)
+    assert factory.instances()[0][3] == programs
+
+
+def test_creator_token_opt_in(factory):
+    server, factory, keys, swap_token = factory
+    creator, deployer, other = keys
+    (app, *_), = factory.instances()
+    token = server.ledger.create_asset(encoding.decode_address(creator), 10**6)
+    for sender in (creator, other):  # only the deployer
+        with pytest.raises(AlgodError):
+            factory.submit_wait(factory.creator_token_opt_in(sender, 0, token), keys)
+    assert token not in holdings(server, logic.get_application_address(app))
+    assert factory.submit_wait(factory.creator_token_opt_in(deployer, 0, token), keys)["confirmed-round"]
+    assert holdings(server, logic.get_application_address(app))[token] == 0
+
+    server.ledger.now += 7 * 24 * 3600  # the DAO's opt in window is over
+    late = server.ledger.create_asset(encoding.decode_address(creator), 10**6)
+    with pytest.raises(AlgodError):
+        factory.submit_wait(factory.creator_token_opt_in(deployer, 0, late), keys)
@@ -0,0 +1,23 @@
+"""
+pay_tokens: execute pays out exactly the list the proposal committed to.
+"""
+
+from degen2_model import itob
+
+
+def payout_list(payouts):
+    return b"".join(itob(asset) + itob(amount) for asset, amount in payouts)
+
+
+def test_pay_tokens(chain):
+    proposer, receiver = chain.users[1:3]
+    assert chain.stake(proposer, 2000)
+    payouts = [(chain.degen2, 5), (chain.degen2, 7)]
+    proposal_id = chain.passed(proposer, "pay_tokens", payload=payout_list(payouts), receiver=receiver)
+    before = chain.holding(receiver)
+    assert not chain.execute(proposer, proposal_id, payout_list([(chain.degen2, 500)]), receiver=receiver)
+    assert not chain.execute(proposer, proposal_id, payout_list(payouts[:1]), receiver=receiver)
+    assert not chain.execute(proposer, proposal_id, payout_list(payouts), receiver=proposer)
+    assert chain.holding(receiver) == before
+    assert chain.execute(proposer, proposal_id, payout_list(payouts), receiver=receiver), chain.dao.error
+    assert chain.holding(receiver) - before == 12
@@ -0,0 +1,26 @@
+"""
+propose: the proposal fee is degen2, the reservation the proposal makes counts on it.
+"""
+
+from degen2_contract import methods
+from degen2_model import axfer, pay, proposal_box
+
+
+def test_fee_in_another_token(chain):
+    proposer = chain.users[1]
+    assert chain.stake(proposer, 2000)
+    token = chain.backend.create_asset(proposer, 10**6)  # a later id than degen2
+    chain.dao.create_asset(proposer, 10**6, asset_id=token)
+    assert token > chain.degen2
+    assert chain.apply([pay(proposer, chain.app, 1000000),
+                        chain.call(proposer, methods["token_opt_in"], assets=[token], fee=2000)]), chain.dao.error
+
+    proposal_id = chain.dao.globals.next_proposal
+    group = [
+        chain.call(proposer, methods["propose"], b"proposal", b"tx", 0, 0, accounts=[proposer], assets=[chain.degen2],
+                   boxes=[proposal_box(proposal_id)]),
+        pay(proposer, chain.app, 2000000),
+        axfer(proposer, chain.app, token, chain.dao.globals.proposal_fee),
+    ]
+    assert not chain.apply(group)
+    assert chain.propose(proposer, "tx") == proposal_id, chain.dao.error
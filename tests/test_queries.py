@@ -0,0 +1,92 @@
+"""
+The read-only queries, their return logs decoded, against approval() with and without the packed parameters.
+"""
+
+from degen2_contract import proposal_states, proposal_types
+from degen2_model import delegate_box, proposal_box, swap_box
+
+
+def status(chain, proposal_id):
+    returned = chain.query(chain.users[3], "proposal_status", proposal_id, boxes=[proposal_box(proposal_id)])
+    return proposal_states[returned["status"]], returned
+
+
+def test_proposal_status(layouts):
+    chain = layouts
+    proposer = chain.users[1]
+    assert chain.stake(proposer, 2000)
+    proposal_id = chain.propose(proposer, "pay_algo", 1000, receiver=chain.users[2])
+    assert status(chain, proposal_id + 1)[0] == "none"
+    state, returned = status(chain, proposal_id)
+    p = chain.dao.proposals[proposal_id]
+    assert state == "voting"
+    assert returned == {"status": 1, "type": int.from_bytes(proposal_types["pay_algo"].encode(), "big"), "value": 1000,
+                        "index": 0, "end_time": p.end_time, "upvotes": 0, "dnvotes": 0}
+    assert chain.vote(proposer, proposal_id), chain.dao.error
+    assert status(chain, proposal_id)[1]["upvotes"] == 2000
+
+    chain.advance(p.end_time - 1 - chain.backend.now())
+    assert status(chain, proposal_id)[0] == "voting"
+    chain.advance(1)  # at end_time votes are rejected, so it isn't voting anymore
+    assert not chain.vote(chain.users[2], proposal_id)
+    assert status(chain, proposal_id)[0] == "passed"
+    chain.advance(chain.dao.globals.cooldown)
+    assert status(chain, proposal_id)[0] == "failed"  # too late to execute
+
+
+def test_proposal_status_failed(layouts):
+    chain = layouts
+    proposer = chain.users[1]
+    assert chain.stake(proposer, 500)  # under the threshold
+    proposal_id = chain.propose(proposer, "tx")
+    assert chain.vote(proposer, proposal_id), chain.dao.error
+    chain.end_vote()
+    assert status(chain, proposal_id)[0] == "failed"
+
+
+def test_quote(layouts):
+    chain = layouts
+    price = chain.dao.globals.price
+    user = chain.users[1]
+    assert chain.query(user, "quote", 10 * price + 1, assets=[chain.degen2]) == {"degen2": 10, "price": price, "available": 1}
+    assert chain.query(user, "quote", price - 1, assets=[chain.degen2]) == {"degen2": 0, "price": price, "available": 0}
+    assert chain.query(user, "quote", price, assets=[chain.swap_tokens[0]]) is None  # not degen2
+
+
+def test_swap_quote(layouts):
+    chain = layouts
+    user, token = chain.users[1], chain.swap_tokens[0]
+    ratio, end_time = chain.dao.swaps[token]
+    returned = chain.query(user, "swap_quote", token, 3 * ratio, assets=[chain.degen2], boxes=[swap_box(token)])
+    assert returned == {"degen2": 3, "ratio": ratio, "end_time": end_time, "available": 1}
+    unknown = chain.swap_tokens[1]
+    returned = chain.query(user, "swap_quote", unknown, 100, assets=[chain.degen2], boxes=[swap_box(unknown)])
+    assert returned == {"degen2": 0, "ratio": 0, "end_time": 0, "available": 0}
+    chain.advance(end_time - chain.backend.now())
+    returned = chain.query(user, "swap_quote", token, 3 * ratio, assets=[chain.degen2], boxes=[swap_box(token)])
+    assert returned["available"] == 0
+
+
+def test_headroom(layouts):
+    chain = layouts
+    assert chain.stake(chain.users[1], 2000)
+    assert chain.propose(chain.users[1], "pay_token", 300, chain.degen2, receiver=chain.users[2]) is not None
+    held = chain.holding(chain.app)
+    assert chain.query(chain.users[2], "headroom", assets=[chain.degen2]) == {
+        "balance": held, "total_stake": 2000, "reserved": 300, "headroom": held - 2300}
+
+
+def test_eligibility(layouts):
+    chain = layouts
+    voter, other = chain.users[1:3]
+    assert chain.stake(voter, 2000)
+    proposal_id = chain.propose(voter, "tx", receiver=chain.creator)
+
+    def eligibility(address):
+        return chain.query(other, "eligibility", proposal_id, accounts=[address], boxes=[delegate_box(address)])
+
+    assert eligibility(voter) == {"eligible": 1, "weight": 2000, "voted": 0, "locked_until": 0}
+    assert eligibility(other) == {"eligible": 0, "weight": 0, "voted": 0, "locked_until": 0}
+    assert chain.vote(voter, proposal_id), chain.dao.error
+    end_time = chain.dao.proposals[proposal_id].end_time
+    assert eligibility(voter) == {"eligible": 0, "weight": 2000, "voted": 1, "locked_until": end_time}
@@ -0,0 +1,60 @@
+"""
+fund_rewards and the reward per share accumulator: what withdraw pays each staker.
+"""
+
+from degen2_contract import methods
+from degen2_model import pay
+
+
+def test_fund_rewards_pays_once(chain):
+    staker, funder = chain.users[1:3]
+    assert chain.stake(staker, 1000)
+    call = chain.call(funder, methods["fund_rewards"])
+    again = chain.call(funder, methods["fund_rewards"], b"again")
+    assert not chain.apply([pay(funder, chain.app, 1000000), call, again])
+    assert not chain.apply([pay(funder, chain.app, 0), call])
+    assert chain.dao.globals.rewards_owed == 0
+
+
+def paid_on_withdraw(chain, user):
+    """algo a withdraw of nothing pays user, less the 1 algo it pays in."""
+    before = chain.algo(user)
+    assert chain.withdraw(user, 0), chain.dao.error
+    return chain.algo(user) - before + 1000000
+
+
+def test_staggered_stakes(chain):
+    first, second, funder = chain.users[1:4]
+    assert chain.stake(first, 1000)
+    assert chain.fund_rewards(funder, 1000000)  # all of it to first
+    assert chain.stake(second, 3000)
+    assert chain.fund_rewards(funder, 4000000)  # a quarter to first, the rest to second
+    assert paid_on_withdraw(chain, first) == 2000000
+    assert paid_on_withdraw(chain, second) == 3000000
+    assert paid_on_withdraw(chain, first) == 0  # settled already
+    assert chain.dao.globals.rewards_owed == 0
+
+
+def test_rewards_before_a_stake(chain):
+    early, late, funder = chain.users[1:4]
+    assert chain.stake(early, 1000)
+    assert chain.fund_rewards(funder, 1000000)
+    assert chain.stake(late, 1000)
+    assert paid_on_withdraw(chain, late) == 0
+    assert paid_on_withdraw(chain, early) == 1000000
+
+
+def test_stake_settles_first(chain):
+    staker, funder = chain.users[1:3]
+    assert chain.stake(staker, 1000)
+    assert chain.fund_rewards(funder, 500000)
+    before = chain.algo(staker)
+    assert chain.stake(staker, 1000)  # pays for the buy, gets the rewards of the first 1000
+    bought = 1000 * chain.dao.globals.price
+    assert chain.algo(staker) - before == 500000 - bought
+    assert chain.fund_rewards(funder, 500000)
+    assert paid_on_withdraw(chain, staker) == 500000
+
+
+def test_nobody_staked(chain):
+    assert not chain.fund_rewards(chain.users[1], 1000000)
@@ -0,0 +1,63 @@
+"""
+The swap table: swap_table proposals add and retire the tokens swap1 takes.
+"""
+
+from degen2_contract import max_swap_entries, methods
+from degen2_model import axfer, itob, swap_box
+
+
+def swap_list(entries):
+    return b"".join(itob(asset) + itob(ratio) + itob(end_time) for asset, ratio, end_time in entries)
+
+
+def swap(chain, user, token, amount):
+    return chain.apply([
+        axfer(user, chain.app, token, amount),
+        chain.call(user, methods["swap1"], token, assets=[chain.degen2], boxes=[swap_box(token)], fee=2000),
+    ])
+
+
+def set_table(chain, entries):
+    proposer = chain.users[1]
+    if not chain.local(proposer).stake:
+        assert chain.stake(proposer, 2000)
+    payload = swap_list(entries)
+    proposal_id = chain.passed(proposer, "swap_table", payload=payload)
+    return chain.execute(proposer, proposal_id, payload, boxes=[swap_box(asset) for asset, _, _ in entries])
+
+
+def test_add_and_retire(chain):
+    token, user = chain.swap_tokens[1], chain.users[2]
+    assert not swap(chain, user, token, 10)  # not in the table yet
+    assert set_table(chain, [(token, 2, chain.backend.now() + 10**7)]), chain.dao.error
+    before = chain.holding(user)
+    assert swap(chain, user, token, 10), chain.dao.error
+    assert chain.holding(user) - before == 5
+
+    assert set_table(chain, [(token, 0, 0)]), chain.dao.error
+    assert token not in chain.dao.swaps
+    assert not swap(chain, user, token, 10)
+
+
+def test_unknown_token(chain):
+    user = chain.users[2]
+    unknown = chain.backend.create_asset(user, 10**6)
+    chain.dao.create_asset(user, 10**6, asset_id=unknown)
+    assert not swap(chain, user, unknown, 10)
+
+
+def test_execute_another_list(chain):
+    token, proposer = chain.swap_tokens[1], chain.users[1]
+    assert chain.stake(proposer, 2000)
+    entries = [(token, 2, chain.backend.now() + 10**7)]
+    proposal_id = chain.passed(proposer, "swap_table", payload=swap_list(entries))
+    assert not chain.execute(proposer, proposal_id, swap_list([(token, 1, 2**40)]), boxes=[swap_box(token)])
+    assert chain.execute(proposer, proposal_id, swap_list(entries), boxes=[swap_box(token)]), chain.dao.error
+
+
+def test_entries_execute_can_log(chain):
+    proposer = chain.users[1]
+    assert chain.stake(proposer, 2000)
+    entries = [(chain.swap_tokens[1], 2, 2**40)]
+    assert chain.propose(proposer, "swap_table", payload=swap_list(entries * (max_swap_entries + 1))) is None
+    assert chain.propose(proposer, "swap_table", payload=swap_list(entries * max_swap_entries)) is not None